@@ -3,57 +3,9 @@ import matplotlib.pyplot as plt
 # Biblioteca de estruturas básicas para tratamento e análise de dados \
 # de SAXS.
 import saxspy.saxspy as saxs
-
-
-############## Importa os parâmetros e nomes de arquivos. ##############
-########################################################################
-
-def ImportParameter_AbsoluteScale(fileParameters):
-  
-  # Extrai os dados do arquivo ignorando as linhas comentadas e "em 
-  # branco" (atenção que na verdade linhas que começam com tab e space 
-  # são tratadas como linhas em branco).
-  with open(fileParameters, 'r') as f:
-    lines = []
-    for line in f:
-      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
-        lines.append(line)
-  
-  # Indica o número de arquivos a serem corrigidos (número de linhas de
-  # argumentos).
-  numberFiles = len(lines)
-  print("Correcting %d data files for the absolute scale:" % numberFiles)
-  
-  # Inicia as listas para receberem os argumentos.
-  absoluteScaleFactor = []
-  fileSample = []
-  nameOutput = []
-
-  # Separa os argumentos nas linhas e notifica caso o número de 
-  # argumentos por linha não esteja adequado.
-  for i in range(numberFiles):
-    # Prepara a string removendo espaços e tabs.
-    lines[i] = lines[i].replace(" ", "")
-    lines[i] = lines[i].replace("\t", "")
-    
-    # Separa os argumentos pelas vírgulas.
-    argument = lines[i].split(",")
-    
-    if (len(argument) != 3):
-      print("\nError: number of arguments invalid in the line %d of parameters file!\n" % (i+1))
-    else:
-      # Obtêm os parâmetros e retorna.
-      absoluteScaleFactor.append(float(argument[0]))
-      fileSample.append(str(argument[1].strip('\n')))
-      nameOutput.append(str(argument[2].strip('\n')))
-      # Imprime os arquivos que serão corrigidos.
-      print("%d) %s" % ((i+1), fileSample[i]))
-  
-  print(" ")
-  
-  return numberFiles, absoluteScaleFactor, fileSample, nameOutput
-
-########################################################################
+# Leitura dos arquivos de parâmetros e execução das correções em paralelo.
+from saxspy.parameters import ImportParameter_AbsoluteScale
+import saxspy.runner as runner
 
 
 #################### Faz o gráfico do ajuste linear. ###################
@@ -106,11 +58,16 @@ fileParameters = input("Enter the parameters file: ")
 print("\n")
 
 # Importa os parâmetros e informações dos dados a serem corrigidos.
-numberFiles, absoluteScaleFactor, fileSample, nameOutput = ImportParameter_AbsoluteScale(fileParameters)
-
-for i in range(numberFiles):
-  # Corrige os dados e salva em arquivo.
-  correction = saxs.CorrectTo_AbsoluteScale(absoluteScaleFactor[i], fileSample[i], save=True, fileOutput=(nameOutput[i]+".dat"))
-
-  # Faz o gráfico do ajuste de calibração.
-  PlotCorrection_AbsoluteScale(correction, nameOutput[i], save=False, close=((i+1)//numberFiles))
+*parameters, lineNumbers = ImportParameter_AbsoluteScale(fileParameters, withLines=True)
+numberFiles = parameters[0]
+nameOutput = parameters[-1]
+
+# Corrige os dados e salva em arquivo (as linhas são executadas em
+# paralelo; uma linha com erro não interrompe as demais).
+results, summary = runner.RunAbsoluteScale(parameters, executor="thread", lineNumbers=lineNumbers)
+runner.PrintSummary(summary)
+
+# Faz os gráficos das correções bem-sucedidas.
+corrected = [i for i in range(numberFiles) if results[i] is not None]
+for j, i in enumerate(corrected):
+  PlotCorrection_AbsoluteScale(results[i], nameOutput[i], close=((j+1)//len(corrected)), save=False)
@@ -2,68 +2,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 # Biblioteca para tratamento e análise de dados de medidas de SAXS.
 import saxspy.saxspy as saxs
-
-
-############## Importa os parâmetros e nomes de arquivos. ##############
-########################################################################
-def ImportParameter_CTTq(fileParameters):
-  
-  # Extrai os dados do arquivo ignorando as linhas comentadas e "em 
-  # branco" (atenção que na verdade linhas que começam com tab e space 
-  # são tratadas como linhas em branco).
-  with open(fileParameters, 'r') as f:
-    lines = []
-    for line in f:
-      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
-        lines.append(line)
-  
-  # Indica o número de arquivos a serem corrigidos (número de linhas de
-  # argumentos).
-  numberFiles = len(lines)
-  print("Correcting %d data files for the capillary scattering, transmission, thickness and q-scale calibration:" % numberFiles)
-  
-  # Inicia as listas para receberem os argumentos.
-  qSlope = []
-  qIntercept = []
-  fileSample = []
-  transmissionSample = []
-  thicknessSample = []
-  fileCapillary = []
-  transmissionCapillary = []
-  nameOutput = []
-
-  # Separa os argumentos nas linhas e notifica caso o número de 
-  # argumentos por linha não esteja adequado.
-  for i in range(numberFiles):
-    # Prepara a string removendo espaços e tabs.
-    lines[i] = lines[i].replace(" ", "")
-    lines[i] = lines[i].replace("\t", "")
-    
-    # Separa os argumentos pelas vírgulas.
-    argument = lines[i].split(",")
-    
-    if (len(argument) != 8):
-      print("\nError: number of arguments invalid in the line %d of parameters file!\n" % (i+1))
-    else:
-      # Obtêm os parâmetros e retorna.
-      qSlope.append(float(argument[0]))
-      qIntercept.append(float(argument[1]))
-      fileSample.append(str(argument[2].strip('\n')))
-      transmissionSample.append(float(argument[3]))
-      thicknessSample.append(float(argument[4]))
-      fileCapillary.append(str(argument[5].strip('\n')))
-      transmissionCapillary.append(float(argument[6]))
-      nameOutput.append(str(argument[7].strip('\n')))
-      # Imprime os arquivos que serão corrigidos.
-      print("%d) %s" % ((i+1), fileSample[i]))
-  
-  print(" ")
-  
-  return numberFiles, qSlope, qIntercept, fileSample, \
-      transmissionSample, thicknessSample, fileCapillary, \
-      transmissionCapillary, nameOutput
-
-########################################################################
+# Leitura dos arquivos de parâmetros e execução das correções em paralelo.
+from saxspy.parameters import ImportParameter_CTTq
+import saxspy.runner as runner
 
 
 ###################### Faz o gráfico da correção. ######################
@@ -117,16 +58,16 @@ print("\n")
 fileParameters = input("Enter the parameters file: ")
 print("\n")
 
-numberFiles, qSlope, qIntercept, fileSample, transmissionSample, thicknessSample, \
-    fileCapillary, transmissionCapillary, \
-    nameOutput = ImportParameter_CTTq(fileParameters)
+*parameters, lineNumbers = ImportParameter_CTTq(fileParameters, withLines=True)
+numberFiles = parameters[0]
+nameOutput = parameters[-1]
 
-for i in range(numberFiles):
-  # Corrige os dados e salva em arquivo.
-  correction = saxs.CorrectTo_CTTq(qSlope[i], qIntercept[i], \
-      fileSample[i], transmissionSample[i], thicknessSample[i], \
-      fileCapillary[i], transmissionCapillary[i], save=True, \
-      fileOutput=(nameOutput[i]+".dat"))
+# Corrige os dados e salva em arquivo (as linhas são executadas em
+# paralelo; uma linha com erro não interrompe as demais).
+results, summary = runner.RunCTTq(parameters, executor="thread", lineNumbers=lineNumbers)
+runner.PrintSummary(summary)
 
-  # Faz o gráfico do ajuste de calibração.
-  PlotCorrection_CTTq(correction, nameOutput[i], close=((i+1)//numberFiles), save=False)
+# Faz os gráficos das correções bem-sucedidas.
+corrected = [i for i in range(numberFiles) if results[i] is not None]
+for j, i in enumerate(corrected):
+  PlotCorrection_CTTq(results[i], nameOutput[i], close=((j+1)//len(corrected)), save=False)
@@ -3,63 +3,38 @@ import matplotlib.pyplot as plt
 # Biblioteca de estruturas básicas para tratamento e análise de dados \
 # de SAXS.
 import saxspy.saxspy as saxs
+# Média incremental pesada pelo tempo de medida.
+from saxspy.mean import MeanAccumulator
+# Leitura da lista de arquivos.
+from saxspy.parameters import ImportListFiles
 
 
-# Importa a lista de arquivos e insere o endereço para ela.
-def ImportListFiles(fileListFiles, directoryFiles):
-  directoryFiles = directoryFiles.strip('/') + "/"
-  # Importa a lista de arquivos dos quais o programa vai fazer a média.    
-  with open(fileListFiles,'r') as f:    
-    listFiles = []
-    for line in f:
-      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
-        listFiles.append(directoryFiles + line.strip('\n'))
-    
-  return listFiles
-
-  
 # Importa os dados dos arquivos, faz a média 
 def SAXSMean(listFiles, fileOutput, printFileNames=False):
-  # Importa os dados dos arquivos de dados, a partir da linha 31.
-  numberFiles = len(listFiles)
-  mean = saxs.Saxs()
-  qmean = 0
-  Imean = 0
-  sImean = 0
-  timeTotal = 0
+  # Importa os dados dos arquivos de dados e acumula a média pesando
+  # pelo tempo de medida (apenas as somas ficam em memória).
+  accumulator = MeanAccumulator()
   for fileData in listFiles:
-    with open(fileData, 'r') as f:
-      for _ in range(6):
-        timeLine = (f.readline()).split()
-        
-      time = float(timeLine[2])/1000 # Divide por 1000 para ficar em segundos
-      timeTotal += time
-      
-      if(printFileNames):
-        print("%s \t %.0f" % (fileData, time))
+    # Lê o arquivo uma única vez: o tempo de exposição (em segundos) vem
+    # do cabeçalho e os dados do bloco numérico.
+    data = saxs.ReadData(fileData)
+    time = data.metadata["time"]
     
-    # Extrai os dados do arquivo, ignorando 30 linhas (opcional, porque as linhas são comentadas).
-    q, I, sI = np.loadtxt(fileData, skiprows=30, usecols=(0,1,2), unpack=True)
+    if(printFileNames):
+      print("%s \t %.0f" % (fileData, time))
 
-    # Faz a média pesando pelo tempo de medida.
-    qmean += time*q # É desnecessária essa média.
-    Imean += time*I
-    sImean += (time*sI)**2
+    accumulator.Add(data, time)
 
-  mean.q = qmean/timeTotal
-  mean.I = Imean/timeTotal
-  mean.sI = np.sqrt(sImean)/timeTotal
+  mean = accumulator.Result()
 
 
   # Salva os dados de media em um arquivo.
   #if(fileOutput==0):
   #  fileOutput = fileListFiles.split(".")[0] + "_mean.dat"
   
-  with open(fileOutput, 'w') as f:
-    f.write("# Médias dos dados para calibração: %s.\n" % fileOutput)
-    f.write("# q\t I(q)\t sI\n")
-    for i in range(mean.Size()):
-      f.write("%.6e\t %.6e\t %.6e\n" % (mean.q[i], mean.I[i], mean.sI[i]))
+  saxs.WriteData(fileOutput, mean, \
+      header=("# Médias dos dados para calibração: %s.\n" % fileOutput) + \
+      "# q\t I(q)\t sI\n")
 
   return mean
 
@@ -3,59 +3,9 @@ import matplotlib.pyplot as plt
 # Biblioteca de estruturas básicas para tratamento e análise de dados \
 # de SAXS.
 import saxspy.saxspy as saxs
-
-############## Importa os parâmetros e nomes de arquivos. ##############
-########################################################################
-
-def ImportParameter_Solvent(fileParameters):
-  
-  # Extrai os dados do arquivo ignorando as linhas comentadas e "em 
-  # branco" (atenção que na verdade linhas que começam com tab e space 
-  # são tratadas como linhas em branco).
-  with open(fileParameters, 'r') as f:
-    lines = []
-    for line in f:
-      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
-        lines.append(line)
-  
-  # Indica o número de arquivos a serem corrigidos (número de linhas de
-  # argumentos).
-  numberFiles = len(lines)
-  print("Correcting %d data files for the solvent scattering:" % numberFiles)
-  
-  # Inicia as listas para receberem os argumentos.
-  fileSample = []
-  fileSolvent = []
-  soluteVolumetricFraction = []
-  nameOutput = []
-
-  # Separa os argumentos nas linhas e notifica caso o número de 
-  # argumentos por linha não esteja adequado.
-  for i in range(numberFiles):
-    # Prepara a string removendo espaços e tabs.
-    lines[i] = lines[i].replace(" ", "")
-    lines[i] = lines[i].replace("\t", "")
-    
-    # Separa os argumentos pelas vírgulas.
-    argument = lines[i].split(",")
-    
-    if (len(argument) != 4):
-      print("\nError: number of arguments invalid in the line %d of parameters file!\n" % (i+1))
-    else:
-      # Obtêm os parâmetros e retorna.
-      fileSample.append(str(argument[0].strip('\n')))
-      fileSolvent.append(str(argument[1].strip('\n')))
-      soluteVolumetricFraction.append(float(argument[2]))
-      nameOutput.append(str(argument[3].strip('\n')))
-      # Imprime os arquivos que serão corrigidos.
-      print("%d) %s" % ((i+1), fileSample[i]))
-  
-  print(" ")
-  
-  return numberFiles, fileSample, fileSolvent, soluteVolumetricFraction, nameOutput
-
-########################################################################
-
+# Leitura dos arquivos de parâmetros e execução das correções em paralelo.
+from saxspy.parameters import ImportParameter_Solvent
+import saxspy.runner as runner
 
 #################### Faz o gráfico do ajuste linear. ###################
 ########################################################################
@@ -105,11 +55,16 @@ fileParameters = input("Enter the parameters file: ")
 print("\n")
 
 # Importa os parâmetros e dados para serem corrigidos.
-numberFiles, fileSample, fileSolvent, soluteVolumetricFraction, nameOutput = ImportParameter_Solvent(fileParameters)
+*parameters, lineNumbers = ImportParameter_Solvent(fileParameters, withLines=True)
+numberFiles = parameters[0]
+nameOutput = parameters[-1]
 
-for i in range(numberFiles):
-  # Corrige os dados e salva em arquivo.
-  correction = saxs.CorrectTo_Solvent(fileSample[i], fileSolvent[i], soluteVolumetricFraction[i], save=True, fileOutput=(nameOutput[i]+".dat"))
+# Corrige os dados e salva em arquivo (as linhas são executadas em
+# paralelo; uma linha com erro não interrompe as demais).
+results, summary = runner.RunSolvent(parameters, executor="thread", lineNumbers=lineNumbers)
+runner.PrintSummary(summary)
 
-  # Faz o gráfico do ajuste de calibração.
-  PlotCorrection_Solvent(correction, nameOutput[i], save=False, close=((i+1)//numberFiles))
+# Faz os gráficos das correções bem-sucedidas.
+corrected = [i for i in range(numberFiles) if results[i] is not None]
+for j, i in enumerate(corrected):
+  PlotCorrection_Solvent(results[i], nameOutput[i], close=((j+1)//len(corrected)), save=False)
@@ -3,6 +3,8 @@ import matplotlib.pyplot as plt
 # Biblioteca de estruturas básicas para tratamento e análise de dados \
 # de SAXS.
 import saxspy.saxspy as saxs
+# Ajustes numéricos da calibração (sem gráficos).
+import saxspy.calibration as calibration
 
 
 def PlotAndDefineLimits(data):
@@ -72,28 +74,6 @@ def PlotFit(data, qinf, qsup, a0, s0, chi2dof, nameOutput, save):
 ########################################################################
 
 
-# Ajusta uma constante no espalhamento da água. 
-########################################################################
-def FitConstant(data, qinf, qsup):
-    
-  x = data.q[data.q > qinf]
-  init = data.Size() - len(x)
-  x = x[x < qsup]
-  end = init + len(x)
-
-  y = data.I[init:end]
-  s = data.sI[init:end]
-  
-  p, cov = np.polyfit(x, y, 0, w=1/s, cov='unscaled')
-  p, chi2, rank, sing_v, rcond = np.polyfit(x, y, 0, w=1/s, full=True)
-  
-  a0 = p[0]
-  s0 = np.sqrt(cov[0,0])
-  
-  return a0, s0, chi2/(len(x)-1)
-
-########################################################################
-
 ######################### PROGRAMA PRINCIPAL ###########################
 ########################################################################
 
@@ -108,10 +88,10 @@ water.ImportData(fileWater)
 qinf, qsup = PlotAndDefineLimits(water)
 
 # Corrige os dados e salva em arquivo.
-a0, s0, chi2dof = FitConstant(water, qinf, qsup)
+a0, s0, chi2dof = calibration.FitConstant(water, qinf, qsup)
 
 # Espalhamento da água em cm^-1, a 293K (Orthaber; Bergmann; Glatter, 2000).
-absoluteScaleFactor = a0/0.01632
+absoluteScaleFactor = a0/calibration.WATER_SCATTERING
 
 # Imprime os resultados.
 print('\n*****************************************\n')
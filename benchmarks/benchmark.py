@@ -0,0 +1,216 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+
+# Permite executar a partir de qualquer diretório (python benchmarks/benchmark.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import saxspy.saxspy as saxs
+import saxspy.calibration as calibration
+from saxspy.batch import ReadBatch, CorrectBatchTo_CTTq
+from saxspy.mean import MeanAccumulator
+from saxspy.pipeline import Pipeline
+from saxspy import peaks as peakfit
+from saxspy import regrid
+from saxspy import analysis
+from saxspy import ift
+from saxspy.models import FitModel
+import synthetic
+
+########################################################################
+# Benchmarks das etapas de redução: leitura, correções, média, ajustes
+# da calibração e a cadeia completa. Para cada etapa são medidos o tempo
+# (melhor de --repeat execuções), a vazão em curvas por segundo e o pico
+# de memória alocada (tracemalloc, em uma execução separada).
+#
+#   python benchmarks/benchmark.py --points 2000 --curves 200
+########################################################################
+
+# Prepara os arquivos sintéticos no diretório de trabalho.
+def Prepare(directory, points, curves):
+
+  files = {"frames": [], "binary": []}
+  for k, frame in enumerate(synthetic.Frames(points, curves)):
+    fileData = os.path.join(directory, "frame%05d.dat" % k)
+    synthetic.WriteDetectorFile(fileData, frame, time=1000 + 10*k)
+    files["frames"].append(fileData)
+    fileBinary = os.path.join(directory, "frame%05d.sxb" % k)
+    frame.Save(fileBinary)
+    files["binary"].append(fileBinary)
+
+  for name, data in (("capillary", synthetic.Capillary(points)), \
+      ("solvent", synthetic.Capillary(points)), \
+      ("water", synthetic.Water(points)), \
+      ("behenate", synthetic.Behenate(points))):
+    files[name] = os.path.join(directory, name + ".dat")
+    saxs.WriteData(files[name], data)
+
+  return files
+
+# Define as etapas: nome -> (função sem argumentos, número de curvas).
+def Stages(files, directory, curves):
+
+  frames = files["frames"]
+  output = os.path.join(directory, "output.dat")
+  behenate = saxs.ReadData(files["behenate"])
+  water = saxs.ReadData(files["water"])
+  peaks = [[(2*np.pi*n/calibration.BEHENATE_D001 - synthetic.QINTERCEPT)/synthetic.QSLOPE + d \
+      for d in (-0.006, 0.006)] for n in (1, 2, 3)]
+  loaded = [saxs.ReadData(fileData) for fileData in frames]
+  pipeline = Pipeline().AddCTTq(synthetic.QSLOPE, synthetic.QINTERCEPT, 0.5, 0.1, \
+      files["capillary"], 0.9).AddSolvent(files["solvent"], 0.02).AddAbsoluteScale(1.2)
+
+  def ImportText():
+    for fileData in frames:
+      saxs.ReadData(fileData)
+
+  def ImportBinary():
+    for fileData in files["binary"]:
+      float(saxs.ReadData(fileData).I.sum())
+
+  def Write():
+    for data in loaded:
+      saxs.WriteData(output, data)
+
+  def CTTq():
+    for fileData in frames:
+      saxs.CorrectTo_CTTq(synthetic.QSLOPE, synthetic.QINTERCEPT, fileData, 0.5, 0.1, \
+          files["capillary"], 0.9, fileOutput=output)
+
+  def Solvent():
+    for fileData in frames:
+      saxs.CorrectTo_Solvent(fileData, files["solvent"], 0.02, fileOutput=output)
+
+  def AbsoluteScale():
+    for fileData in frames:
+      saxs.CorrectTo_AbsoluteScale(1.2, fileData, fileOutput=output)
+
+  def Mean():
+    accumulator = MeanAccumulator()
+    for fileData in frames:
+      data = saxs.ReadData(fileData)
+      accumulator.Add(data, data.metadata["time"])
+    saxs.WriteData(output, accumulator.Result())
+
+  def BatchCTTq():
+    CorrectBatchTo_CTTq(synthetic.QSLOPE, synthetic.QINTERCEPT, ReadBatch(frames), \
+        0.5, 0.1, files["capillary"], 0.9)
+
+  def FitLorentz():
+    for qran in peaks:
+      calibration.FitLorentz(qran, behenate)
+
+  def FitPeaks():
+    peakfit.FitPeaks(behenate, peaks)
+
+  def FitConstant():
+    calibration.FitConstant(water, 0.1, 0.4)
+
+  def Rebin():
+    for data in loaded:
+      regrid.Rebin(data, 200)
+
+  def Analysis():
+    analysis.Analyze(loaded)
+
+  def IFT():
+    ift.IFT(loaded, 80, weights="common")
+
+  def FitSpheres():
+    FitModel(loaded, "sphere", qmax=0.3)
+
+  def EndToEnd():
+    for fileData in frames:
+      pipeline.Run(fileData, fileOutput=output)
+
+  return {
+      "import-text": (ImportText, curves),
+      "import-binary": (ImportBinary, curves),
+      "write-text": (Write, curves),
+      "cttq": (CTTq, curves),
+      "solvent": (Solvent, curves),
+      "absolute-scale": (AbsoluteScale, curves),
+      "mean": (Mean, curves),
+      "batch-cttq": (BatchCTTq, curves),
+      "fit-lorentz": (FitLorentz, len(peaks)),
+      "fit-peaks": (FitPeaks, len(peaks)),
+      "fit-constant": (FitConstant, 1),
+      "rebin": (Rebin, curves),
+      "analysis": (Analysis, curves),
+      "ift": (IFT, curves),
+      "fit-model": (FitSpheres, curves),
+      "end-to-end": (EndToEnd, curves)}
+
+# Importa os módulos do scipy usados pelas etapas antes das medidas (o
+# saxspy os importa na primeira chamada, o que seria contado na primeira
+# etapa que os usa).
+def Warmup():
+
+  import scipy.optimize
+  import scipy.special
+  import scipy.signal
+
+# Esvazia os caches (referências, pesos de interpolação e matrizes da
+# IFT), de modo que cada execução parte do mesmo estado.
+def ClearCaches():
+
+  saxs.referenceCache.Clear()
+  regrid.weightsCache.Clear()
+  ift.transformCache.Clear()
+
+# Mede o tempo (melhor de repeat execuções) e o pico de memória.
+def Measure(function, repeat):
+
+  times = []
+  for _ in range(repeat):
+    ClearCaches()
+    start = time.perf_counter()
+    function()
+    times.append(time.perf_counter() - start)
+
+  ClearCaches()
+  tracemalloc.start()
+  function()
+  peak = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+
+  return min(times), peak
+
+def main(argv=None):
+
+  parser = argparse.ArgumentParser(description="Benchmarks of the saxspy reduction stages.")
+  parser.add_argument("--points", type=int, default=2000, help="points per curve")
+  parser.add_argument("--curves", type=int, default=100, help="number of curves")
+  parser.add_argument("--repeat", type=int, default=3, help="repetitions per stage")
+  parser.add_argument("--stage", action="append", default=None, help="run only this stage")
+  parser.add_argument("--json", default=None, metavar="FILE", help="save the results in FILE")
+  arguments = parser.parse_args(argv)
+
+  results = []
+  with tempfile.TemporaryDirectory() as directory:
+    files = Prepare(directory, arguments.points, arguments.curves)
+    stages = Stages(files, directory, arguments.curves)
+    Warmup()
+
+    print("%-16s %12s %14s %14s" % ("stage", "time (s)", "curves/s", "peak (MiB)"))
+    for name, (function, curves) in stages.items():
+      if(arguments.stage and name not in arguments.stage):
+        continue
+      elapsed, peak = Measure(function, arguments.repeat)
+      results.append({"stage": name, "curves": curves, "points": arguments.points, \
+          "time": elapsed, "throughput": curves/elapsed, "peak_memory": peak})
+      print("%-16s %12.4f %14.1f %14.2f" % (name, elapsed, curves/elapsed, peak/2**20))
+
+  if(arguments.json):
+    with open(arguments.json, 'w') as f:
+      json.dump(results, f, indent=2)
+
+  return results
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,94 @@
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+import saxspy.saxspy as saxs
+from saxspy.calibration import BEHENATE_D001
+
+########################################################################
+# Geradores de dados sintéticos de SAXS para os benchmarks: padrão de
+# behenato de prata, água, capilar e amostra, com ruído de contagem e
+# arquivos do detector com o cabeçalho de 30 linhas (tempo de exposição
+# na linha 6, em milissegundos).
+########################################################################
+
+# Escala q medida (sem calibração) e a relação com a escala verdadeira.
+QMIN = 0.01
+QMAX = 0.45
+QSLOPE = 1.02
+QINTERCEPT = 0.001
+
+def Grid(npts):
+
+  return np.linspace(QMIN, QMAX, npts)
+
+# Adiciona ruído de Poisson (aproximado por gaussiano) às intensidades.
+def Noisy(q, I, counts, rng):
+
+  data = saxs.Saxs()
+  data.q = q
+  data.sI = np.sqrt(I/counts)
+  data.I = I + rng.normal(0, 1, len(q))*data.sI
+  data.size = len(q)
+
+  return data
+
+# Padrão de behenato de prata: picos lorentzianos nas ordens de d001,
+# sobre um fundo decrescente.
+def Behenate(npts, orders=4, width=0.002, rng=None):
+
+  rng = rng or np.random.default_rng(0)
+  q = Grid(npts)
+  qTrue = QSLOPE*q + QINTERCEPT
+  I = 50*np.exp(-5*q) + 1
+  for n in range(1, orders+1):
+    q0 = 2*np.pi*n/BEHENATE_D001
+    I += (200/n)/(1 + ((qTrue - q0)/width)**2)
+
+  return Noisy(q, I, 100, rng)
+
+# Água: patamar constante (em unidades arbitrárias).
+def Water(npts, level=0.02, rng=None):
+
+  rng = rng or np.random.default_rng(1)
+  q = Grid(npts)
+
+  return Noisy(q, np.full(npts, level), 1e6, rng)
+
+# Capilar: fundo suave decrescente.
+def Capillary(npts, rng=None):
+
+  rng = rng or np.random.default_rng(2)
+  q = Grid(npts)
+
+  return Noisy(q, 0.5*np.exp(-8*q) + 0.05, 1e4, rng)
+
+# Amostra: esferas (raio em angstrom) sobre o fundo do capilar.
+def Sample(npts, radius=30.0, rng=None):
+
+  rng = rng or np.random.default_rng(3)
+  q = Grid(npts)
+  x = q*radius
+  sphere = (3*(np.sin(x) - x*np.cos(x))/x**3)**2
+
+  return Noisy(q, 10*sphere + 0.5*np.exp(-8*q) + 0.06, 1e3, rng)
+
+# Cabeçalho de um arquivo do detector (30 linhas comentadas).
+def DetectorHeader(time):
+
+  header = ["# Synthetic SAXS detector file", "# Detector: synthetic", \
+      "# Sample: benchmark", "# Distance: 1000 mm", "# Wavelength: 1.5418 A", \
+      "# Exposure_time: %d ms" % time]
+  header += ["# Comment %d: none" % i for i in range(len(header), 30)]
+
+  return "\n".join(header) + "\n"
+
+# Escreve um arquivo do detector com o cabeçalho.
+def WriteDetectorFile(fileOutput, data, time=1000):
+
+  saxs.WriteData(fileOutput, data, header=DetectorHeader(time))
+
+# Gera uma série de medidas da amostra (frames do detector).
+def Frames(npts, number, seed=10):
+
+  rng = np.random.default_rng(seed)
+
+  return [Sample(npts, rng=rng) for _ in range(number)]
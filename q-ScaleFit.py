@@ -1,8 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
-import scipy.optimize as sco
 # Biblioteca para tratamento e análise de dados de medidas de SAXS.
 import saxspy.saxspy as saxs
+# Ajustes numéricos da calibração (sem gráficos).
+import saxspy.calibration as calibration
 
 
 ############################################################################################
@@ -65,9 +66,7 @@ def InsertPeakRange():
 ############ Define uma função lorentziana com deslocamento vertical. ######################
 ############################################################################################
 
-def lorentzian(x, q0, w, A, Imin):
-  
-  return (A/(1+((x-q0)/w)**2) + Imin)
+lorentzian = calibration.Lorentzian
 
 
 ############################################################################################
@@ -76,32 +75,15 @@ def lorentzian(x, q0, w, A, Imin):
 
 def FitLorentz(qran, data, peakNumber):
   
-  # Constrói os vetores do intervalo de ajuste. ###########################################
-  x = data.q[data.q > qran[0]]
-  init = data.Size() - len(x)
-  x = x[x < qran[1]]
-  end = init + len(x)
- 
-  y = data.I[init:end]
-  s = data.sI[init:end]
-  
-  # Chute inicial dos parâmetros. #########################################################
-  q0 = 0.5*(max(x) + min(x))
-  w = (max(x) - min(x))/10
-  A = (max(y) - min(y))
-  Imin = min(y)
-  parameters = [q0, w, A, Imin]
-  
   # Ajusta a curva. #######################################################################
-  parameters, cov = sco.curve_fit(lorentzian, x, y, p0=parameters, sigma=s, method='lm')
-  uncerties = np.sqrt(np.diag(cov))
-  ya = lorentzian(x, parameters[0], parameters[1], parameters[2], parameters[3])
+  fitResults = calibration.FitLorentz(qran, data)
+  parameters = [result[0] for result in fitResults[:4]]
+  uncerties = [result[1] for result in fitResults[:4]]
+  chi2dof, R2 = fitResults[4]
   
-  ym = np.sum(y/(s**2))/np.sum(1/(s**2))
-  tss = np.sum(((y - ym)/s)**2)
-  residuals = np.sum(((y - ya)/s)**2)
-  chi2dof = residuals/(len(y) - 4)
-  R2 = 1 - residuals/tss
+  # Constrói os vetores do intervalo de ajuste. ###########################################
+  x = data.Window(qran[0], qran[1]).q
+  ya = lorentzian(x, parameters[0], parameters[1], parameters[2], parameters[3])
   
   print("Results of peak %d fitting with a modified lorentzian curve I = A/(1 + ((q-q0)/w)**2) + Imin:" % peakNumber)
   print("Reduced chi-squared: %.3f    R-squared: %.3f\n" % (chi2dof, R2))
@@ -111,12 +93,6 @@ def FitLorentz(qran, data, peakNumber):
   print("A (peak amplitude): %.5e +/- %.1e" % (parameters[2], uncerties[2]))
   print("Imin (peak minimum base): %.5e +/- %.1e" % (parameters[3], uncerties[3]))
   print("")
-  
-  # Cria lista de parâmetros e incertezas para o ajuste. #####################################
-  fitResults = []
-  for j in range(4):
-    fitResults.append([parameters[j], uncerties[j]])
-  fitResults.append([chi2dof, R2])
 
   # Insere a curva ajustada no gráfico.
   PlotPeakFit(x, ya, label=("Fitting Peak %d" % peakNumber), close=(peakNumber//3))
@@ -249,19 +225,9 @@ def PlotLinearFit(x, y, coeff, close=True, save=False, fileOutput='Peak_Calib.pd
 
 def LinearFit(x, y):
   
-  coeff, cov = np.polyfit(x, y, 1, cov=True)
-  
-  ya = np.polyval(coeff, x)
-  ym = np.sum(y)/3
-  tss = np.sum(((y - ym))**2)
-  residuals = np.sum((ya - y)**2)
-  chi2dof = residuals/(3 - 2)
-  R2 = 1 - residuals/tss
-
-  coefficients = []
-  coefficients.append([coeff[0], np.sqrt(cov[0,0])])
-  coefficients.append([coeff[1], np.sqrt(cov[1,1])])
-  coefficients.append([chi2dof, R2])
+  coefficients, covariance = calibration.LinearFit(x, y, withCovariance=True)
+  coeff = [coefficients[0][0], coefficients[1][0]]
+  chi2dof, R2 = coefficients[2]
   
   # Imprime os resultados do ajuste.
   print("### ### ### ### ### ### ### ### ### ### ### ### ### ###\n")
@@ -274,7 +240,7 @@ def LinearFit(x, y):
   # Faz o gráfico do ajuste de calibração.
   PlotLinearFit(peaksMeasured, peaksReference, coeff)
 
-  return coefficients
+  return coefficients, covariance
 
 ##########################################################################################
 
@@ -312,28 +278,15 @@ peakParameters = [peakParameters1, peakParameters2, peakParameters3]
 peaksMeasured = np.array([peakParameters1[0][0], peakParameters2[0][0], peakParameters3[0][0]])
 
 # Define os picos de referência. Picos do Behenato definidos conforme Huang, et al (1993).
-d001 = 58.3803 # Angstrom
-peaksReference = np.array([(2*np.pi/d001), (4*np.pi/d001), (6*np.pi/d001)])
+peaksReference = calibration.ReferencePeaks([1, 2, 3])
 
 # Faz o ajuste da reta de calibração e faz o gráfico.
 # Primeiro picos ajustados, depois os picos de referência.
-coefficients = LinearFit(peaksMeasured, peaksReference)
+coefficients, covariance = LinearFit(peaksMeasured, peaksReference)
 
 # Salva resultados dos ajustes.
-with open(fileOutput, "w") as f:
-  f.write("# Results of q-scale calibration for the silver behenate standard.\n")
-  f.write("# Calibration using the data file \"%s\".\n" % fileInput)
-  f.write("# peak-center, peak-width, peak-amplitude, peak-base\n")
-  
-  for i in range(3):
-    f.write("# Fitting results for peak %d. reduced-chi-squared: %.3f; R-squared: %.3f;\n" % ((i+1), peakParameters[i][4][0], peakParameters[i][4][1]))
-    f.write("%.6e +/- %.1e, %.6e +/- %.1e, %.6e +/- %.1e, %.6e +/- %.1e\n" % \
-        (peakParameters[i][0][0], peakParameters[i][0][1], peakParameters[i][1][0], peakParameters[i][1][1], \
-        peakParameters[i][2][0], peakParameters[i][2][1], peakParameters[i][3][0], peakParameters[i][3][1]))
-  
-  f.write("# Calibration curve. reduced-chi-squared: %.3f; R-squared: %.3f;\n" % (coefficients[2][0], coefficients[2][1]))
-  f.write("# slope, intercept")
-  f.write("# %.6f +/- %.6f, %.6e +/- %.1e" % (coefficients[0][0], coefficients[0][1], coefficients[1][0], coefficients[1][1]))
+calibration.WriteCalibration(fileOutput, fileInput, peakParameters, coefficients, \
+    covariance=covariance)
 
 print("\nThe results are saved in the file \"%s\". Thank you!\n" % fileOutput)
 print("*** *** *** *** *** *** *** END *** *** *** *** *** *** ***\n")
@@ -0,0 +1,200 @@
+import numpy as np
+# Lotes de curvas de SAXS.
+from .batch import AsBatch
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Análise de Guinier e de Porod de lotes de curvas (tipicamente em escala
+# absoluta), todas de uma vez. As curvas devem ter q crescente.
+#
+# Guinier: ln I = ln I(0) - (Rg**2/3) q**2, ajuste linear ponderado por
+# (I/sI)**2 em função de q**2. As somas do ajuste são acumuladas ao longo
+# de q (cumsum), de modo que o ajuste em qualquer intervalo [i, j) custa
+# uma subtração; para cada início candidato todos os fins são avaliados
+# de uma vez e o intervalo escolhido é o de mais pontos com q*Rg <= qRgMax
+# no último ponto (e chi-quadrado reduzido <= chi2Max, se dado).
+#
+# Porod: ajuste de I q**4 = K + B q**4 no fim da curva (constante de
+# Porod K e fundo B) e o invariante Q = integral de q**2 (I - B) dq, com
+# as extrapolações de Guinier (q -> 0) e de Porod (q -> infinito).
+########################################################################
+
+# Somas acumuladas ao longo de cada curva, com um zero no início:
+# S[:, j] - S[:, i] é a soma nos pontos [i, j).
+def CumulativeSums(values):
+
+  sums = np.zeros((values.shape[0], values.shape[1] + 1))
+  np.cumsum(values, axis=1, out=sums[:, 1:])
+
+  return sums
+
+# Ajuste de Guinier de cada curva. Retorna um dicionário de arrays (uma
+# posição por curva): Rg, sRg, I0, sI0, qmin, qmax, points e chi2dof.
+# Curvas sem intervalo válido ficam com NaN (points = 0).
+@profiling.Timed("guinier")
+def Guinier(data, qmin=0.0, minPoints=8, maxStart=10, qRgMax=1.3, chi2Max=None):
+
+  batch = AsBatch(data)
+  number = batch.Number()
+  profiling.Count("guinier", curves=number)
+  q = np.broadcast_to(batch.q, batch.I.shape)
+
+  # Pontos com I > 0 entram no ajuste de ln I com peso (I/sI)**2.
+  valid = (batch.I > 0) & (batch.sI > 0) & np.isfinite(batch.I) & np.isfinite(batch.sI)
+  I = np.where(valid, batch.I, 1)
+  w = np.where(valid, (I/np.where(valid, batch.sI, 1))**2, 0)
+  x = q**2
+  y = np.log(I)
+
+  S = CumulativeSums(w)
+  Sx = CumulativeSums(w*x)
+  Sy = CumulativeSums(w*y)
+  Sxx = CumulativeSums(w*x*x)
+  Sxy = CumulativeSums(w*x*y)
+  Syy = CumulativeSums(w*y*y)
+  counts = CumulativeSums(valid.astype(float))
+
+  # Primeiro ponto com q > qmin de cada curva (o último ponto, que sozinho
+  # não forma um intervalo, se todos os q são menores que qmin).
+  above = q > qmin
+  first = np.where(np.any(above, axis=1), np.argmax(above, axis=1), q.shape[1] - 1)
+  rows = np.arange(number)
+  ends = np.arange(1, q.shape[1] + 1)
+  qEnd = q
+
+  best = {"points": np.zeros(number), "chi2dof": np.full(number, np.inf), \
+      "slope": np.full(number, np.nan), "intercept": np.full(number, np.nan), \
+      "sSlope": np.full(number, np.nan), "sIntercept": np.full(number, np.nan), \
+      "start": np.zeros(number, dtype=int), "end": np.zeros(number, dtype=int)}
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    for k in range(maxStart):
+      start = np.minimum(first + k, q.shape[1] - 1)[:, np.newaxis]
+
+      def Window(sums):
+        return sums[:, 1:] - np.take_along_axis(sums, start, axis=1)
+
+      s, sx, sy = Window(S), Window(Sx), Window(Sy)
+      sxx, sxy, syy = Window(Sxx), Window(Sxy), Window(Syy)
+      n = Window(counts)
+
+      delta = s*sxx - sx**2
+      slope = (s*sxy - sx*sy)/delta
+      intercept = (sy - slope*sx)/s
+      chi2 = syy + intercept**2*s + slope**2*sxx - 2*intercept*sy - 2*slope*sxy + \
+          2*intercept*slope*sx
+      chi2dof = np.maximum(chi2, 0)/(n - 2)
+      Rg = np.sqrt(-3*slope)
+
+      accepted = (ends > start) & (n >= minPoints) & (slope < 0) & (delta > 0) & \
+          (qEnd*Rg <= qRgMax)
+      if(chi2Max is not None):
+        accepted &= (chi2dof <= chi2Max)
+
+      # Mais pontos e, entre eles, menor chi-quadrado.
+      points = np.where(accepted, n, 0)
+      most = np.max(points, axis=1, keepdims=True)
+      chi2dof = np.where(accepted & (points == most), chi2dof, np.inf)
+      end = np.argmin(chi2dof, axis=1)
+      chosen = chi2dof[rows, end]
+      better = (most[:, 0] > best["points"]) | \
+          ((most[:, 0] == best["points"]) & (chosen < best["chi2dof"]))
+      better &= (most[:, 0] > 0)
+
+      best["points"] = np.where(better, most[:, 0], best["points"])
+      best["chi2dof"] = np.where(better, chosen, best["chi2dof"])
+      best["slope"] = np.where(better, slope[rows, end], best["slope"])
+      best["intercept"] = np.where(better, intercept[rows, end], best["intercept"])
+      best["sSlope"] = np.where(better, np.sqrt(s/delta)[rows, end], best["sSlope"])
+      best["sIntercept"] = np.where(better, np.sqrt(sxx/delta)[rows, end], best["sIntercept"])
+      best["start"] = np.where(better, start[:, 0], best["start"])
+      best["end"] = np.where(better, end, best["end"])
+
+    found = best["points"] > 0
+    Rg = np.sqrt(-3*best["slope"])
+    I0 = np.exp(best["intercept"])
+
+    return {"file": list(batch.names), "Rg": Rg, "sRg": 1.5*best["sSlope"]/Rg, \
+        "I0": I0, "sI0": I0*best["sIntercept"], \
+        "qmin": np.where(found, q[rows, best["start"]], np.nan), \
+        "qmax": np.where(found, q[rows, best["end"]], np.nan), \
+        "points": best["points"].astype(int), \
+        "chi2dof": np.where(found, best["chi2dof"], np.nan)}
+
+# Análise de Porod de cada curva: K e B ajustados em qmin < q < qmax (por
+# padrão a última quarta parte dos pontos) e o invariante. Com guinier
+# (resultado de Guinier), o invariante inclui a extrapolação para q -> 0 e
+# o volume de Porod 2 pi**2 I(0)/Q é calculado. Retorna um dicionário de
+# arrays: K, sK, background, invariant, porodVolume.
+@profiling.Timed("porod")
+def Porod(data, qmin=None, qmax=None, guinier=None):
+
+  batch = AsBatch(data)
+  number = batch.Number()
+  profiling.Count("porod", curves=number)
+  q = np.broadcast_to(batch.q, batch.I.shape)
+  if(qmin is None):
+    qmin = q[:, (3*q.shape[1])//4][:, np.newaxis]
+  if(qmax is None):
+    qmax = np.inf
+
+  # Ajuste linear ponderado de I q**4 em função de q**4.
+  window = (q > qmin) & (q < qmax) & np.isfinite(batch.I) & (batch.sI > 0)
+  x = q**4
+  y = np.where(window, batch.I, 0)*x
+  w = np.where(window, 1/(np.where(window, batch.sI, 1)*x)**2, 0)
+
+  s = np.sum(w, axis=1)
+  sx = np.sum(w*x, axis=1)
+  sy = np.sum(w*y, axis=1)
+  sxx = np.sum(w*x*x, axis=1)
+  sxy = np.sum(w*x*y, axis=1)
+  with np.errstate(divide='ignore', invalid='ignore'):
+    delta = s*sxx - sx**2
+    background = (s*sxy - sx*sy)/delta
+    K = (sy - background*sx)/s
+    sK = np.sqrt(sxx/delta)
+
+  # Invariante no intervalo medido (regra do trapézio) e extrapolações:
+  # K/q para q -> infinito e a curva de Guinier para q -> 0.
+  measured = np.isfinite(batch.I)
+  integrand = np.where(measured, q**2*(batch.I - background[:, np.newaxis]), 0)
+  invariant = np.sum(0.5*(integrand[:, 1:] + integrand[:, :-1])*np.diff(q, axis=1), axis=1)
+  invariant += K/q[:, -1]
+
+  porodVolume = np.full(number, np.nan)
+  if(guinier is not None):
+    qLow = np.linspace(0, 1, 65)*q[:, :1]
+    low = qLow**2*guinier["I0"][:, np.newaxis]*np.exp(-(qLow*guinier["Rg"][:, np.newaxis])**2/3)
+    low = np.sum(0.5*(low[:, 1:] + low[:, :-1])*np.diff(qLow, axis=1), axis=1)
+    invariant += np.where(np.isfinite(low), low, 0)
+    porodVolume = 2*np.pi**2*guinier["I0"]/invariant
+
+  return {"file": list(batch.names), "K": K, "sK": sK, "background": background, \
+      "invariant": invariant, "porodVolume": porodVolume}
+
+# Análise completa (Guinier e Porod) de um lote: uma tabela (dicionário
+# de arrays) com uma posição por curva.
+def Analyze(data, guinierOptions=None, porodOptions=None):
+
+  batch = AsBatch(data)
+  table = Guinier(batch, **(guinierOptions or {}))
+  porod = Porod(batch, guinier=table, **(porodOptions or {}))
+  table.update(porod)
+
+  return table
+
+# Colunas da tabela salva por WriteAnalysis.
+ANALYSIS_COLUMNS = ("Rg", "sRg", "I0", "sI0", "qmin", "qmax", "points", "chi2dof", \
+    "K", "sK", "background", "invariant", "porodVolume")
+
+# Salva a tabela de Analyze (uma linha por curva).
+def WriteAnalysis(fileOutput, table):
+
+  with open(fileOutput, "w") as f:
+    f.write("# Guinier and Porod analysis.\n")
+    f.write("# file, " + ", ".join(ANALYSIS_COLUMNS) + "\n")
+    for k in range(len(table["Rg"])):
+      f.write(table["file"][k] + ", " + ", ".join(("%d" if column == "points" else "%.6e") % \
+          table[column][k] for column in ANALYSIS_COLUMNS) + "\n")
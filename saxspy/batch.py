@@ -0,0 +1,258 @@
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Interpolação das referências na escala q das amostras.
+from . import regrid
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+############### Define uma classe com várias curvas de SAXS empilhadas. ####################
+############################################################################################
+
+# As curvas são guardadas em arrays 2D (número de curvas, número de pontos).
+# Quando todas as curvas compartilham a mesma escala q, self.q é uma visão
+# (somente leitura) de uma única linha repetida, sem cópia dos dados.
+class SaxsBatch():
+
+  def __init__(self, number=0, size=0):
+
+    self.size = size
+    self.q = np.zeros((number, size))
+    self.I = np.zeros((number, size))
+    self.sI = np.zeros((number, size))
+    self.names = []
+    self.metadata = []
+
+  def ImportData(self, listFiles):
+
+    listData = []
+    for fileData in listFiles:
+      data = saxs.Saxs()
+      data.ImportData(fileData)
+      listData.append(data)
+
+    self.Stack(listData, names=listFiles)
+
+  # Empilha uma lista de objetos Saxs (todos com o mesmo número de pontos).
+  def Stack(self, listData, names=None):
+
+    sizes = set(data.Size() for data in listData)
+    if(len(sizes) > 1):
+      raise ValueError("SAXSPY Error: all curves of a batch must have the same number of points.")
+
+    q = np.array([data.q for data in listData], dtype=float)
+    if(len(q) > 0 and np.all(q == q[0])):
+      q = np.broadcast_to(q[0], q.shape)
+
+    self.q = q
+    self.I = np.array([data.I for data in listData], dtype=float)
+    self.sI = np.array([data.sI for data in listData], dtype=float)
+    self.size = q.shape[1] if (len(q) > 0) else 0
+
+    if(names is None):
+      names = [data.metadata.get("file", "") for data in listData]
+    self.names = list(names)
+    self.metadata = [data.metadata for data in listData]
+
+  # Retorna a curva k como um objeto Saxs (visões das linhas do lote).
+  def Curve(self, k):
+
+    data = saxs.Saxs()
+    data.q = self.q[k]
+    data.I = self.I[k]
+    data.sI = self.sI[k]
+    data.size = self.size
+    if(k < len(self.metadata)):
+      data.metadata = self.metadata[k]
+
+    return data
+
+  # Salva cada curva do lote em texto.
+  def ExportData(self, listOutput, header=""):
+
+    for k in range(self.Number()):
+      saxs.WriteData(listOutput[k], self.Curve(k), header=header)
+
+  def Number(self):
+
+    return self.I.shape[0]
+
+  def Size(self):
+
+    self.size = self.I.shape[1]
+
+    if((self.q.shape != self.I.shape) or (self.sI.shape != self.I.shape)):
+      print("\nSAXSPY Error: incompatibility in the size of the data arrays.\n")
+
+    return self.size
+
+########################################################################
+# Funções auxiliares.
+########################################################################
+
+# Importa uma lista de arquivos em um lote.
+def ReadBatch(listFiles):
+
+  batch = SaxsBatch()
+  batch.ImportData(listFiles)
+
+  return batch
+
+# Retorna um lote a partir de um SaxsBatch, de uma lista de objetos Saxs
+# ou de uma lista de arquivos.
+def AsBatch(data):
+
+  if(isinstance(data, SaxsBatch)):
+    return data
+
+  data = list(data)
+  if(all(isinstance(curve, str) for curve in data)):
+    return ReadBatch(data)
+
+  batch = SaxsBatch()
+  batch.Stack([saxs.AsSaxs(curve) for curve in data])
+
+  return batch
+
+# Converte um parâmetro (escalar ou um valor por curva) em uma coluna que
+# é propagada (broadcast) sobre os pontos de cada curva.
+def Column(value):
+
+  value = np.asarray(value, dtype=float)
+  if(value.ndim == 1):
+    value = value[:, np.newaxis]
+
+  return value
+
+# Retorna os arrays de intensidade de uma referência, que pode ser uma
+# única curva (Saxs, comum a todas as amostras) ou um lote, na escala q
+# das amostras (interpolada quando as escalas diferem).
+def ReferenceArrays(reference, q):
+
+  if(not isinstance(reference, (saxs.Saxs, SaxsBatch))):
+    reference = saxs.ImportReference(reference)
+
+  return regrid.ReferenceOnGrid(reference, q)
+
+# Salva as curvas corrigidas do lote, com nomes derivados das amostras
+# quando listOutput não é passado.
+def SaveBatch(correction, samples, listOutput, suffix, header):
+
+  if(listOutput == 0):
+    listOutput = [name.split(".")[0] + suffix for name in samples.names]
+
+  for k in range(correction.Number()):
+    saxs.WriteData(listOutput[k], correction.Curve(k), \
+        header=(header % samples.names[k]))
+
+########################################################################
+# Define as funções de correção em lote.
+########################################################################
+
+# Correção para o espalhamento do capilar, transmissão, espessura e
+# calibração da escala q de todas as curvas do lote. Os parâmetros podem
+# ser escalares ou arrays com um valor por amostra; o capilar pode ser um
+# único arquivo/curva comum ou um lote com uma curva por amostra. As
+# amostras podem ser um lote, uma lista de objetos Saxs ou de arquivos.
+@profiling.Timed("batch-cttq")
+def CorrectBatchTo_CTTq(
+    qSlope,
+    qIntercept,
+    samples,
+    transmissionSample,
+    thicknessSample,
+    capillary,
+    transmissionCapillary,
+    save=False,
+    listOutput=0):
+
+  samples = AsBatch(samples)
+  capillaryI, capillarysI = ReferenceArrays(capillary, samples.q)
+  transmissionSample = Column(transmissionSample)
+  thicknessSample = Column(thicknessSample)
+  transmissionCapillary = Column(transmissionCapillary)
+
+  profiling.Count("batch-cttq", curves=samples.Number())
+
+  correction = SaxsBatch()
+  correction.names = list(samples.names)
+  correction.metadata = list(samples.metadata)
+
+  # Correção da escala q.
+  correction.q = Column(qSlope)*samples.q + Column(qIntercept)
+
+  # Correção da intensidade pelo capilar, transmissão e espessura.
+  correction.I = (samples.I/transmissionSample - \
+      capillaryI/transmissionCapillary)/thicknessSample
+
+  # Cálculo da nova incerteza.
+  correction.sI = np.sqrt((samples.sI/transmissionSample)**2 + \
+      (capillarysI/transmissionCapillary)**2)/thicknessSample
+  correction.Size()
+
+  if(save):
+    SaveBatch(correction, samples, listOutput, "_cttqcorrected.dat", \
+        "# Corrected data file from: %s \n# q\t\t I\t\t sI\n")
+
+  return correction
+
+# Correção para o espalhamento do solvente de todas as curvas do lote.
+@profiling.Timed("batch-solvent")
+def CorrectBatchTo_Solvent(
+    samples,
+    solvent,
+    soluteVolumetricFraction,
+    save=False,
+    listOutput=0):
+
+  samples = AsBatch(samples)
+  solventI, solventsI = ReferenceArrays(solvent, samples.q)
+  solventFraction = 1 - Column(soluteVolumetricFraction)
+
+  profiling.Count("batch-solvent", curves=samples.Number())
+
+  correction = SaxsBatch()
+  correction.names = list(samples.names)
+  correction.metadata = list(samples.metadata)
+
+  correction.q = samples.q
+  correction.I = samples.I - solventFraction*solventI
+  correction.sI = np.sqrt((samples.sI)**2 + (solventFraction*solventsI)**2)
+  correction.Size()
+
+  if(save):
+    SaveBatch(correction, samples, listOutput, "_solventcorrected.dat", \
+        "# Corrected data (for solvent scattering) from file: %s \n# q\t\t I\t\t sI\n")
+
+  return correction
+
+# Correção para a escala absoluta de todas as curvas do lote.
+@profiling.Timed("batch-absolute-scale")
+def CorrectBatchTo_AbsoluteScale(
+    absoluteScaleFactor,
+    samples,
+    save=False,
+    listOutput=0,
+    sAbsoluteScaleFactor=0.0):
+
+  samples = AsBatch(samples)
+  absoluteScaleFactor = Column(absoluteScaleFactor)
+  sAbsoluteScaleFactor = Column(sAbsoluteScaleFactor)
+
+  profiling.Count("batch-absolute-scale", curves=samples.Number())
+
+  correction = SaxsBatch()
+  correction.names = list(samples.names)
+  correction.metadata = list(samples.metadata)
+
+  correction.q = samples.q
+  correction.I = samples.I/absoluteScaleFactor
+  correction.sI = np.sqrt((samples.sI/absoluteScaleFactor)**2 + \
+      (correction.I*sAbsoluteScaleFactor/absoluteScaleFactor)**2)
+  correction.Size()
+
+  if(save):
+    SaveBatch(correction, samples, listOutput, "_absolute.dat", \
+        "# Corrected data (absolute scale) from file: %s\n# q (A-1)\t\t I (cm-1)\t\t sI (cm-1)\n")
+
+  return correction
@@ -0,0 +1,485 @@
+import numpy as np
+# Ajuste de picos com derivadas analíticas.
+from . import peaks
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Calibração da escala q (padrão de behenato de prata) e da escala
+# absoluta (água). Funções numéricas, sem gráficos nem entrada do usuário;
+# usadas por q-ScaleFit.py, WaterFitScattering.py e pela linha de comando.
+# O scipy é importado apenas quando um ajuste é feito.
+########################################################################
+
+# Distância interplanar do behenato de prata, conforme Huang, et al (1993).
+BEHENATE_D001 = 58.3803 # Angstrom
+
+# Espalhamento da água em cm^-1, a 293K (Orthaber; Bergmann; Glatter, 2000).
+WATER_SCATTERING = 0.01632
+WATER_TEMPERATURE = 293.15 # K
+
+# Densidade (g/cm^3) e compressibilidade isotérmica (1/GPa) da água
+# líquida a 1 atm, de 0 a 80 graus Celsius (CRC Handbook). O espalhamento
+# em q -> 0 é proporcional a rho**2 * T * kappa_T; a tabela é normalizada
+# para WATER_SCATTERING a 293.15 K.
+WATER_TABLE = np.array([
+    # T (K)  densidade  kappa_T
+    [273.15, 0.99984, 0.5089],
+    [278.15, 0.99997, 0.4921],
+    [283.15, 0.99970, 0.4785],
+    [288.15, 0.99910, 0.4673],
+    [293.15, 0.99821, 0.4589],
+    [298.15, 0.99705, 0.4525],
+    [303.15, 0.99565, 0.4477],
+    [308.15, 0.99403, 0.4443],
+    [313.15, 0.99222, 0.4422],
+    [323.15, 0.98804, 0.4416],
+    [333.15, 0.98320, 0.4450],
+    [343.15, 0.97778, 0.4521],
+    [353.15, 0.97182, 0.4630]])
+
+# Espalhamento da água (cm^-1) em cada temperatura da tabela.
+WATER_REFERENCE = WATER_TABLE[:, 1]**2*WATER_TABLE[:, 0]*WATER_TABLE[:, 2]
+WATER_REFERENCE *= WATER_SCATTERING/np.interp(WATER_TEMPERATURE, WATER_TABLE[:, 0], WATER_REFERENCE)
+
+# Posições de referência (em q) dos picos de ordem 1, 2, ..., n do padrão.
+def ReferencePeaks(orders, d001=BEHENATE_D001):
+
+  return 2*np.pi*np.asarray(orders, dtype=float)/d001
+
+############################################################################################
+################ Faz o ajuste de uma lorentziana em um pico. ###############################
+############################################################################################
+
+# Lorentziana com deslocamento vertical, A/(1+((x-q0)/w)**2) + Imin.
+Lorentzian = peaks.Lorentzian
+
+# Retorna a lista [[q0, sq0], [w, sw], [A, sA], [Imin, sImin], [chi2dof, R2]].
+def FitLorentz(qran, data):
+
+  return peaks.FitPeaks(data, [qran]).FitResults(0)
+
+# Ajusta todos os picos de uma vez e retorna a lista de resultados de
+# cada pico (no formato de FitLorentz).
+def FitLorentzPeaks(peakRanges, data, profile="lorentzian"):
+
+  fit = peaks.FitPeaks(data, peakRanges, profile)
+
+  return [fit.FitResults(k) for k in range(fit.Number())]
+
+##########################################################################################
+############# Localiza automaticamente os picos de Bragg do padrão. ######################
+##########################################################################################
+
+# Localiza os picos das ordens 1, 2, ..., maxOrder do behenato de prata a
+# partir da distância interplanar esperada e escolhe o intervalo de ajuste
+# de cada um. A primeira ordem é procurada em torno da posição de
+# referência (com tolerância relativa tolerance); as seguintes em torno da
+# posição prevista pela escala q estimada com os picos já encontrados.
+# Um pico só é aceito se a sua altura acima do fundo local (na curva
+# suavizada por média móvel de smoothing pontos) for maior que
+# minSignificance vezes a incerteza no máximo e se a sua meia largura for
+# menor que maxWidth vezes a distância entre as ordens. O intervalo é o
+# centro +/- windowWidths meias larguras (estimadas na meia altura),
+# limitado a metade da distância até as ordens vizinhas.
+# Retorna as ordens encontradas e os intervalos [qmin, qmax].
+def FindBehenatePeaks(
+    data,
+    d001=BEHENATE_D001,
+    maxOrder=10,
+    tolerance=0.2,
+    minSignificance=10.0,
+    windowWidths=4.0,
+    minPoints=8,
+    smoothing=5,
+    maxWidth=0.1):
+
+  q, order = data.SortedQ()
+  if(order is None):
+    I, sI = data.I, data.sI
+  else:
+    I, sI = data.I[order], data.sI[order]
+
+  spacing = 2*np.pi/d001
+  orders = []
+  centers = []
+  peakRanges = []
+  slope, intercept = 1.0, 0.0
+
+  for n in range(1, maxOrder+1):
+    # Posição prevista (escala medida) e intervalo de busca.
+    expected = (n*spacing - intercept)/slope
+    if(not orders):
+      halfSearch = tolerance*expected
+    else:
+      halfSearch = 0.25*spacing/slope
+    if(expected - halfSearch > q[-1]):
+      break
+
+    search = np.arange(*data.RangeIndex(expected - halfSearch, expected + halfSearch))
+    if(len(search) < minPoints):
+      continue
+
+    # Máximo (da curva suavizada) e fundo local, dado pela reta entre as
+    # medianas das extremidades do intervalo de busca.
+    smooth = np.convolve(I[search], np.ones(smoothing)/smoothing, mode='same')
+    edge = max(len(search)//10, 2)
+    qEdges = [np.median(q[search[:edge]]), np.median(q[search[-edge:]])]
+    IEdges = [np.median(I[search[:edge]]), np.median(I[search[-edge:]])]
+    background = np.interp(q[search], qEdges, IEdges)
+    excess = smooth - background
+    top = np.argmax(excess[edge:-edge]) + edge
+    peak = search[top]
+    height = excess[top]
+    if(height < minSignificance*sI[peak]):
+      continue
+
+    # Meia largura na meia altura (dos dois lados do máximo); picos largos
+    # demais em relação à distância entre as ordens são descartados.
+    left = top
+    while(left > 0 and excess[left] > 0.5*height):
+      left -= 1
+    right = top
+    while(right < len(search) - 1 and excess[right] > 0.5*height):
+      right += 1
+    hwhm = max(0.5*(q[search[right]] - q[search[left]]), q[peak+1] - q[peak])
+    if(hwhm > maxWidth*spacing/slope):
+      continue
+
+    # Intervalo de ajuste.
+    halfWindow = min(windowWidths*hwhm, 0.5*spacing/slope)
+    window = [q[peak] - halfWindow, q[peak] + halfWindow]
+    start, end = data.RangeIndex(window[0], window[1])
+    if(end - start < minPoints):
+      continue
+
+    orders.append(n)
+    centers.append(q[peak])
+    peakRanges.append(window)
+
+    # Atualiza a estimativa da escala q com os picos encontrados.
+    reference = ReferencePeaks(orders, d001)
+    if(len(orders) == 1):
+      slope, intercept = reference[0]/centers[0], 0.0
+    else:
+      slope, intercept = np.polyfit(centers, reference, 1)
+
+  return orders, peakRanges
+
+# Calibração automática da escala q: localiza os picos e ajusta a
+# calibração, com o ajuste global (method="global", FitCalibrationGlobal)
+# ou com os ajustes independentes dos picos seguidos da reta de
+# calibração (method="linear", FitLorentzPeaks e LinearFit). Retorna as
+# ordens, os resultados de cada pico (formato de FitLorentz), os
+# coeficientes (formato de LinearFit) e a covariância 2x2 de (slope,
+# intercept), que pode ser passada a uncertainty.Propagate em blocks.
+def CalibrateQScale(data, d001=BEHENATE_D001, maxOrder=10, profile="lorentzian", \
+    method="global"):
+
+  orders, peakRanges = FindBehenatePeaks(data, d001, maxOrder)
+  if(len(orders) < 3):
+    raise ValueError("SAXSPY Error: only %d behenate peaks were found; at least 3 are needed." % len(orders))
+
+  if(method == "global"):
+    peakParameters, coefficients, covariance = FitCalibrationGlobal(data, \
+        peakRanges, orders, d001, profile)
+  else:
+    peakParameters = FitLorentzPeaks(peakRanges, data, profile)
+    peaksMeasured = [peak[0][0] for peak in peakParameters]
+    coefficients, covariance = LinearFit(peaksMeasured, ReferencePeaks(orders, d001), \
+        withCovariance=True)
+
+  return orders, peakParameters, coefficients, covariance
+
+##########################################################################################
+############# Faz o ajuste linear para calibrar a escala q. ##############################
+##########################################################################################
+
+# Retorna a lista [[slope, sslope], [intercept, sintercept], [chi2dof, R2]]
+# e, com withCovariance=True, também a covariância 2x2 de (slope, intercept).
+def LinearFit(x, y, withCovariance=False):
+
+  x = np.asarray(x, dtype=float)
+  y = np.asarray(y, dtype=float)
+  coeff, cov = np.polyfit(x, y, 1, cov=True)
+
+  ya = np.polyval(coeff, x)
+  ym = np.mean(y)
+  tss = np.sum(((y - ym))**2)
+  residuals = np.sum((ya - y)**2)
+  chi2dof = residuals/(len(x) - 2)
+  R2 = 1 - residuals/tss
+
+  coefficients = []
+  coefficients.append([coeff[0], np.sqrt(cov[0,0])])
+  coefficients.append([coeff[1], np.sqrt(cov[1,1])])
+  coefficients.append([chi2dof, R2])
+
+  if(withCovariance):
+    return coefficients, cov
+
+  return coefficients
+
+##########################################################################################
+############# Ajuste global da calibração com todos os picos. ############################
+##########################################################################################
+
+# Ajusta todos os picos de uma vez com a calibração como parâmetro
+# compartilhado: no pico de ordem n o perfil é avaliado na escala
+# calibrada x = slope*q + intercept, centrado na posição de referência
+# 2*pi*n/d001, com largura, amplitude e base próprias de cada pico.
+# Parâmetros: [slope, intercept, (w, A, Imin[, eta]) de cada pico]. A
+# covariância vem do jacobiano (analítico) do ajuste global, escalada pelo
+# chi-quadrado reduzido, e já inclui as incertezas dos centros dos picos.
+# Retorna os resultados de cada pico (formato de FitLorentz, com o centro
+# e a largura na escala medida), os coeficientes (formato de LinearFit,
+# com o chi-quadrado reduzido e o R2 do ajuste das intensidades) e a
+# covariância 2x2 de (slope, intercept).
+@profiling.Timed("fit-calibration", curves=1)
+def FitCalibrationGlobal(data, peakRanges, orders, d001=BEHENATE_D001, \
+    profile="lorentzian"):
+
+  import scipy.optimize as sco
+
+  model, jacobian = peaks.MODELS[profile]
+  size = len(peaks.PROFILES[profile]) - 1
+  number = len(peakRanges)
+  centers = ReferencePeaks(orders, d001)
+
+  # Concatena os pontos de todos os intervalos.
+  windows = [data.Window(qran[0], qran[1]) for qran in peakRanges]
+  counts = np.array([window.size for window in windows])
+  index = np.repeat(np.arange(number), counts)
+  q = np.concatenate([window.q for window in windows])
+  y = np.concatenate([window.I for window in windows])
+  s = np.concatenate([window.sI for window in windows])
+
+  # Chute inicial: reta pelos centros dos intervalos e, em cada pico,
+  # largura, amplitude e base estimadas a partir do intervalo.
+  middles = [0.5*(qran[0] + qran[1]) for qran in peakRanges]
+  slope, intercept = np.polyfit(middles, centers, 1)
+  guess = []
+  for k in range(number):
+    yk = y[index == k]
+    guess += [slope*(peakRanges[k][1] - peakRanges[k][0])/10, max(yk) - min(yk), min(yk)]
+    if(profile == "pseudo-voigt"):
+      guess.append(0.5)
+  p0 = np.concatenate(([slope, intercept], guess))
+
+  # Colunas do jacobiano ocupadas pelos parâmetros próprios de cada ponto.
+  rows = np.arange(len(q))[:, np.newaxis]
+  columns = 2 + index[:, np.newaxis]*size + np.arange(size)
+
+  def Arguments(p):
+    x = p[0]*q + p[1]
+    own = p[2:].reshape(number, size)[index].T
+    return x, own
+
+  def Residuals(p):
+    x, own = Arguments(p)
+    return (model(x, centers[index], *own) - y)/s
+
+  def Jacobian(p):
+    x, own = Arguments(p)
+    local = jacobian(x, centers[index], *own)/s[:, np.newaxis]
+    J = np.zeros((len(q), len(p)))
+    # O perfil depende de x - q0, então d/dx = -d/dq0.
+    J[:, 0] = -local[:, 0]*q
+    J[:, 1] = -local[:, 0]
+    J[rows, columns] = local[:, 1:]
+    return J
+
+  if(profile == "lorentzian"):
+    solution = sco.least_squares(Residuals, p0, jac=Jacobian, method='lm')
+  else:
+    lower = np.full(len(p0), -np.inf)
+    upper = np.full(len(p0), np.inf)
+    lower[2::size] = 0
+    lower[2+size-1::size] = 0
+    upper[2+size-1::size] = 1
+    p0 = np.clip(p0, lower + 1e-12, upper)
+    solution = sco.least_squares(Residuals, p0, jac=Jacobian, \
+        bounds=(lower, upper), method='trf', x_scale='jac')
+
+  profiling.Count("fit-calibration", iterations=solution.nfev)
+  p = solution.x
+  residuals = np.sum(solution.fun**2)
+  chi2dof = residuals/(len(q) - len(p))
+  covariance = np.linalg.pinv(solution.jac.T @ solution.jac)*chi2dof
+  uncertainties = np.sqrt(np.diag(covariance))
+
+  w = 1/s**2
+  ym = np.sum(w*y)/np.sum(w)
+  R2 = 1 - residuals/np.sum(((y - ym)/s)**2)
+
+  coefficients = [[p[0], uncertainties[0]], [p[1], uncertainties[1]], [chi2dof, R2]]
+
+  # Resultados de cada pico na escala medida: centro (q_n - intercept)/slope
+  # e largura w/slope, com as incertezas propagadas pela covariância.
+  peakParameters = []
+  for k in range(number):
+    j = 2 + k*size
+    center = (centers[k] - p[1])/p[0]
+    gradient = np.zeros(len(p))
+    gradient[0] = -center/p[0]
+    gradient[1] = -1/p[0]
+    scenter = np.sqrt(gradient @ covariance @ gradient)
+    width = abs(p[j])/p[0]
+    swidth = width*np.hypot(uncertainties[j]/p[j], uncertainties[0]/p[0])
+    yk = y[index == k]
+    rk = solution.fun[index == k]
+    wk = w[index == k]
+    ymk = np.sum(wk*yk)/np.sum(wk)
+    peak = [[center, scenter], [width, swidth]]
+    peak += [[p[j+i], uncertainties[j+i]] for i in range(1, size)]
+    peak.append([np.sum(rk**2)/(len(rk) - size), 1 - np.sum(rk**2)/np.sum(wk*(yk - ymk)**2)])
+    peakParameters.append(peak)
+
+  return peakParameters, coefficients, covariance[:2, :2]
+
+# Salva os resultados da calibração da escala q.
+# Com orders, os picos são identificados pela ordem de difração; com
+# covariance, a covariância de (slope, intercept) é salva após os
+# coeficientes (lida com ReadCalibration).
+def WriteCalibration(fileOutput, fileInput, peakParameters, coefficients, orders=None, \
+    covariance=None):
+
+  if(orders is None):
+    orders = range(1, len(peakParameters)+1)
+
+  with open(fileOutput, "w") as f:
+    f.write("# Results of q-scale calibration for the silver behenate standard.\n")
+    f.write("# Calibration using the data file \"%s\".\n" % fileInput)
+    f.write("# peak-center, peak-width, peak-amplitude, peak-base\n")
+
+    for i in range(len(peakParameters)):
+      f.write("# Fitting results for peak %d. reduced-chi-squared: %.3f; R-squared: %.3f;\n" % (orders[i], peakParameters[i][-1][0], peakParameters[i][-1][1]))
+      f.write("%.6e +/- %.1e, %.6e +/- %.1e, %.6e +/- %.1e, %.6e +/- %.1e\n" % \
+          (peakParameters[i][0][0], peakParameters[i][0][1], peakParameters[i][1][0], peakParameters[i][1][1], \
+          peakParameters[i][2][0], peakParameters[i][2][1], peakParameters[i][3][0], peakParameters[i][3][1]))
+
+    f.write("# Calibration curve. reduced-chi-squared: %.3f; R-squared: %.3f;\n" % (coefficients[2][0], coefficients[2][1]))
+    f.write("# slope, intercept\n")
+    f.write("%.6f +/- %.6f, %.6e +/- %.1e\n" % (coefficients[0][0], coefficients[0][1], coefficients[1][0], coefficients[1][1]))
+
+    if(covariance is not None):
+      f.write("# Covariance of slope and intercept\n")
+      for row in np.asarray(covariance, dtype=float):
+        f.write("# %.9e, %.9e\n" % (row[0], row[1]))
+
+# Lê a calibração salva por WriteCalibration. Retorna slope, intercept e a
+# covariância 2x2 (None se não foi salva), no formato usado por
+# uncertainty.Propagate: blocks=[(("qSlope", "qIntercept"), covariance)].
+def ReadCalibration(fileCalibration):
+
+  with open(fileCalibration, "r") as f:
+    lines = [line.strip() for line in f]
+
+  start = lines.index("# slope, intercept")
+  slope, intercept = [float(value.split("+/-")[0]) for value in lines[start+1].split(",")]
+
+  covariance = None
+  if("# Covariance of slope and intercept" in lines):
+    start = lines.index("# Covariance of slope and intercept")
+    covariance = np.array([[float(value) for value in line.lstrip("# ").split(",")] \
+        for line in lines[start+1:start+3]])
+
+  return slope, intercept, covariance
+
+########################################################################
+# Ajusta uma constante no espalhamento da água.
+########################################################################
+
+# Retorna a constante, sua incerteza e o chi-quadrado reduzido. A
+# constante é a média ponderada por 1/sI**2 (solução fechada do ajuste
+# de grau zero por mínimos quadrados).
+@profiling.Timed("fit-constant", curves=1)
+def FitConstant(data, qinf, qsup):
+
+  window = data.Window(qinf, qsup)
+  w = 1/window.sI**2
+
+  a0 = np.sum(w*window.I)/np.sum(w)
+  s0 = np.sqrt(1/np.sum(w))
+  chi2 = np.sum(w*(window.I - a0)**2)
+
+  return a0, s0, chi2/(window.size - 1)
+
+# Ajusta uma constante em cada curva de um lote (SaxsBatch, lista de
+# objetos Saxs ou de arquivos), de uma vez. Retorna arrays com as
+# constantes, suas incertezas e os chi-quadrados reduzidos.
+@profiling.Timed("fit-constant-batch")
+def FitConstantBatch(waters, qinf, qsup):
+
+  from .batch import AsBatch
+
+  waters = AsBatch(waters)
+  profiling.Count("fit-constant-batch", curves=waters.Number())
+
+  # Com uma escala q comum o intervalo é um conjunto de colunas; caso
+  # contrário os pontos fora do intervalo de cada curva têm peso nulo.
+  if(waters.q.strides[0] == 0):
+    start, end = waters.Curve(0).RangeIndex(qinf, qsup)
+    I = waters.I[:, start:end]
+    w = 1/waters.sI[:, start:end]**2
+    n = np.full(waters.Number(), end - start)
+  else:
+    window = (waters.q > qinf) & (waters.q < qsup)
+    I = waters.I
+    w = np.where(window, 1/waters.sI**2, 0)
+    n = np.count_nonzero(window, axis=1)
+
+  weights = np.sum(w, axis=1)
+  a0 = np.sum(w*I, axis=1)/weights
+  s0 = np.sqrt(1/weights)
+  chi2 = np.sum(w*(I - a0[:, np.newaxis])**2, axis=1)
+
+  return a0, s0, chi2/(n - 1)
+
+# Espalhamento da água (cm^-1) na temperatura T (K, escalar ou array),
+# interpolado na tabela.
+def WaterScattering(temperature=WATER_TEMPERATURE):
+
+  temperature = np.asarray(temperature, dtype=float)
+  if(np.any(temperature < WATER_TABLE[0, 0]) or np.any(temperature > WATER_TABLE[-1, 0])):
+    raise ValueError("SAXSPY Error: water temperature outside the table (%g K to %g K)." % \
+        (WATER_TABLE[0, 0], WATER_TABLE[-1, 0]))
+
+  return np.interp(temperature, WATER_TABLE[:, 0], WATER_REFERENCE)
+
+# Fatores de escala absoluta de um lote de medidas de água, cada uma na
+# sua temperatura (escalar ou um valor por medida). Retorna uma tabela
+# (dicionário de arrays, uma posição por medida) em que "factor" é o
+# argumento absoluteScaleFactor de CorrectTo_AbsoluteScale. Com reference
+# (cm^-1) a tabela de temperaturas não é usada.
+def AbsoluteScaleFactors(waters, qinf, qsup, temperature=WATER_TEMPERATURE, names=None, \
+    reference=None):
+
+  from .batch import AsBatch
+
+  waters = AsBatch(waters)
+  if(names is None):
+    names = waters.names
+
+  a0, s0, chi2dof = FitConstantBatch(waters, qinf, qsup)
+  temperature = np.broadcast_to(np.asarray(temperature, dtype=float), a0.shape)
+  if(reference is None):
+    reference = WaterScattering(temperature)
+  else:
+    reference = np.full(a0.shape, reference, dtype=float)
+
+  return {"file": list(names), "temperature": temperature, "water": a0, "sWater": s0, \
+      "chi2dof": chi2dof, "reference": reference, "factor": a0/reference, \
+      "sFactor": s0/reference}
+
+# Salva a tabela de fatores de escala absoluta.
+def WriteAbsoluteScaleFactors(fileOutput, table, qinf, qsup):
+
+  with open(fileOutput, "w") as f:
+    f.write("# Absolute-scale factors from water measurements (fit of a constant in %g < q < %g).\n" % \
+        (qinf, qsup))
+    f.write("# file, temperature (K), water, s-water, reduced-chi-squared, reference (cm-1), factor, s-factor\n")
+    for k in range(len(table["factor"])):
+      f.write("%s, %.2f, %.6e, %.1e, %.3f, %.5e, %.6e, %.1e\n" % (table["file"][k], \
+          table["temperature"][k], table["water"][k], table["sWater"][k], table["chi2dof"][k], \
+          table["reference"][k], table["factor"][k], table["sFactor"][k]))
@@ -0,0 +1,305 @@
+import sys
+import argparse
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+from . import parameters
+from . import runner
+
+########################################################################
+# Linha de comando do saxspy (python -m saxspy <subcomando> ...). Os
+# mesmos tratamentos dos programas interativos (MeanMaker.py,
+# q-ScaleFit.py, WaterFitScattering.py e os programas de correção), mas
+# com as entradas passadas como argumentos e sem janelas: os gráficos
+# só são feitos (e salvos em arquivo) quando --plot é passado.
+########################################################################
+
+# Converte um intervalo no formato 'menor:maior'.
+def Interval(text):
+
+  try:
+    least, largest = text.split(':')
+    return [float(least), float(largest)]
+  except ValueError:
+    raise argparse.ArgumentTypeError("interval must have the format 'least:largest'")
+
+# Salva o gráfico das curvas, se pedido.
+def Plot(arguments, listData, listLabels, **options):
+
+  if(arguments.plot):
+    from . import plotting
+    plotting.SavePlot(listData, listLabels, arguments.plot, **options)
+
+########################################################################
+# Subcomandos.
+########################################################################
+
+def Mean(arguments):
+
+  from .mean import MeanAccumulator, ExposureTime
+
+  listFiles = parameters.ImportListFiles(arguments.listFiles, arguments.directory)
+  accumulator = MeanAccumulator(chi2Threshold=arguments.chi2)
+  for fileData in listFiles:
+    data = saxs.ReadData(fileData)
+    if(not accumulator.Add(data, ExposureTime(data))):
+      print("Rejected frame: %s" % fileData)
+
+  mean = accumulator.Result()
+  saxs.WriteData(arguments.output, mean, \
+      header=("# Médias dos dados para calibração: %s.\n" % arguments.output) + \
+      "# q\t I(q)\t sI\n")
+  print("Mean of %d files (%d rejected) saved in %s." % \
+      (mean.metadata["frames"], mean.metadata["rejected"], arguments.output))
+
+  Plot(arguments, [mean], [arguments.output], title=u'Mean SAXS scattering intensity')
+
+def QScale(arguments):
+
+  from . import calibration
+
+  data = saxs.ReadData(arguments.input)
+  if(arguments.peak):
+    orders = list(range(1, len(arguments.peak)+1))
+    if(arguments.method == "global"):
+      peakParameters, coefficients, covariance = calibration.FitCalibrationGlobal(data, \
+          arguments.peak, orders, profile=arguments.profile)
+    else:
+      peakParameters = calibration.FitLorentzPeaks(arguments.peak, data, arguments.profile)
+      peaksMeasured = [peak[0][0] for peak in peakParameters]
+      coefficients, covariance = calibration.LinearFit(peaksMeasured, \
+          calibration.ReferencePeaks(orders), withCovariance=True)
+  else:
+    # Localiza os picos automaticamente.
+    orders, peakParameters, coefficients, covariance = calibration.CalibrateQScale(data, \
+        maxOrder=arguments.max_order, profile=arguments.profile, method=arguments.method)
+    print("Peaks found (orders): %s" % ", ".join(str(n) for n in orders))
+
+  calibration.WriteCalibration(arguments.output, arguments.input, peakParameters, \
+      coefficients, orders, covariance)
+  print("Slope: %.6f +/- %.6f   Intercept: %.5e +/- %.1e" % \
+      (coefficients[0][0], coefficients[0][1], coefficients[1][0], coefficients[1][1]))
+
+  Plot(arguments, [data], [arguments.input], title=u'Calibration standard')
+
+def Water(arguments):
+
+  from . import calibration
+
+  waters = [saxs.ReadData(fileData) for fileData in arguments.input]
+  table = calibration.AbsoluteScaleFactors(waters, arguments.qmin, arguments.qmax, \
+      arguments.temperature, names=arguments.input, reference=arguments.reference)
+
+  for k in range(len(waters)):
+    print('%s' % (arguments.input[k]))
+    print('Water scattering intensity (constant): %.5e +/- %.2e' % (table["water"][k], table["sWater"][k]))
+    print('Chi2 per degree of freedom: %.3e' % (table["chi2dof"][k]))
+    print("Normalization factor for the absolute scale: %.5e +/- %.1e" % \
+        (table["factor"][k], table["sFactor"][k]))
+
+  if(arguments.table):
+    calibration.WriteAbsoluteScaleFactors(arguments.table, table, arguments.qmin, arguments.qmax)
+
+  Plot(arguments, waters, arguments.input, title=u'Scattering intensity of water')
+
+def Correction(arguments):
+
+  if(arguments.command == "cttq"):
+    *rows, lineNumbers = parameters.ImportParameter_CTTq(arguments.parameters, withLines=True)
+    results, summary = runner.RunCTTq(rows, arguments.workers, arguments.executor, \
+        arguments.directory, lineNumbers)
+  elif(arguments.command == "solvent"):
+    *rows, lineNumbers = parameters.ImportParameter_Solvent(arguments.parameters, withLines=True)
+    results, summary = runner.RunSolvent(rows, arguments.workers, arguments.executor, \
+        arguments.directory, lineNumbers)
+  else:
+    *rows, lineNumbers = parameters.ImportParameter_AbsoluteScale(arguments.parameters, withLines=True)
+    results, summary = runner.RunAbsoluteScale(rows, arguments.workers, arguments.executor, \
+        arguments.directory, lineNumbers)
+
+  runner.PrintSummary(summary)
+
+  nameOutput = rows[-1]
+  corrected = [i for i in range(len(results)) if results[i] is not None]
+  Plot(arguments, [results[i] for i in corrected], [nameOutput[i] for i in corrected], \
+      title=u'Corrected SAXS scattering intensity')
+
+  return 1 if summary["failed"] else 0
+
+def Analysis(arguments):
+
+  from . import analysis
+
+  table = analysis.Analyze(arguments.input, \
+      guinierOptions={"qmin": arguments.qmin, "qRgMax": arguments.qrg_max}, \
+      porodOptions={"qmin": arguments.porod_qmin})
+  analysis.WriteAnalysis(arguments.output, table)
+
+  found = table["points"] > 0
+  print("Guinier range found for %d of %d curves." % (found.sum(), len(found)))
+
+  Plot(arguments, [saxs.ReadData(fileData) for fileData in arguments.input], arguments.input, \
+      title=u'SAXS scattering intensity')
+
+def Watch(arguments):
+
+  from .pipeline import Pipeline
+  from .watch import FolderWatcher
+
+  pipeline = Pipeline()
+  if(arguments.capillary):
+    pipeline.AddCTTq(arguments.q_slope, arguments.q_intercept, arguments.transmission_sample, \
+        arguments.thickness, arguments.capillary, arguments.transmission_capillary)
+  if(arguments.solvent):
+    pipeline.AddSolvent(arguments.solvent, arguments.fraction)
+  if(arguments.scale is not None):
+    pipeline.AddAbsoluteScale(arguments.scale)
+
+  def Report(watcher):
+    print("Mean of %d frames updated (latency %.3f s)." % \
+        (watcher.accumulator.frames, watcher.latency))
+
+  watcher = FolderWatcher(arguments.directory, arguments.pattern, \
+      pipeline if pipeline.stages else None, fileMean=arguments.mean, \
+      fileOutput=arguments.output, interval=arguments.interval, queueSize=arguments.queue, \
+      chi2Threshold=arguments.chi2, onUpdate=Report)
+  try:
+    statistics = watcher.Watch(arguments.duration)
+  except KeyboardInterrupt:
+    statistics = watcher.Statistics()
+
+  for fileData, error in watcher.errors:
+    print("Failed: %s (%s)" % (fileData, error))
+  print("%d frames (%d rejected) in %d updates; largest latency %.3f s." % \
+      (statistics["frames"], statistics["rejected"], statistics["updates"], statistics["maxLatency"]))
+
+  if(watcher.mean is not None):
+    Plot(arguments, [watcher.corrected or watcher.mean], [arguments.output or arguments.mean], \
+        title=u'Mean SAXS scattering intensity')
+
+  return 1 if watcher.errors else 0
+
+########################################################################
+# Definição dos argumentos.
+########################################################################
+
+def Parser():
+
+  parser = argparse.ArgumentParser(prog="saxspy", \
+      description="SAXS data treatment without interactive input.")
+  subparsers = parser.add_subparsers(dest="command", required=True)
+
+  command = subparsers.add_parser("mean", help="time-weighted mean of a list of detector files")
+  command.add_argument("listFiles", help="file with the list of data files")
+  command.add_argument("-d", "--directory", default="", help="directory of the data files")
+  command.add_argument("-o", "--output", required=True, help="output data file")
+  command.add_argument("--chi2", type=float, default=None, \
+      help="reject frames with reduced chi-squared (against the running mean) above this value")
+  command.set_defaults(function=Mean)
+
+  command = subparsers.add_parser("qscale", help="q-scale calibration with silver behenate")
+  command.add_argument("input", help="scattering data file of the standard")
+  command.add_argument("-o", "--output", required=True, help="output file with the calibration")
+  command.add_argument("-p", "--peak", type=Interval, action="append", default=None, \
+      help="q interval 'least:largest' of a peak (one per order, in order); " \
+      "without it the peaks are located automatically")
+  command.add_argument("--max-order", type=int, default=10, \
+      help="highest order searched when locating the peaks automatically")
+  command.add_argument("--profile", choices=("lorentzian", "pseudo-voigt"), default="lorentzian", \
+      help="peak profile")
+  command.add_argument("--method", choices=("global", "linear"), default="global", \
+      help="global fit of all peaks with shared calibration (default) or " \
+      "independent peak fits followed by a linear fit")
+  command.set_defaults(function=QScale)
+
+  command = subparsers.add_parser("water", help="absolute-scale factors from water measurements")
+  command.add_argument("input", nargs="+", help="water data files (pre-corrected)")
+  command.add_argument("--qmin", type=float, required=True, help="inferior limit of q")
+  command.add_argument("--qmax", type=float, required=True, help="upper limit of q")
+  command.add_argument("-T", "--temperature", type=float, default=293.15, \
+      help="temperature of the water in K (default: 293.15)")
+  command.add_argument("--reference", type=float, default=None, \
+      help="water scattering in cm-1 (default: from the temperature; 0.01632 at 293 K)")
+  command.add_argument("--table", default=None, metavar="FILE", \
+      help="save the table of absolute-scale factors in FILE")
+  command.set_defaults(function=Water)
+
+  for name, description in (("cttq", "capillary, transmission, thickness and q-scale correction"), \
+      ("solvent", "solvent scattering correction"), \
+      ("absolute", "absolute scale correction")):
+    command = subparsers.add_parser(name, help=description)
+    command.add_argument("parameters", help="parameters file")
+    command.add_argument("-j", "--workers", type=int, default=None, help="number of workers")
+    command.add_argument("--executor", choices=("process", "thread", "serial"), default="process")
+    command.add_argument("-d", "--directory", default="", help="directory of the output files")
+    command.set_defaults(function=Correction)
+
+  command = subparsers.add_parser("analysis", help="Guinier and Porod analysis of many curves")
+  command.add_argument("input", nargs="+", help="data files (absolute scale, same q grid)")
+  command.add_argument("-o", "--output", required=True, help="output file with the results table")
+  command.add_argument("--qmin", type=float, default=0.0, help="least q of the Guinier range")
+  command.add_argument("--qrg-max", type=float, default=1.3, help="largest q*Rg of the Guinier range")
+  command.add_argument("--porod-qmin", type=float, default=None, \
+      help="least q of the Porod fit (default: last quarter of the points)")
+  command.set_defaults(function=Analysis)
+
+  command = subparsers.add_parser("watch", \
+      help="running mean and corrections of the frames written in a directory")
+  command.add_argument("directory", help="directory where the detector writes the frames")
+  command.add_argument("--pattern", default="*.dat", help="pattern of the frame files (default: *.dat)")
+  command.add_argument("--mean", default=None, metavar="FILE", help="save the running mean in FILE")
+  command.add_argument("-o", "--output", default=None, help="save the corrected mean in this file")
+  command.add_argument("--chi2", type=float, default=None, \
+      help="reject frames with reduced chi-squared (against the running mean) above this value")
+  command.add_argument("--q-slope", type=float, default=1.0, help="slope of the q-scale calibration")
+  command.add_argument("--q-intercept", type=float, default=0.0, help="intercept of the q-scale calibration")
+  command.add_argument("--capillary", default=None, help="capillary data file (enables the CTTq correction)")
+  command.add_argument("--transmission-sample", type=float, default=1.0, help="transmission of the sample")
+  command.add_argument("--transmission-capillary", type=float, default=1.0, \
+      help="transmission of the capillary")
+  command.add_argument("--thickness", type=float, default=1.0, help="thickness of the sample")
+  command.add_argument("--solvent", default=None, help="solvent data file (enables the solvent correction)")
+  command.add_argument("--fraction", type=float, default=0.0, help="volumetric fraction of the solute")
+  command.add_argument("--scale", type=float, default=None, help="absolute-scale factor")
+  command.add_argument("--interval", type=float, default=0.5, help="seconds between directory checks")
+  command.add_argument("--queue", type=int, default=16, help="largest number of frames waiting")
+  command.add_argument("--duration", type=float, default=None, \
+      help="stop after this many seconds (default: until interrupted)")
+  command.set_defaults(function=Watch)
+
+  for command in subparsers.choices.values():
+    command.add_argument("--plot", default=None, metavar="FILE", \
+        help="save a plot of the result in FILE (no window is opened)")
+    command.add_argument("--timings", default=None, metavar="FILE", \
+        help="save the time, curves, bytes and fit iterations of each stage in FILE " \
+        "(JSON, or CSV if FILE ends in .csv)")
+
+  return parser
+
+def main(argv=None):
+
+  arguments = Parser().parse_args(argv)
+
+  if(not arguments.timings):
+    return Execute(arguments)
+
+  from . import profiling
+  profiling.Reset()
+  profiling.Enable()
+  try:
+    return Execute(arguments)
+  finally:
+    profiling.Disable()
+    profiling.Export(arguments.timings)
+
+# Executa o subcomando. Erros nos dados ou nos arquivos são mostrados como
+# mensagem (sem o traceback) e retornam status 1.
+def Execute(arguments):
+
+  try:
+    return arguments.function(arguments) or 0
+  except (ValueError, OSError) as error:
+    message = str(error)
+    if(not message.startswith("SAXSPY Error")):
+      message = "SAXSPY Error: %s" % message
+    print(message, file=sys.stderr)
+    return 1
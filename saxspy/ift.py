@@ -0,0 +1,220 @@
+import threading
+import collections
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Lotes de curvas de SAXS.
+from .batch import AsBatch
+# Chaves das escalas q.
+from .regrid import GridKey, Rows
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Transformada de Fourier indireta (IFT): distribuição de distâncias
+# P(r), 0 <= r <= Dmax, a partir da intensidade em escala absoluta,
+#
+#   I(q) = 4 pi integral P(r) sin(qr)/(qr) dr,
+#
+# com P(0) = P(Dmax) = 0 e regularização pela derivada segunda de P
+# (suavidade): minimiza sum(((A p - I)/sI)**2) + alpha |L p|**2.
+#
+# Como L (diferenças segundas nos pontos internos) é inversível, p = L^-1 z
+# leva ao problema padrão de Tikhonov em z, resolvido pela decomposição
+# em valores singulares de B = W A L^-1 (W = 1/sI). Com ela a solução, o
+# chi-quadrado e a validação cruzada generalizada (GCV, usada para
+# escolher alpha) saem para todos os alphas e todas as curvas com alguns
+# produtos de matrizes. A matriz A e L^-1 são guardadas em cache por
+# (escala q, Dmax, nr); com weights="common" a decomposição também é
+# guardada (pelas incertezas), e as curvas de uma série na mesma escala
+# usam uma única decomposição. Com weights="individual" cada curva tem a
+# sua própria ponderação e a decomposição não é guardada (não haveria
+# acertos, e as entradas úteis seriam descartadas).
+########################################################################
+
+class TransformCache():
+
+  def __init__(self, maxEntries=32):
+
+    self.maxEntries = maxEntries
+    self.entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+
+  # Retorna a entrada key, calculando-a com build() se não estiver no cache.
+  def Get(self, key, build):
+
+    with self.lock:
+      entry = self.entries.get(key)
+      if(entry is not None):
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+      self.misses += 1
+
+    entry = build()
+    for array in entry:
+      array.flags.writeable = False
+
+    with self.lock:
+      self.entries[key] = entry
+      while(len(self.entries) > self.maxEntries):
+        self.entries.popitem(last=False)
+
+    return entry
+
+  def Clear(self):
+
+    with self.lock:
+      self.entries.clear()
+      self.hits = 0
+      self.misses = 0
+
+  def Statistics(self):
+
+    with self.lock:
+      return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+transformCache = TransformCache()
+
+########################################################################
+# Matrizes da transformada.
+########################################################################
+
+# Escala r (nr pontos de 0 a Dmax), matriz A (pontos de q x pontos
+# internos de r) e L^-1 (inversa das diferenças segundas).
+def TransformMatrices(q, Dmax, nr):
+
+  q = np.asarray(q, dtype=float)
+
+  def Build():
+    r = np.linspace(0, Dmax, nr)
+    dr = r[1] - r[0]
+    A = 4*np.pi*dr*np.sinc(np.outer(q, r[1:-1])/np.pi)
+    L = -2*np.eye(nr - 2) + np.eye(nr - 2, k=1) + np.eye(nr - 2, k=-1)
+    return r, A, np.linalg.inv(L)
+
+  return transformCache.Get(("matrices", GridKey(q), float(Dmax), int(nr)), Build)
+
+# Decomposição em valores singulares de W A L^-1 para as incertezas sI
+# (guardada em cache somente com cache=True).
+def Decomposition(q, sI, Dmax, nr, cache=True):
+
+  r, A, Linv = TransformMatrices(q, Dmax, nr)
+
+  def Build():
+    U, s, Vt = np.linalg.svd((A/sI[:, np.newaxis]) @ Linv, full_matrices=False)
+    return U, s, Linv @ Vt.T
+
+  if(not cache):
+    return Build()
+
+  return transformCache.Get(("svd", GridKey(q), GridKey(sI), float(Dmax), int(nr)), Build)
+
+# Resolve o problema regularizado para as curvas b (uma por linha, já
+# divididas por sI) com a decomposição (U, s, M = L^-1 V). Com alpha=None,
+# alpha é escolhido por GCV entre alphas. Retorna p, sP, alpha e chi2dof.
+def Solve(b, U, s, M, alpha=None, alphas=None):
+
+  n = b.shape[1]
+  if(alpha is not None):
+    alphas = np.array([alpha], dtype=float)
+  elif(alphas is None):
+    alphas = s[0]**2*np.logspace(-12, 0, 61)
+
+  beta = b @ U
+  outside = np.sum(b**2, axis=1) - np.sum(beta**2, axis=1)
+
+  # Filtros f = s**2/(s**2 + alpha) de cada alpha (alphas x valores singulares).
+  f = s**2/(s**2 + alphas[:, np.newaxis])
+  residuals = np.maximum(outside + ((1 - f)**2) @ (beta**2).T, 0).T
+  dof = n - np.sum(f, axis=1)
+  best = np.argmin(n*residuals/dof**2, axis=1)
+
+  c = s/(s**2 + alphas[best, np.newaxis])
+  p = (beta*c) @ M.T
+  sP = np.sqrt(c**2 @ (M**2).T)
+
+  return p, sP, alphas[best], residuals[np.arange(len(b)), best]/dof[best]
+
+########################################################################
+# IFT de uma curva ou de um lote.
+########################################################################
+
+# P(r) de cada curva (Saxs, SaxsBatch, lista de curvas ou de arquivos) na
+# mesma escala q. Pontos com I ou sI inválidos em alguma curva são
+# excluídos de todas. Com weights="individual" cada curva é ponderada
+# pelas suas incertezas; com weights="common" todas usam a incerteza
+# quadrática média do lote (uma única decomposição para a série). Retorna
+# um dicionário: r, P e sP (curvas x nr), q e fit (intensidade ajustada),
+# alpha, chi2dof, Rg e I0 (uma posição por curva).
+@profiling.Timed("ift")
+def IFT(data, Dmax, nr=50, alpha=None, weights="individual"):
+
+  if(isinstance(data, (str, saxs.Saxs))):
+    data = [data]
+  batch = AsBatch(data)
+  q = Rows(batch.q)
+  if(q.ndim != 1):
+    raise ValueError("SAXSPY Error: the IFT of a batch needs a common q grid.")
+
+  I = np.atleast_2d(batch.I)
+  sI = np.broadcast_to(batch.sI, I.shape)
+  valid = np.all(np.isfinite(I) & np.isfinite(sI) & (sI > 0), axis=0)
+  q, I, sI = q[valid], I[:, valid], sI[:, valid]
+
+  number = len(I)
+  profiling.Count("ift", curves=number)
+  P = np.zeros((number, nr))
+  sP = np.zeros((number, nr))
+  alphas = np.zeros(number)
+  chi2dof = np.zeros(number)
+
+  if(weights == "common"):
+    groups = [(np.sqrt(np.mean(sI**2, axis=0)), np.arange(number))]
+  elif(weights == "individual"):
+    groups = [(sI[k], np.array([k])) for k in range(number)]
+  else:
+    raise ValueError("SAXSPY Error: weights must be 'individual' or 'common'.")
+
+  for errors, curves in groups:
+    U, s, M = Decomposition(q, errors, Dmax, nr, cache=(weights == "common"))
+    p, sp, a, chi2 = Solve(I[curves]/errors, U, s, M, alpha)
+    P[curves, 1:-1] = p
+    sP[curves, 1:-1] = sp
+    alphas[curves] = a
+    chi2dof[curves] = chi2
+
+  r, A, Linv = TransformMatrices(q, Dmax, nr)
+  area = np.sum(0.5*(P[:, 1:] + P[:, :-1]), axis=1)*(r[1] - r[0])
+  second = np.sum(0.5*(r[1:]**2*P[:, 1:] + r[:-1]**2*P[:, :-1]), axis=1)*(r[1] - r[0])
+
+  return {"file": list(batch.names), "r": r, "P": P, "sP": sP, "q": q, \
+      "fit": P[:, 1:-1] @ A.T, "alpha": alphas, "chi2dof": chi2dof, \
+      "Rg": np.sqrt(second/(2*area)), "I0": 4*np.pi*area}
+
+# Retorna P(r) da curva k do resultado de IFT como objeto Saxs (q = r,
+# I = P, sI = sP), para salvar com WriteData ou fazer o gráfico.
+def PairDistribution(result, k=0):
+
+  distribution = saxs.Saxs()
+  distribution.q = result["r"]
+  distribution.I = result["P"][k]
+  distribution.sI = result["sP"][k]
+  distribution.size = len(result["r"])
+  distribution.metadata = {"file": result["file"][k], "alpha": float(result["alpha"][k]), \
+      "chi2dof": float(result["chi2dof"][k]), "Rg": float(result["Rg"][k]), \
+      "I0": float(result["I0"][k])}
+
+  return distribution
+
+# Salva P(r) da curva k.
+def WritePairDistribution(fileOutput, result, k=0):
+
+  distribution = PairDistribution(result, k)
+  saxs.WriteData(fileOutput, distribution, \
+      header=("# Pair-distance distribution function from file: %s\n" % result["file"][k]) + \
+      ("# Dmax: %g; alpha: %.3e; reduced-chi-squared: %.3f; Rg: %.4g; I(0): %.4e\n" % \
+      (result["r"][-1], result["alpha"][k], result["chi2dof"][k], result["Rg"][k], result["I0"][k])) + \
+      "# r (A)\t\t P(r)\t\t sP(r)\n")
@@ -0,0 +1,164 @@
+import hashlib
+import collections
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+# Tempo de medida lido do cabeçalho do arquivo do detector, exigido na
+# média pesada pelo tempo (uma medida sem tempo teria peso arbitrário).
+def ExposureTime(frame):
+
+  time = frame.metadata.get("time")
+  if(time is None):
+    raise ValueError("SAXSPY Error: %s has no exposure time in the header." % \
+        frame.metadata.get("file", "frame"))
+
+  return float(time)
+
+############### Média incremental de medidas de SAXS. ######################################
+############################################################################################
+
+# Acumula a média pesada pelo tempo de medida, como em MeanMaker.SAXSMean,
+# guardando apenas as somas (memória proporcional ao número de pontos)
+# e uma chave de 16 bytes por medida:
+#   I = sum(t*I)/sum(t),  sI = sqrt(sum((t*sI)**2))/sum(t).
+# Medidas podem ser adicionadas, removidas (somente as que foram
+# adicionadas, reconhecidas pela chave) e acumuladores parciais (por
+# exemplo, calculados em paralelo, na mesma escala q) podem ser
+# combinados com Merge.
+# Com chi2Threshold, uma medida cujo chi-quadrado reduzido em relação à
+# média corrente excede o limite é rejeitada (a partir de minFrames
+# medidas aceitas).
+class MeanAccumulator():
+
+  def __init__(self, chi2Threshold=None, minFrames=3):
+
+    self.chi2Threshold = chi2Threshold
+    self.minFrames = minFrames
+    self.Reset()
+
+  def Reset(self):
+
+    self.rejected = 0
+    self.ResetSums()
+
+  # Zera as somas (mantém a contagem de medidas rejeitadas).
+  def ResetSums(self):
+
+    self.frames = 0
+    self.keys = collections.Counter()
+    self.timeTotal = 0.0
+    self.qSum = 0
+    self.ISum = 0
+    self.sI2Sum = 0
+
+  # Tempo de medida (em segundos) do objeto Saxs, lido do cabeçalho
+  # (ExposureTime) quando não é passado explicitamente.
+  def FrameTime(self, frame, time):
+
+    if(time is None):
+      return ExposureTime(frame)
+
+    return float(time)
+
+  # Chave de uma medida adicionada: tempo e hash de q, I e sI.
+  def FrameKey(self, frame, time):
+
+    digest = hashlib.blake2b(np.float64(time).tobytes(), digest_size=16)
+    for column in (frame.q, frame.I, frame.sI):
+      digest.update(np.ascontiguousarray(column, dtype=float).tobytes())
+
+    return digest.digest()
+
+  # Verifica se a escala q de outra medida (ou acumulador) é a mesma.
+  def CheckGrid(self, q):
+
+    mean = self.qSum/self.timeTotal
+    if(np.shape(q) != np.shape(mean) or not np.allclose(q, mean)):
+      raise ValueError("SAXSPY Error: the q scale differs from the q scale of the mean.")
+
+  # Chi-quadrado reduzido da medida em relação à média corrente.
+  def Chi2(self, frame):
+
+    I = self.ISum/self.timeTotal
+    sI2 = self.sI2Sum/self.timeTotal**2
+
+    return np.mean((frame.I - I)**2/(frame.sI**2 + sI2))
+
+  # Adiciona uma medida à média. Retorna False se a medida foi rejeitada.
+  @profiling.Timed("mean", curves=1)
+  def Add(self, frame, time=None):
+
+    time = self.FrameTime(frame, time)
+
+    if((self.chi2Threshold is not None) and (self.frames >= self.minFrames)):
+      if(self.Chi2(frame) > self.chi2Threshold):
+        self.rejected += 1
+        return False
+
+    self.frames += 1
+    self.keys[self.FrameKey(frame, time)] += 1
+    self.timeTotal += time
+    self.qSum = self.qSum + time*frame.q
+    self.ISum = self.ISum + time*frame.I
+    self.sI2Sum = self.sI2Sum + (time*frame.sI)**2
+
+    return True
+
+  # Remove uma medida adicionada anteriormente (com o mesmo tempo). Uma
+  # medida rejeitada ou que não foi adicionada é um erro.
+  def Remove(self, frame, time=None):
+
+    time = self.FrameTime(frame, time)
+    key = self.FrameKey(frame, time)
+    if(self.keys[key] == 0):
+      raise ValueError("SAXSPY Error: %s was not added to the mean." % \
+          frame.metadata.get("file", "frame"))
+
+    self.keys[key] -= 1
+    if(self.keys[key] == 0):
+      del self.keys[key]
+    self.frames -= 1
+    if(self.frames <= 0):
+      self.ResetSums()
+      return
+
+    self.timeTotal -= time
+    self.qSum = self.qSum - time*frame.q
+    self.ISum = self.ISum - time*frame.I
+    self.sI2Sum = np.maximum(self.sI2Sum - (time*frame.sI)**2, 0)
+
+  # Combina as somas de outro acumulador (mesma escala q).
+  def Merge(self, other):
+
+    if(other.frames == 0):
+      self.rejected += other.rejected
+      return
+    if(self.frames > 0):
+      self.CheckGrid(other.qSum/other.timeTotal)
+
+    self.frames += other.frames
+    self.keys.update(other.keys)
+    self.rejected += other.rejected
+    self.timeTotal += other.timeTotal
+    self.qSum = self.qSum + other.qSum
+    self.ISum = self.ISum + other.ISum
+    self.sI2Sum = self.sI2Sum + other.sI2Sum
+
+  # Retorna a média atual como um objeto Saxs.
+  def Result(self):
+
+    if(self.frames == 0):
+      raise ValueError("SAXSPY Error: no frames were added to the mean.")
+
+    mean = saxs.Saxs()
+    mean.q = self.qSum/self.timeTotal
+    mean.I = self.ISum/self.timeTotal
+    mean.sI = np.sqrt(self.sI2Sum)/self.timeTotal
+    mean.size = len(mean.q)
+    mean.metadata = {"time": self.timeTotal, "frames": self.frames, \
+        "rejected": self.rejected}
+
+    return mean
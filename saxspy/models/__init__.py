@@ -0,0 +1,3 @@
+# Modelos de fatores de forma e ajuste em lote.
+from .formfactors import MODELS, Sphere, CoreShell, Cylinder, Ellipsoid, GaussianChain
+from .fitting import ModelFit, FitModel
@@ -0,0 +1,195 @@
+import numpy as np
+# Lotes de curvas de SAXS.
+from ..batch import AsBatch
+# Fatores de forma.
+from .formfactors import MODELS
+# Medidas de desempenho (desligadas por padrão).
+from .. import profiling
+
+########################################################################
+# Ajuste de um mesmo modelo a muitas curvas de uma vez, por Levenberg-
+# Marquardt em lote: os resíduos ponderados (curvas x pontos), os
+# jacobianos (curvas x pontos x parâmetros) e as equações normais são
+# calculados para todas as curvas juntas e cada curva tem o seu próprio
+# fator de amortecimento, aceitando ou rejeitando o passo. Os parâmetros
+# com limite inferior (tamanhos, escala) são mantidos acima dele.
+########################################################################
+
+############### Resultado do ajuste de modelos. ############################################
+############################################################################################
+
+# parameters, uncertainties: (número de curvas, número de parâmetros);
+# covariance: (curvas, parâmetros, parâmetros), escalada pelo chi-quadrado
+# reduzido como em curve_fit; chi2dof, iterations, converged: um valor
+# por curva (converged é False para os ajustes interrompidos sem
+# convergir: amortecimento excessivo ou maxIterations).
+class ModelFit():
+
+  def __init__(self, model, parameters, covariance, chi2dof, iterations, converged, names=None):
+
+    self.model = model
+    self.names = MODELS[model][0]
+    self.parameters = parameters
+    self.covariance = covariance
+    self.uncertainties = np.sqrt(np.abs(np.diagonal(covariance, axis1=1, axis2=2)))
+    self.chi2dof = chi2dof
+    self.iterations = iterations
+    self.converged = converged
+    self.files = list(names) if names is not None else []
+
+  def Number(self):
+
+    return len(self.parameters)
+
+  # Parâmetro pelo nome e sua incerteza (um valor por curva).
+  def Parameter(self, name):
+
+    j = self.names.index(name)
+
+    return self.parameters[:, j], self.uncertainties[:, j]
+
+  # Curva ajustada k avaliada em q.
+  def Evaluate(self, k, q):
+
+    return MODELS[self.model][1](q, *self.parameters[k])
+
+########################################################################
+# Ajuste.
+########################################################################
+
+# Chute inicial a partir da análise de Guinier (I(0) e Rg de cada curva).
+def InitialGuess(model, batch):
+
+  from ..analysis import Guinier
+
+  guinier = Guinier(batch)
+  I0 = np.where(np.isfinite(guinier["I0"]), guinier["I0"], np.nanmax(batch.I, axis=1))
+  Rg = np.where(np.isfinite(guinier["Rg"]), guinier["Rg"], 1/np.max(batch.q))
+  zero = np.zeros(len(I0))
+
+  if(model == "sphere"):
+    columns = (I0, np.sqrt(5/3)*Rg, zero)
+  elif(model == "core-shell"):
+    R = np.sqrt(5/3)*Rg
+    columns = (I0, 0.8*R, 0.2*R, np.ones(len(I0)), zero)
+  elif(model == "cylinder"):
+    # Cilindro com L = 4R: Rg**2 = R**2/2 + L**2/12.
+    R = Rg/np.sqrt(0.5 + 16/12)
+    columns = (I0, R, 4*R, zero)
+  elif(model == "ellipsoid"):
+    # Elipsoide prolato com Rp = 2 Re: Rg**2 = (2 Re**2 + Rp**2)/5 (com
+    # Re = Rp o chute estaria sobre um ponto de sela).
+    Re = np.sqrt(5/6)*Rg
+    columns = (I0, Re, 2*Re, zero)
+  else:
+    columns = (I0, Rg, zero)
+
+  return np.column_stack(columns)
+
+# Ajusta o modelo a cada curva (SaxsBatch, lista de curvas ou de
+# arquivos). p0: chute inicial (um vetor comum ou um por curva; por padrão
+# a partir da análise de Guinier); fixed: índices dos parâmetros mantidos
+# fixos; qmin, qmax: intervalo de q usado. As curvas são processadas em
+# blocos de chunkSize curvas para limitar a memória dos modelos com média
+# de orientação.
+@profiling.Timed("fit-model")
+def FitModel(data, model, p0=None, fixed=(), qmin=0.0, qmax=np.inf, maxIterations=100, \
+    tolerance=1e-8, chunkSize=64):
+
+  names, function, jacobian, lower = MODELS[model]
+  batch = AsBatch(data)
+  number = batch.Number()
+  size = len(names)
+
+  if(p0 is None):
+    p0 = InitialGuess(model, batch)
+  p0 = np.array(np.broadcast_to(np.asarray(p0, dtype=float), (number, size)))
+  lower = np.array(lower, dtype=float)
+  free = np.ones(size, dtype=bool)
+  free[list(fixed)] = False
+
+  q = np.broadcast_to(batch.q, batch.I.shape)
+  window = (q > qmin) & (q < qmax) & np.isfinite(batch.I) & np.isfinite(batch.sI) & (batch.sI > 0)
+
+  parameters = np.zeros((number, size))
+  covariance = np.zeros((number, size, size))
+  chi2dof = np.zeros(number)
+  iterations = np.zeros(number, dtype=int)
+  converged = np.zeros(number, dtype=bool)
+
+  for start in range(0, number, chunkSize):
+    chunk = slice(start, start + chunkSize)
+    result = FitChunk(function, jacobian, lower, free, q[chunk], batch.I[chunk], \
+        batch.sI[chunk], window[chunk], p0[chunk], maxIterations, tolerance)
+    parameters[chunk], covariance[chunk], chi2dof[chunk], iterations[chunk], converged[chunk] = result
+
+  profiling.Count("fit-model", curves=number, iterations=int(np.sum(iterations)))
+
+  return ModelFit(model, parameters, covariance, chi2dof, iterations, converged, batch.names)
+
+# Levenberg-Marquardt em um bloco de curvas.
+def FitChunk(function, jacobian, lower, free, q, I, sI, window, p, maxIterations, tolerance):
+
+  number, size = p.shape
+  w = np.where(window, 1/np.where(window, sI, 1), 0)
+  y = np.where(window, I, 0)
+
+  def Columns(p):
+    return [p[:, j, np.newaxis] for j in range(size)]
+
+  def Residuals(p):
+    return (function(q, *Columns(p)) - y)*w
+
+  def Cost(r):
+    return np.sum(r**2, axis=1)
+
+  r = Residuals(p)
+  cost = Cost(r)
+  damping = np.full(number, 1e-3)
+  active = np.ones(number, dtype=bool)
+  converged = np.zeros(number, dtype=bool)
+  iterations = np.zeros(number, dtype=int)
+  identity = np.eye(size)
+
+  for _ in range(maxIterations):
+    if(not np.any(active)):
+      break
+    iterations += active
+
+    J = jacobian(q, *Columns(p))*w[..., np.newaxis]*free
+    JTJ = np.einsum('cni,cnj->cij', J, J)
+    gradient = np.einsum('cni,cn->ci', J, r)
+
+    # Parâmetros fixos: linha e coluna da identidade (passo nulo).
+    diagonal = np.diagonal(JTJ, axis1=1, axis2=2)
+    scaling = np.where(diagonal > 0, diagonal, 1)
+    matrix = JTJ + damping[:, np.newaxis, np.newaxis]*scaling[:, np.newaxis, :]*identity + \
+        (~free)*identity
+    step = -np.linalg.solve(matrix, gradient[..., np.newaxis])[..., 0]
+
+    trial = np.maximum(p + step*active[:, np.newaxis], lower)
+    trialResiduals = Residuals(trial)
+    trialCost = Cost(trialResiduals)
+
+    accepted = active & np.isfinite(trialCost) & (trialCost < cost)
+    change = np.where(accepted, (cost - trialCost)/np.maximum(cost, 1e-300), 0)
+    p = np.where(accepted[:, np.newaxis], trial, p)
+    r = np.where(accepted[:, np.newaxis], trialResiduals, r)
+    cost = np.where(accepted, trialCost, cost)
+    damping = np.where(accepted, damping/10, damping*10)
+
+    # Convergência: pouca variação do custo em um passo aceito. Com
+    # amortecimento tão grande que o passo é desprezível o ajuste é
+    # interrompido sem convergir.
+    success = accepted & (change < tolerance)
+    converged |= success
+    active &= ~(success | (damping > 1e12))
+
+  # Covariância dos parâmetros livres, escalada pelo chi-quadrado reduzido.
+  J = jacobian(q, *Columns(p))*w[..., np.newaxis]*free
+  JTJ = np.einsum('cni,cnj->cij', J, J)
+  dof = np.count_nonzero(window, axis=1) - np.count_nonzero(free)
+  chi2dof = cost/dof
+  covariance = np.linalg.pinv(JTJ)*chi2dof[:, np.newaxis, np.newaxis]
+
+  return p, covariance, chi2dof, iterations, converged
@@ -0,0 +1,215 @@
+import numpy as np
+
+########################################################################
+# Fatores de forma (intensidade = scale * P(q) + background, P(0) = 1).
+# Todos os modelos são avaliados de uma vez sobre q e sobre arrays de
+# parâmetros: q pode ser 1D (pontos) ou 2D (curvas x pontos) e cada
+# parâmetro um escalar ou uma coluna (curvas x 1). Os jacobianos têm os
+# parâmetros no último eixo e são analíticos, exceto o da esfera com
+# casca (diferenças centrais). Cilindro e elipsoide são médias sobre as
+# orientações, integradas por quadratura de Gauss-Legendre. O scipy é
+# importado apenas pelo cilindro (funções de Bessel).
+########################################################################
+
+# Nós e pesos de Gauss-Legendre em [0, 1] para as médias de orientação.
+QUADRATURE_POINTS = 76
+NODES, WEIGHTS = np.polynomial.legendre.leggauss(QUADRATURE_POINTS)
+NODES = 0.5*(NODES + 1)
+WEIGHTS = 0.5*WEIGHTS
+
+# Abaixo deste argumento as funções usam a expansão em série.
+SMALL = 1e-3
+
+########################################################################
+# Funções auxiliares.
+########################################################################
+
+# Amplitude da esfera 3(sin x - x cos x)/x**3 e sua derivada em x.
+def SphereAmplitude(x):
+
+  x = np.asarray(x, dtype=float)
+  small = np.abs(x) < SMALL
+  y = np.where(small, 1, x)
+  F = 3*(np.sin(y) - y*np.cos(y))/y**3
+
+  return np.where(small, 1 - x**2/10, F)
+
+def SphereAmplitudeDerivative(x):
+
+  x = np.asarray(x, dtype=float)
+  small = np.abs(x) < SMALL
+  y = np.where(small, 1, x)
+  dF = 3*np.sin(y)/y**2 - 3*SphereAmplitude(y)/y
+
+  return np.where(small, -x/5, dF)
+
+# Função de Debye 2(exp(-x) + x - 1)/x**2 e sua derivada em x.
+def Debye(x):
+
+  x = np.asarray(x, dtype=float)
+  small = np.abs(x) < SMALL
+  y = np.where(small, 1, x)
+  P = 2*(np.exp(-y) + y - 1)/y**2
+
+  return np.where(small, 1 - x/3 + x**2/12, P)
+
+def DebyeDerivative(x):
+
+  x = np.asarray(x, dtype=float)
+  small = np.abs(x) < SMALL
+  y = np.where(small, 1, x)
+  dP = 2*(1 - np.exp(-y))/y**2 - 4*(np.exp(-y) + y - 1)/y**3
+
+  return np.where(small, -1/3 + x/6, dP)
+
+# Jacobiano por diferenças centrais (parâmetros no último eixo).
+def NumericJacobian(function, q, parameters):
+
+  columns = []
+  for j in range(len(parameters)):
+    p = np.asarray(parameters[j], dtype=float)
+    h = 1e-6*np.maximum(np.abs(p), 1e-3)
+    plus = list(parameters)
+    minus = list(parameters)
+    plus[j] = p + h
+    minus[j] = p - h
+    columns.append((function(q, *plus) - function(q, *minus))/(2*h))
+
+  return np.stack(columns, axis=-1)
+
+########################################################################
+# Modelos.
+########################################################################
+
+# Esfera homogênea de raio R.
+def Sphere(q, scale, R, background):
+
+  return scale*SphereAmplitude(q*R)**2 + background
+
+def SphereJacobian(q, scale, R, background):
+
+  F = SphereAmplitude(q*R)
+  dI = scale*2*F*SphereAmplitudeDerivative(q*R)*q
+
+  return np.stack(np.broadcast_arrays(F**2, dI, np.ones_like(F)), axis=-1)
+
+# Esfera com casca: núcleo de raio R, casca de espessura t e razão de
+# contrastes ratio = (rho_núcleo - rho_casca)/(rho_casca - rho_solvente).
+def CoreShell(q, scale, R, t, ratio, background):
+
+  Vcore = R**3
+  Vtotal = (R + t)**3
+  A = (ratio*Vcore*SphereAmplitude(q*R) + Vtotal*SphereAmplitude(q*(R + t)))/ \
+      (ratio*Vcore + Vtotal)
+
+  return scale*A**2 + background
+
+def CoreShellJacobian(q, *parameters):
+
+  return NumericJacobian(CoreShell, q, parameters)
+
+# Termos do cilindro de raio R e comprimento L em cada orientação (nós
+# da quadratura no último eixo): amplitudes radial e axial e, com
+# derivatives=True, suas derivadas em relação a R e a L.
+def CylinderTerms(q, R, L, derivatives=False):
+
+  from scipy.special import j0, j1
+
+  q = np.asarray(q, dtype=float)[..., np.newaxis]
+  R = np.asarray(R, dtype=float)[..., np.newaxis]
+  L = np.asarray(L, dtype=float)[..., np.newaxis]
+  sine = np.sqrt(1 - NODES**2)
+
+  x = q*R*sine
+  small = x < SMALL
+  y = np.where(small, 1, x)
+  J1 = j1(y)
+  radial = np.where(small, 1 - x**2/8, 2*J1/y)
+
+  z = q*L*NODES/2
+  smallz = z < SMALL
+  u = np.where(smallz, 1, z)
+  axial = np.where(smallz, 1 - z**2/6, np.sin(u)/u)
+
+  if(not derivatives):
+    return radial, axial
+
+  # d(2 J1(x)/x)/dx = -2 J2(x)/x, com J2(x) = 2 J1(x)/x - J0(x), e
+  # d(sin z/z)/dz = (cos z - sin z/z)/z.
+  dradial = np.where(small, -x/4, -2*(2*J1/y - j0(y))/y)*q*sine
+  daxial = np.where(smallz, -z/3, (np.cos(u) - np.sin(u)/u)/u)*q*NODES/2
+
+  return radial, axial, dradial, daxial
+
+# Cilindro de raio R e comprimento L, com média sobre as orientações.
+def Cylinder(q, scale, R, L, background):
+
+  radial, axial = CylinderTerms(q, R, L)
+
+  return scale*np.sum(WEIGHTS*(radial*axial)**2, axis=-1) + background
+
+def CylinderJacobian(q, scale, R, L, background):
+
+  radial, axial, dradial, daxial = CylinderTerms(q, R, L, derivatives=True)
+  P = np.sum(WEIGHTS*(radial*axial)**2, axis=-1)
+  dR = scale*np.sum(WEIGHTS*2*radial*dradial*axial**2, axis=-1)
+  dL = scale*np.sum(WEIGHTS*2*axial*daxial*radial**2, axis=-1)
+
+  return np.stack(np.broadcast_arrays(P, dR, dL, np.ones_like(P)), axis=-1)
+
+# Raio efetivo do elipsoide de revolução com semieixos Re (equatorial) e
+# Rp (polar) em cada orientação (nós da quadratura no último eixo).
+def EllipsoidRadius(Re, Rp):
+
+  Re = np.asarray(Re, dtype=float)[..., np.newaxis]
+  Rp = np.asarray(Rp, dtype=float)[..., np.newaxis]
+
+  return Re, Rp, np.sqrt(Re**2*(1 - NODES**2) + Rp**2*NODES**2)
+
+# Elipsoide de revolução, com média sobre as orientações.
+def Ellipsoid(q, scale, Re, Rp, background):
+
+  q = np.asarray(q, dtype=float)[..., np.newaxis]
+  Re, Rp, r = EllipsoidRadius(Re, Rp)
+
+  return scale*np.sum(WEIGHTS*SphereAmplitude(q*r)**2, axis=-1) + background
+
+def EllipsoidJacobian(q, scale, Re, Rp, background):
+
+  q = np.asarray(q, dtype=float)[..., np.newaxis]
+  Re, Rp, r = EllipsoidRadius(Re, Rp)
+  F = SphereAmplitude(q*r)
+  dF = 2*F*SphereAmplitudeDerivative(q*r)*q/r
+
+  P = np.sum(WEIGHTS*F**2, axis=-1)
+  dRe = scale*np.sum(WEIGHTS*dF*Re*(1 - NODES**2), axis=-1)
+  dRp = scale*np.sum(WEIGHTS*dF*Rp*NODES**2, axis=-1)
+
+  return np.stack(np.broadcast_arrays(P, dRe, dRp, np.ones_like(P)), axis=-1)
+
+# Cadeia gaussiana (função de Debye) com raio de giro Rg.
+def GaussianChain(q, scale, Rg, background):
+
+  return scale*Debye((q*Rg)**2) + background
+
+def GaussianChainJacobian(q, scale, Rg, background):
+
+  x = (q*Rg)**2
+  P = Debye(x)
+  dI = scale*DebyeDerivative(x)*2*q**2*Rg
+
+  return np.stack(np.broadcast_arrays(P, dI, np.ones_like(P)), axis=-1)
+
+# Modelos: nome -> (nomes dos parâmetros, função, jacobiano, limites
+# inferiores dos parâmetros).
+MODELS = {
+    "sphere": (("scale", "R", "background"), Sphere, SphereJacobian, \
+        (0, 0, -np.inf)),
+    "core-shell": (("scale", "R", "t", "ratio", "background"), CoreShell, CoreShellJacobian, \
+        (0, 0, 0, -np.inf, -np.inf)),
+    "cylinder": (("scale", "R", "L", "background"), Cylinder, CylinderJacobian, \
+        (0, 0, 0, -np.inf)),
+    "ellipsoid": (("scale", "Re", "Rp", "background"), Ellipsoid, EllipsoidJacobian, \
+        (0, 0, 0, -np.inf)),
+    "gaussian-chain": (("scale", "Rg", "background"), GaussianChain, GaussianChainJacobian, \
+        (0, 0, -np.inf))}
@@ -0,0 +1,243 @@
+import os
+
+# Leitura dos arquivos de parâmetros usados pelos programas de correção
+# (CTTq-Correction.py, Solvent-Correction.py e AbsoluteScale-Correction.py)
+# e da lista de arquivos para a média (MeanMaker.py).
+# Cada linha válida do arquivo corresponde a um arquivo a ser corrigido;
+# linhas com número inválido de argumentos são ignoradas (com aviso) sem
+# deslocar os índices das demais.
+
+# Verifica se os argumentos nas posições indicadas são numéricos.
+def ValidArguments(argument, positions):
+  
+  try:
+    for i in positions:
+      float(argument[i])
+  except ValueError:
+    return False
+  
+  return True
+
+############## Importa os parâmetros e nomes de arquivos. ##############
+########################################################################
+# Com withLines=True, a lista com a linha do arquivo de parâmetros de
+# cada linha válida é acrescentada ao final da tupla retornada (usada
+# pelo runner nas mensagens de erro).
+def ImportParameter_CTTq(fileParameters, withLines=False):
+  
+  # Extrai os dados do arquivo ignorando as linhas comentadas e "em 
+  # branco" (atenção que na verdade linhas que começam com tab e space 
+  # são tratadas como linhas em branco).
+  with open(fileParameters, 'r') as f:
+    lines = []
+    numbers = []
+    for number, line in enumerate(f, 1):
+      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
+        lines.append(line)
+        numbers.append(number)
+  
+  # Número de linhas de argumentos (nem todas necessariamente válidas).
+  numberLines = len(lines)
+  
+  # Inicia as listas para receberem os argumentos.
+  qSlope = []
+  qIntercept = []
+  fileSample = []
+  transmissionSample = []
+  thicknessSample = []
+  fileCapillary = []
+  transmissionCapillary = []
+  nameOutput = []
+
+  # Linha do arquivo de parâmetros de cada linha válida.
+  lineNumbers = []
+
+  # Separa os argumentos nas linhas e notifica caso o número de 
+  # argumentos por linha não esteja adequado.
+  for i in range(numberLines):
+    # Prepara a string removendo espaços e tabs.
+    lines[i] = lines[i].replace(" ", "")
+    lines[i] = lines[i].replace("\t", "")
+    
+    # Separa os argumentos pelas vírgulas.
+    argument = lines[i].split(",")
+    
+    if (len(argument) != 8):
+      print("\nError: number of arguments invalid in the line %d of parameters file!\n" % numbers[i])
+    elif(not ValidArguments(argument, (0, 1, 3, 4, 6))):
+      print("\nError: invalid numeric argument in the line %d of parameters file!\n" % numbers[i])
+    else:
+      # Obtêm os parâmetros e retorna.
+      qSlope.append(float(argument[0]))
+      qIntercept.append(float(argument[1]))
+      fileSample.append(str(argument[2].strip('\n')))
+      transmissionSample.append(float(argument[3]))
+      thicknessSample.append(float(argument[4]))
+      fileCapillary.append(str(argument[5].strip('\n')))
+      transmissionCapillary.append(float(argument[6]))
+      nameOutput.append(str(argument[7].strip('\n')))
+      lineNumbers.append(numbers[i])
+  
+  # Indica o número de arquivos a serem corrigidos (número de linhas
+  # válidas; as listas ficam alinhadas entre si) e os imprime.
+  numberFiles = len(fileSample)
+  print("Correcting %d data files for the capillary scattering, transmission, thickness and q-scale calibration:" % numberFiles)
+  for number, fileName in zip(lineNumbers, fileSample):
+    print("%d) %s" % (number, fileName))
+  
+  print(" ")
+  
+  parameters = (numberFiles, qSlope, qIntercept, fileSample, \
+      transmissionSample, thicknessSample, fileCapillary, \
+      transmissionCapillary, nameOutput)
+
+  if(withLines):
+    return parameters + (lineNumbers,)
+
+  return parameters
+
+############## Importa os parâmetros e nomes de arquivos. ##############
+########################################################################
+
+def ImportParameter_Solvent(fileParameters, withLines=False):
+  
+  # Extrai os dados do arquivo ignorando as linhas comentadas e "em 
+  # branco" (atenção que na verdade linhas que começam com tab e space 
+  # são tratadas como linhas em branco).
+  with open(fileParameters, 'r') as f:
+    lines = []
+    numbers = []
+    for number, line in enumerate(f, 1):
+      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
+        lines.append(line)
+        numbers.append(number)
+  
+  # Número de linhas de argumentos (nem todas necessariamente válidas).
+  numberLines = len(lines)
+  
+  # Inicia as listas para receberem os argumentos.
+  fileSample = []
+  fileSolvent = []
+  soluteVolumetricFraction = []
+  nameOutput = []
+
+  # Linha do arquivo de parâmetros de cada linha válida.
+  lineNumbers = []
+
+  # Separa os argumentos nas linhas e notifica caso o número de 
+  # argumentos por linha não esteja adequado.
+  for i in range(numberLines):
+    # Prepara a string removendo espaços e tabs.
+    lines[i] = lines[i].replace(" ", "")
+    lines[i] = lines[i].replace("\t", "")
+    
+    # Separa os argumentos pelas vírgulas.
+    argument = lines[i].split(",")
+    
+    if (len(argument) != 4):
+      print("\nError: number of arguments invalid in the line %d of parameters file!\n" % numbers[i])
+    elif(not ValidArguments(argument, (2,))):
+      print("\nError: invalid numeric argument in the line %d of parameters file!\n" % numbers[i])
+    else:
+      # Obtêm os parâmetros e retorna.
+      fileSample.append(str(argument[0].strip('\n')))
+      fileSolvent.append(str(argument[1].strip('\n')))
+      soluteVolumetricFraction.append(float(argument[2]))
+      nameOutput.append(str(argument[3].strip('\n')))
+      lineNumbers.append(numbers[i])
+  
+  # Indica o número de arquivos a serem corrigidos (número de linhas
+  # válidas; as listas ficam alinhadas entre si) e os imprime.
+  numberFiles = len(fileSample)
+  print("Correcting %d data files for the solvent scattering:" % numberFiles)
+  for number, fileName in zip(lineNumbers, fileSample):
+    print("%d) %s" % (number, fileName))
+  
+  print(" ")
+  
+  parameters = (numberFiles, fileSample, fileSolvent, soluteVolumetricFraction, nameOutput)
+
+  if(withLines):
+    return parameters + (lineNumbers,)
+
+  return parameters
+
+############## Importa os parâmetros e nomes de arquivos. ##############
+########################################################################
+
+def ImportParameter_AbsoluteScale(fileParameters, withLines=False):
+  
+  # Extrai os dados do arquivo ignorando as linhas comentadas e "em 
+  # branco" (atenção que na verdade linhas que começam com tab e space 
+  # são tratadas como linhas em branco).
+  with open(fileParameters, 'r') as f:
+    lines = []
+    numbers = []
+    for number, line in enumerate(f, 1):
+      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
+        lines.append(line)
+        numbers.append(number)
+  
+  # Número de linhas de argumentos (nem todas necessariamente válidas).
+  numberLines = len(lines)
+  
+  # Inicia as listas para receberem os argumentos.
+  absoluteScaleFactor = []
+  fileSample = []
+  nameOutput = []
+
+  # Linha do arquivo de parâmetros de cada linha válida.
+  lineNumbers = []
+
+  # Separa os argumentos nas linhas e notifica caso o número de 
+  # argumentos por linha não esteja adequado.
+  for i in range(numberLines):
+    # Prepara a string removendo espaços e tabs.
+    lines[i] = lines[i].replace(" ", "")
+    lines[i] = lines[i].replace("\t", "")
+    
+    # Separa os argumentos pelas vírgulas.
+    argument = lines[i].split(",")
+    
+    if (len(argument) != 3):
+      print("\nError: number of arguments invalid in the line %d of parameters file!\n" % numbers[i])
+    elif(not ValidArguments(argument, (0,))):
+      print("\nError: invalid numeric argument in the line %d of parameters file!\n" % numbers[i])
+    else:
+      # Obtêm os parâmetros e retorna.
+      absoluteScaleFactor.append(float(argument[0]))
+      fileSample.append(str(argument[1].strip('\n')))
+      nameOutput.append(str(argument[2].strip('\n')))
+      lineNumbers.append(numbers[i])
+  
+  # Indica o número de arquivos a serem corrigidos (número de linhas
+  # válidas; as listas ficam alinhadas entre si) e os imprime.
+  numberFiles = len(fileSample)
+  print("Correcting %d data files for the absolute scale:" % numberFiles)
+  for number, fileName in zip(lineNumbers, fileSample):
+    print("%d) %s" % (number, fileName))
+  
+  print(" ")
+  
+  parameters = (numberFiles, absoluteScaleFactor, fileSample, nameOutput)
+
+  if(withLines):
+    return parameters + (lineNumbers,)
+
+  return parameters
+
+
+############## Importa a lista de arquivos para a média. ###############
+########################################################################
+
+# Importa a lista de arquivos dos quais será feita a média e insere o
+# diretório em que eles estão.
+def ImportListFiles(fileListFiles, directoryFiles=""):
+  
+  with open(fileListFiles,'r') as f:    
+    listFiles = []
+    for line in f:
+      if (line[0] != '#' and line[0] != '\n' and line[0] != ' ' and line[0] != '\t'):
+        listFiles.append(os.path.join(directoryFiles, line.strip('\n')))
+    
+  return listFiles
@@ -0,0 +1,191 @@
+import numpy as np
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Ajuste de picos (lorentziana ou pseudo-Voigt com deslocamento vertical)
+# com as derivadas analíticas em relação aos parâmetros. Todos os picos
+# selecionados são ajustados em uma única chamada: os intervalos são
+# concatenados, cada ponto sabe a qual pico pertence e o modelo, os
+# resíduos e o jacobiano são calculados de uma vez para todos os pontos.
+# Como os picos não compartilham parâmetros, o resultado é o mesmo que o
+# de ajustes independentes.
+########################################################################
+
+# Nomes dos parâmetros de cada perfil.
+PROFILES = {
+    "lorentzian": ("q0", "w", "A", "Imin"),
+    "pseudo-voigt": ("q0", "w", "A", "Imin", "eta")}
+
+LN2 = np.log(2)
+
+# Lorentziana A/(1 + ((q-q0)/w)**2) + Imin e suas derivadas em relação a
+# (q0, w, A, Imin). Os parâmetros podem ser arrays (um valor por ponto).
+def Lorentzian(q, q0, w, A, Imin):
+
+  return A/(1 + ((q - q0)/w)**2) + Imin
+
+def LorentzianJacobian(q, q0, w, A, Imin):
+
+  u = (q - q0)/w
+  L = 1/(1 + u**2)
+  dLdu = -2*u*L**2
+
+  return np.stack((-A*dLdu/w, -A*dLdu*u/w, L, np.ones_like(q)), axis=-1)
+
+# Pseudo-Voigt A*(eta*L + (1-eta)*G) + Imin, com a lorentziana L e a
+# gaussiana G de mesma meia largura w, e suas derivadas em relação a
+# (q0, w, A, Imin, eta).
+def PseudoVoigt(q, q0, w, A, Imin, eta):
+
+  u = (q - q0)/w
+
+  return A*(eta/(1 + u**2) + (1 - eta)*np.exp(-LN2*u**2)) + Imin
+
+def PseudoVoigtJacobian(q, q0, w, A, Imin, eta):
+
+  u = (q - q0)/w
+  L = 1/(1 + u**2)
+  G = np.exp(-LN2*u**2)
+  dPdu = A*(eta*(-2*u*L**2) + (1 - eta)*(-2*LN2*u*G))
+
+  return np.stack((-dPdu/w, -dPdu*u/w, eta*L + (1 - eta)*G, np.ones_like(q), \
+      A*(L - G)), axis=-1)
+
+MODELS = {
+    "lorentzian": (Lorentzian, LorentzianJacobian),
+    "pseudo-voigt": (PseudoVoigt, PseudoVoigtJacobian)}
+
+############### Resultado do ajuste de picos. ##############################################
+############################################################################################
+
+# parameters, uncertainties: (número de picos, número de parâmetros);
+# covariance: (número de picos, parâmetros, parâmetros); chi2dof, R2:
+# um valor por pico; nfev: número de avaliações do modelo.
+class PeakFit():
+
+  def __init__(self, profile, parameters, covariance, chi2dof, R2, nfev):
+
+    self.profile = profile
+    self.names = PROFILES[profile]
+    self.parameters = parameters
+    self.covariance = covariance
+    self.uncertainties = np.sqrt(np.diagonal(covariance, axis1=1, axis2=2))
+    self.chi2dof = chi2dof
+    self.R2 = R2
+    self.nfev = nfev
+
+  def Number(self):
+
+    return len(self.parameters)
+
+  # Centros dos picos e suas incertezas.
+  def Centers(self):
+
+    return self.parameters[:, 0], self.uncertainties[:, 0]
+
+  # Resultado do pico k no formato de calibration.FitLorentz:
+  # [[q0, sq0], [w, sw], [A, sA], [Imin, sImin], ..., [chi2dof, R2]].
+  def FitResults(self, k):
+
+    fitResults = [[self.parameters[k, j], self.uncertainties[k, j]] \
+        for j in range(len(self.names))]
+    fitResults.append([self.chi2dof[k], self.R2[k]])
+
+    return fitResults
+
+  # Curva ajustada do pico k avaliada em q.
+  def Evaluate(self, k, q):
+
+    return MODELS[self.profile][0](q, *self.parameters[k])
+
+########################################################################
+# Ajuste.
+########################################################################
+
+# Chute inicial dos parâmetros de cada pico, a partir do seu intervalo.
+def InitialGuess(x, y, profile):
+
+  guess = [0.5*(max(x) + min(x)), (max(x) - min(x))/10, max(y) - min(y), min(y)]
+  if(profile == "pseudo-voigt"):
+    guess.append(0.5)
+
+  return guess
+
+# Ajusta um pico em cada intervalo [qmin, qmax] de peakRanges.
+@profiling.Timed("fit-peaks", curves=1)
+def FitPeaks(data, peakRanges, profile="lorentzian"):
+
+  import scipy.optimize as sco
+
+  model, jacobian = MODELS[profile]
+  size = len(PROFILES[profile])
+  number = len(peakRanges)
+
+  # Concatena os pontos de todos os intervalos.
+  xs, ys, ss, guesses = [], [], [], []
+  for qran in peakRanges:
+    window = data.Window(qran[0], qran[1])
+    if(window.size <= size):
+      raise ValueError("SAXSPY Error: too few points to fit the peak in [%g, %g]." % \
+          (qran[0], qran[1]))
+    xs.append(window.q)
+    ys.append(window.I)
+    ss.append(window.sI)
+    guesses.append(InitialGuess(xs[-1], ys[-1], profile))
+
+  counts = np.array([len(x) for x in xs])
+  starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+  index = np.repeat(np.arange(number), counts)
+  x = np.concatenate(xs)
+  y = np.concatenate(ys)
+  s = np.concatenate(ss)
+
+  # Colunas do jacobiano global ocupadas por cada ponto (bloco do seu pico).
+  rows = np.arange(len(x))[:, np.newaxis]
+  columns = index[:, np.newaxis]*size + np.arange(size)
+
+  def Residuals(p):
+    return (model(x, *p.reshape(number, size)[index].T) - y)/s
+
+  def Jacobian(p):
+    J = np.zeros((len(x), number*size))
+    J[rows, columns] = jacobian(x, *p.reshape(number, size)[index].T)/s[:, np.newaxis]
+    return J
+
+  # Limites do pseudo-Voigt: largura positiva e fração lorentziana em [0, 1].
+  lower = np.full((number, size), -np.inf)
+  upper = np.full((number, size), np.inf)
+  lower[:, 1] = 0
+  if(profile == "pseudo-voigt"):
+    lower[:, 4] = 0
+    upper[:, 4] = 1
+
+  # A lorentziana é ajustada sem limites por Levenberg-Marquardt (como em
+  # curve_fit); o pseudo-Voigt precisa dos limites (região de confiança).
+  p0 = np.ravel(guesses)
+  if(profile == "lorentzian"):
+    solution = sco.least_squares(Residuals, p0, jac=Jacobian, method='lm')
+  else:
+    p0 = np.clip(p0, lower.ravel() + 1e-12, upper.ravel())
+    solution = sco.least_squares(Residuals, p0, jac=Jacobian, \
+        bounds=(lower.ravel(), upper.ravel()), method='trf', x_scale='jac')
+  profiling.Count("fit-peaks", iterations=solution.nfev)
+  parameters = solution.x.reshape(number, size).copy()
+  parameters[:, 1] = np.abs(parameters[:, 1])
+
+  # Estatísticas e covariância de cada pico (blocos do jacobiano), com
+  # a covariância escalada pelo chi-quadrado reduzido, como em curve_fit.
+  weighted = solution.jac[rows, columns]
+  JTJ = np.add.reduceat(weighted[:, :, np.newaxis]*weighted[:, np.newaxis, :], starts)
+  residuals = np.bincount(index, solution.fun**2, number)
+  chi2dof = residuals/(counts - size)
+
+  w = 1/s**2
+  ym = np.bincount(index, w*y, number)/np.bincount(index, w, number)
+  tss = np.bincount(index, ((y - ym[index])/s)**2, number)
+  R2 = 1 - residuals/tss
+
+  covariance = np.linalg.pinv(JTJ)*chi2dof[:, np.newaxis, np.newaxis]
+
+  return PeakFit(profile, parameters, covariance, chi2dof, R2, solution.nfev)
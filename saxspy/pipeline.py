@@ -0,0 +1,79 @@
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Interpolação e reagrupamento em q.
+from . import regrid
+
+############### Encadeamento das correções em memória. #####################################
+############################################################################################
+
+# Aplica as correções (CTTq -> solvente -> escala absoluta, ou qualquer
+# subconjunto delas, na ordem em que são adicionadas) passando o objeto
+# Saxs de uma etapa para a seguinte, sem escrever e reler arquivos
+# intermediários. Por padrão somente o resultado final é salvo.
+#
+#   pipeline = Pipeline()
+#   pipeline.AddCTTq(qSlope, qIntercept, 0.45, 0.1, "capillary.dat", 0.9)
+#   pipeline.AddSolvent("solvent.dat", 0.02)
+#   pipeline.AddAbsoluteScale(1.224)
+#   pipeline.AddRebin(200)
+#   correction = pipeline.Run("sample.dat", fileOutput="sample_final.dat")
+class Pipeline():
+
+  # Etapas: (sufixo do nome padrão de saída, função).
+  def __init__(self):
+
+    self.stages = []
+
+  def AddCTTq(self, qSlope, qIntercept, transmissionSample, thicknessSample, \
+      fileCapillary, transmissionCapillary):
+
+    self.stages.append(("_cttqcorrected.dat", lambda sample, save, fileOutput: \
+        saxs.CorrectTo_CTTq(qSlope, qIntercept, sample, transmissionSample, \
+        thicknessSample, fileCapillary, transmissionCapillary, save=save, \
+        fileOutput=fileOutput)))
+
+    return self
+
+  def AddSolvent(self, fileSolvent, soluteVolumetricFraction):
+
+    self.stages.append(("_solventcorrected.dat", lambda sample, save, fileOutput: \
+        saxs.CorrectTo_Solvent(sample, fileSolvent, soluteVolumetricFraction, \
+        save=save, fileOutput=fileOutput)))
+
+    return self
+
+  def AddAbsoluteScale(self, absoluteScaleFactor, sAbsoluteScaleFactor=0.0):
+
+    self.stages.append(("_absolute.dat", lambda sample, save, fileOutput: \
+        saxs.CorrectTo_AbsoluteScale(absoluteScaleFactor, sample, save=save, \
+        fileOutput=fileOutput, sAbsoluteScaleFactor=sAbsoluteScaleFactor)))
+
+    return self
+
+  # Reagrupamento em intervalos de q (número de intervalos logarítmicos
+  # ou array com os limites), tipicamente após a escala absoluta.
+  def AddRebin(self, bins):
+
+    self.stages.append(("_rebinned.dat", lambda sample, save, fileOutput: \
+        regrid.RebinData(bins, sample, save=save, fileOutput=fileOutput)))
+
+    return self
+
+  # Aplica as etapas à amostra (nome do arquivo ou objeto Saxs). Com
+  # saveIntermediates=True cada etapa intermediária também é salva, com o
+  # nome padrão da respectiva função de correção. O nome padrão do
+  # resultado final vem sempre da amostra original (sufixo da última
+  # etapa), salvando ou não as etapas intermediárias.
+  def Run(self, fileSample, save=True, fileOutput=0, saveIntermediates=False):
+
+    if(not self.stages):
+      raise ValueError("SAXSPY Error: the pipeline has no correction stages.")
+
+    data = saxs.AsSaxs(fileSample)
+    if(save and fileOutput==0):
+      fileOutput = saxs.DefaultOutput(saxs.SourceName(fileSample), self.stages[-1][0])
+
+    for suffix, stage in self.stages[:-1]:
+      data = stage(data, saveIntermediates, 0)
+
+    return self.stages[-1][1](data, save, fileOutput)
@@ -0,0 +1,47 @@
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Gráficos sem interface (para execução sem terminal gráfico, como em
+# jobs de cluster). O matplotlib só é importado quando um gráfico é
+# pedido, e sempre com o backend Agg, que apenas salva em arquivo.
+########################################################################
+
+# Retorna o módulo pyplot com o backend não interativo.
+def Pyplot():
+
+  import matplotlib
+  matplotlib.use("Agg")
+  import matplotlib.pyplot as plt
+
+  return plt
+
+# Faz o gráfico (escala log em I) de uma ou mais curvas e salva em arquivo.
+@profiling.Timed("plot")
+def SavePlot(
+    listData,
+    listLabels,
+    fileOutput,
+    title=u'SAXS scattering intensity',
+    ylabel=r'$I \quad (\,a.\ u.\,)$'):
+
+  profiling.Count("plot", curves=len(listData))
+  plt = Pyplot()
+  figure = plt.figure()
+
+  for data, label in zip(listData, listLabels):
+    plt.errorbar(data.q, data.I, yerr=data.sI, linestyle='', color='k', \
+        marker='', markersize=1, capsize=2)
+    plt.semilogy(data.q, data.I, linestyle='', marker='x', markersize=2, \
+        label=(label))
+
+  plt.legend(loc='upper right')
+  plt.grid(True)
+  plt.xlabel(r'$q \quad (\,\AA^{-1})\,$')
+  plt.ylabel(ylabel)
+  plt.tick_params(axis='x', labelsize=8)
+  plt.tick_params(axis='y', labelsize=8)
+  plt.title(title)
+
+  figure.savefig(fileOutput)
+  plt.close(figure)
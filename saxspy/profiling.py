@@ -0,0 +1,135 @@
+import os
+import csv
+import json
+import time
+import socket
+import functools
+import threading
+
+########################################################################
+# Medidas de desempenho das etapas da redução: tempo e número de
+# chamadas de cada etapa, curvas processadas, bytes lidos e escritos e
+# iterações dos ajustes. Desligado por padrão: cada função instrumentada
+# apenas testa a variável enabled antes de chamar a função original.
+#
+#   from saxspy import profiling
+#   profiling.Enable()
+#   ... redução ...
+#   profiling.Export("profile.json")   # ou .csv
+#
+# Os tempos são inclusivos (uma correção inclui a leitura e a escrita
+# que ela faz, que também aparecem nas suas etapas). Os contadores são
+# de cada processo: com o executor "process" do runner, as etapas
+# executadas pelos processos de trabalho não são contadas.
+########################################################################
+
+enabled = False
+
+# Contadores de cada etapa.
+COUNTERS = ("calls", "time", "curves", "bytesRead", "bytesWritten", "iterations")
+
+stages = {}
+lock = threading.Lock()
+started = time.time()
+
+def Enable():
+
+  global enabled
+  enabled = True
+
+def Disable():
+
+  global enabled
+  enabled = False
+
+def Reset():
+
+  global started
+  with lock:
+    stages.clear()
+    started = time.time()
+
+# Soma valores aos contadores de uma etapa (somente se habilitado).
+def Count(stage, **values):
+
+  if(not enabled):
+    return
+
+  with lock:
+    counters = stages.get(stage)
+    if(counters is None):
+      counters = stages[stage] = dict.fromkeys(COUNTERS, 0)
+    for name, value in values.items():
+      counters[name] += value
+
+# Decorador que mede o tempo de cada chamada da função na etapa stage,
+# contando curves curvas por chamada.
+def Timed(stage, curves=0):
+
+  def Decorator(function):
+
+    @functools.wraps(function)
+    def Wrapper(*args, **kwargs):
+      if(not enabled):
+        return function(*args, **kwargs)
+      start = time.perf_counter()
+      try:
+        return function(*args, **kwargs)
+      finally:
+        Count(stage, calls=1, time=time.perf_counter() - start, curves=curves)
+
+    return Wrapper
+
+  return Decorator
+
+# Mede o tempo de um bloco: with profiling.Stage("plot"): ...
+class Stage():
+
+  def __init__(self, stage, curves=0):
+
+    self.stage = stage
+    self.curves = curves
+
+  def __enter__(self):
+
+    self.start = time.perf_counter()
+    return self
+
+  def __exit__(self, *exception):
+
+    Count(self.stage, calls=1, time=time.perf_counter() - self.start, curves=self.curves)
+
+########################################################################
+# Relatório.
+########################################################################
+
+# Retorna os contadores de todas as etapas, com a vazão (curvas por
+# segundo) de cada uma, e os dados da execução.
+def Report():
+
+  with lock:
+    rows = []
+    for stage, counters in sorted(stages.items()):
+      row = {"stage": stage}
+      row.update(counters)
+      row["throughput"] = counters["curves"]/counters["time"] if (counters["time"] > 0) else 0.0
+      rows.append(row)
+
+  return {"host": socket.gethostname(), "pid": os.getpid(), "started": started, \
+      "elapsed": time.time() - started, "stages": rows}
+
+# Salva o relatório em JSON ou, se o nome termina em .csv, em CSV (uma
+# linha por etapa).
+def Export(fileOutput):
+
+  report = Report()
+  if(os.fspath(fileOutput).endswith(".csv")):
+    with open(fileOutput, "w", newline="") as f:
+      writer = csv.DictWriter(f, fieldnames=("stage",) + COUNTERS + ("throughput",))
+      writer.writeheader()
+      writer.writerows(report["stages"])
+  else:
+    with open(fileOutput, "w") as f:
+      json.dump(report, f, indent=2)
+
+  return report
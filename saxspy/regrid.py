@@ -0,0 +1,346 @@
+import hashlib
+import threading
+import collections
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Interpolação de curvas em outra escala q. Cada ponto da nova escala é
+# a combinação linear (1-t)*y[i] + t*y[i+1] dos dois pontos vizinhos da
+# escala original, e a incerteza é propagada supondo os pontos
+# independentes: sI = sqrt(((1-t)*sI[i])**2 + (t*sI[i+1])**2). Pontos
+# fora do intervalo da escala original recebem fill (NaN por padrão).
+# Os índices e pesos de cada par (escala original, nova escala) são
+# guardados em cache, de modo que subtrair a mesma referência de muitas
+# curvas custa uma única busca.
+#
+# O reagrupamento (rebinning) em intervalos de q (logarítmicos ou dados)
+# substitui os pontos de cada intervalo pela média ponderada por 1/sI**2,
+# com incerteza 1/sqrt(soma dos pesos), reduzindo o número de pontos.
+########################################################################
+
+# Chave de uma escala q: formato e hash dos valores.
+def GridKey(q):
+
+  q = np.ascontiguousarray(q, dtype=float)
+
+  return (q.shape, hashlib.blake2b(q.tobytes(), digest_size=16).digest())
+
+# Reduz uma escala q repetida em todas as linhas de um lote (visão com
+# passo zero) a uma única linha.
+def Rows(q):
+
+  q = np.asarray(q)
+  if(q.ndim == 2 and len(q) > 0 and q.strides[0] == 0):
+    return q[0]
+
+  return q
+
+# Verifica se uma escala q tem os mesmos valores que uma cópia guardada
+# (as extremidades são comparadas antes, sem percorrer o array).
+def SameValues(stored, q):
+
+  q = np.asarray(q)
+  if(stored.shape != q.shape):
+    return False
+  if(len(q) > 0 and (stored[0] != q[0] or stored[-1] != q[-1])):
+    return False
+
+  return np.array_equal(stored, q)
+
+def SameGrid(qSource, qTarget):
+
+  if(qSource is qTarget):
+    return True
+
+  return (np.shape(qSource) == np.shape(qTarget)) and np.array_equal(qSource, qTarget)
+
+# Índices dos vizinhos (left, right), peso t do vizinho da direita e
+# máscara dos pontos de qTarget dentro do intervalo de qSource.
+def InterpolationWeights(qSource, qTarget):
+
+  qSource = np.asarray(qSource, dtype=float)
+  qTarget = np.asarray(qTarget, dtype=float)
+  if(len(qSource) < 2):
+    raise ValueError("SAXSPY Error: at least two points are needed to interpolate a curve.")
+
+  if(np.all(qSource[1:] >= qSource[:-1])):
+    order = None
+    q = qSource
+  else:
+    order = np.argsort(qSource, kind='stable')
+    q = qSource[order]
+
+  index = np.clip(np.searchsorted(q, qTarget, side='right') - 1, 0, len(q) - 2)
+  dq = q[index+1] - q[index]
+  t = np.divide(qTarget - q[index], dq, out=np.zeros(len(qTarget)), where=(dq > 0))
+  inside = (qTarget >= q[0]) & (qTarget <= q[-1])
+
+  if(order is None):
+    left, right = index, index + 1
+  else:
+    left, right = order[index], order[index+1]
+
+  return left, right, t, inside
+
+############### Cache dos pesos de interpolação. ###########################################
+############################################################################################
+
+# Os pesos são indexados pelo hash das duas escalas. Para evitar o hash a
+# cada consulta, cópias dos últimos pares de escalas consultados são
+# guardadas com a sua chave e comparadas com as escalas consultadas
+# (comparar é bem mais barato que calcular o hash); assim, alterações nos
+# próprios arrays (q[:] = ...) levam a outra chave. A chave também pode
+# ser passada pronta (GridKey).
+class WeightsCache():
+
+  def __init__(self, maxEntries=64, recentKeys=8):
+
+    self.maxEntries = maxEntries
+    self.recentKeys = recentKeys
+    self.entries = collections.OrderedDict()
+    self.recent = collections.deque(maxlen=recentKeys)
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+
+  # Chave do par de escalas, reaproveitada para escalas já consultadas.
+  def Key(self, qSource, qTarget):
+
+    with self.lock:
+      for source, target, key in self.recent:
+        if(SameValues(source, qSource) and SameValues(target, qTarget)):
+          return key
+
+    key = (GridKey(qSource), GridKey(qTarget))
+    source = np.array(qSource, dtype=float)
+    target = np.array(qTarget, dtype=float)
+    with self.lock:
+      self.recent.append((source, target, key))
+
+    return key
+
+  def Get(self, qSource, qTarget, key=None):
+
+    if(key is None):
+      key = self.Key(qSource, qTarget)
+
+    with self.lock:
+      weights = self.entries.get(key)
+      if(weights is not None):
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return weights
+      self.misses += 1
+
+    weights = InterpolationWeights(qSource, qTarget)
+    for array in weights:
+      array.flags.writeable = False
+
+    with self.lock:
+      self.entries[key] = weights
+      while(len(self.entries) > self.maxEntries):
+        self.entries.popitem(last=False)
+
+    return weights
+
+  def Clear(self):
+
+    with self.lock:
+      self.entries.clear()
+      self.recent.clear()
+      self.hits = 0
+      self.misses = 0
+
+  def Statistics(self):
+
+    with self.lock:
+      return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries)}
+
+weightsCache = WeightsCache()
+
+########################################################################
+# Interpolação.
+########################################################################
+
+# Interpola I e sI (1D, ou 2D com uma curva por linha, todas na escala
+# qSource) na escala qTarget.
+@profiling.Timed("regrid")
+def RegridArrays(qSource, I, sI, qTarget, fill=np.nan):
+
+  left, right, t, inside = weightsCache.Get(qSource, qTarget)
+
+  I = np.asarray(I, dtype=float)
+  sI = np.asarray(sI, dtype=float)
+  newI = (1 - t)*I[..., left] + t*I[..., right]
+  newsI = np.hypot((1 - t)*sI[..., left], t*sI[..., right])
+
+  if(not np.all(inside)):
+    newI[..., ~inside] = fill
+    newsI[..., ~inside] = fill
+
+  return newI, newsI
+
+# Retorna a curva data interpolada na escala qTarget (objeto Saxs).
+def Regrid(data, qTarget, fill=np.nan):
+
+  qTarget = np.asarray(qTarget, dtype=float)
+
+  regridded = saxs.Saxs()
+  regridded.q = qTarget
+  regridded.I, regridded.sI = RegridArrays(data.q, data.I, data.sI, qTarget, fill)
+  regridded.size = len(qTarget)
+  regridded.metadata = dict(data.metadata)
+
+  return regridded
+
+# Intensidades de uma referência (Saxs ou lote) na escala q das amostras
+# (1D, ou 2D com uma escala por amostra). Sem cópia quando as escalas
+# são iguais; com a mesma escala em todas as linhas, a interpolação é
+# feita de uma vez para todas as curvas.
+def ReferenceOnGrid(reference, q, fill=np.nan):
+
+  qSource = Rows(reference.q)
+  qTarget = Rows(q)
+
+  if(SameGrid(qSource, qTarget)):
+    return reference.I, reference.sI
+
+  if(qSource.ndim == 1 and qTarget.ndim == 1):
+    return RegridArrays(qSource, reference.I, reference.sI, qTarget, fill)
+
+  I, sI = [], []
+  for k in range(len(qTarget) if (qTarget.ndim == 2) else len(qSource)):
+    qk = qSource[k] if (qSource.ndim == 2) else qSource
+    Ik = reference.I[k] if (reference.I.ndim == 2) else reference.I
+    sIk = reference.sI[k] if (reference.sI.ndim == 2) else reference.sI
+    targetk = qTarget[k] if (qTarget.ndim == 2) else qTarget
+    curve = RegridArrays(qk, Ik, sIk, targetk, fill)
+    I.append(curve[0])
+    sI.append(curve[1])
+
+  return np.array(I), np.array(sI)
+
+########################################################################
+# Reagrupamento.
+########################################################################
+
+# Limites de number intervalos logarítmicos entre o menor q positivo e o
+# maior q (q pode ter uma curva por linha).
+def LogBins(q, number, qmin=None, qmax=None):
+
+  q = np.asarray(q, dtype=float)
+  if(qmin is None):
+    qmin = np.min(q[q > 0])
+  if(qmax is None):
+    qmax = np.max(q)
+  if(qmin <= 0 or qmax <= qmin):
+    raise ValueError("SAXSPY Error: invalid q interval for logarithmic bins.")
+
+  return np.geomspace(qmin, qmax, number + 1)
+
+# Agrupa os pontos nos intervalos [edges[k], edges[k+1]) (o último
+# intervalo inclui edges[-1]). I e sI podem ter uma curva por linha, com
+# q comum (1D) ou uma escala por curva. Pontos com I ou sI inválidos (NaN,
+# sI <= 0) são ignorados; intervalos sem pontos válidos em todas as
+# curvas são removidos e os sem pontos válidos em somente algumas curvas
+# ficam com NaN. O q de cada intervalo é a média dos q dos pontos nele.
+def RebinArrays(q, I, sI, edges):
+
+  edges = np.asarray(edges, dtype=float)
+  I = np.asarray(I, dtype=float)
+  sI = np.asarray(sI, dtype=float)
+  curves = np.atleast_2d(I)
+  rows, number = len(curves), len(edges) - 1
+  q = np.broadcast_to(np.atleast_2d(q), curves.shape)
+  errors = np.broadcast_to(np.atleast_2d(sI), curves.shape)
+
+  bins = np.searchsorted(edges, q, side='right') - 1
+  bins[q == edges[-1]] = number - 1
+  inside = (bins >= 0) & (bins < number)
+  valid = inside & np.isfinite(curves) & np.isfinite(errors) & (errors > 0)
+
+  # Índice de cada ponto entre todos os intervalos de todas as curvas.
+  index = np.where(inside, bins + number*np.arange(rows)[:, np.newaxis], 0).ravel()
+  w = np.where(valid, 1/np.where(valid, errors, 1)**2, 0)
+
+  def Sum(values, mask):
+    return np.bincount(index, np.where(mask, values, 0).ravel(), rows*number).reshape(rows, number)
+
+  weights = Sum(w, valid)
+  counts = Sum(1, inside)
+  keep = np.any(weights > 0, axis=0)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    newq = (Sum(q, inside)/counts)[:, keep]
+    newI = (Sum(w*curves, valid)/weights)[:, keep]
+    newsI = (1/np.sqrt(weights))[:, keep]
+
+  if(I.ndim == 1):
+    return newq[0], newI[0], newsI[0]
+
+  return newq, newI, newsI
+
+# Intervalos a partir de bins: número de intervalos logarítmicos ou
+# array com os limites.
+def Edges(q, bins):
+
+  if(np.ndim(bins) == 0):
+    return LogBins(q, int(bins))
+
+  return np.asarray(bins, dtype=float)
+
+# Retorna a curva reagrupada (objeto Saxs).
+@profiling.Timed("rebin", curves=1)
+def Rebin(data, bins=100):
+
+  rebinned = saxs.Saxs()
+  rebinned.q, rebinned.I, rebinned.sI = RebinArrays(data.q, data.I, data.sI, Edges(data.q, bins))
+  rebinned.size = len(rebinned.q)
+  rebinned.metadata = dict(data.metadata)
+
+  return rebinned
+
+# Reagrupa todas as curvas de um lote de uma vez (SaxsBatch). Com a
+# mesma escala q em todas as curvas o resultado também tem escala comum.
+@profiling.Timed("rebin-batch")
+def RebinBatch(batch, bins=100):
+
+  from .batch import SaxsBatch
+
+  profiling.Count("rebin-batch", curves=batch.Number())
+
+  q = Rows(batch.q)
+  rebinned = SaxsBatch()
+  rebinned.names = list(batch.names)
+  rebinned.metadata = [dict(metadata) for metadata in batch.metadata]
+  rebinned.q, rebinned.I, rebinned.sI = RebinArrays(q, batch.I, batch.sI, Edges(q, bins))
+  if(q.ndim == 1):
+    rebinned.q = np.broadcast_to(rebinned.q[0], rebinned.I.shape)
+  rebinned.Size()
+
+  return rebinned
+
+# Reagrupa uma curva (arquivo ou objeto Saxs) e salva o resultado, com a
+# mesma interface das funções de correção.
+def RebinData(bins, fileSample, save=True, fileOutput=0):
+
+  sample = saxs.AsSaxs(fileSample)
+  fileSample = saxs.SourceName(fileSample)
+
+  rebinned = Rebin(sample, bins)
+
+  if(save):
+    if(fileOutput==0):
+      fileOutput = saxs.DefaultOutput(fileSample, "_rebinned.dat")
+
+    saxs.WriteData(fileOutput, rebinned, \
+        header=("# Rebinned data (%d points) from file: %s\n" % (rebinned.size, fileSample)) + \
+        "# q (A-1)\t\t I\t\t sI\n")
+
+  rebinned.metadata = saxs.CorrectionMetadata(sample, save, fileOutput)
+
+  return rebinned
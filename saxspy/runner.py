@@ -0,0 +1,156 @@
+import os
+import time
+import concurrent.futures
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+
+########################################################################
+# Execução em paralelo das correções definidas nos arquivos de
+# parâmetros. As linhas são independentes entre si, então cada uma é
+# executada em um processo (ou thread) do conjunto de trabalhadores; os
+# resultados voltam na ordem das linhas, e o erro em uma linha não
+# interrompe as demais.
+########################################################################
+
+# Tarefas executadas pelos trabalhadores (funções de módulo para que
+# possam ser serializadas para outros processos).
+def TaskCTTq(qSlope, qIntercept, fileSample, transmissionSample, \
+    thicknessSample, fileCapillary, transmissionCapillary, fileOutput):
+
+  return saxs.CorrectTo_CTTq(qSlope, qIntercept, fileSample, \
+      transmissionSample, thicknessSample, fileCapillary, \
+      transmissionCapillary, save=True, fileOutput=fileOutput)
+
+def TaskSolvent(fileSample, fileSolvent, soluteVolumetricFraction, fileOutput):
+
+  return saxs.CorrectTo_Solvent(fileSample, fileSolvent, \
+      soluteVolumetricFraction, save=True, fileOutput=fileOutput)
+
+def TaskAbsoluteScale(absoluteScaleFactor, fileSample, fileOutput):
+
+  return saxs.CorrectTo_AbsoluteScale(absoluteScaleFactor, fileSample, \
+      save=True, fileOutput=fileOutput)
+
+# Identificação de uma linha nas mensagens: a linha do arquivo de
+# parâmetros, quando conhecida (lineNumbers), ou a posição entre as
+# linhas válidas.
+def RowLabel(i, lineNumbers=None):
+
+  if(lineNumbers):
+    return "line %d" % lineNumbers[i]
+
+  return "row %d" % (i+1)
+
+# Define os nomes dos arquivos de saída a partir dos nomes da última
+# coluna do arquivo de parâmetros (nome + ".dat", opcionalmente em outro
+# diretório). Nomes repetidos são marcados como erro, pois duas linhas
+# executadas ao mesmo tempo escreveriam no mesmo arquivo.
+def OutputNames(nameOutput, directoryOutput="", lineNumbers=None):
+
+  listOutput = []
+  errors = {}
+  seen = {}
+  for i, name in enumerate(nameOutput):
+    fileOutput = os.path.join(directoryOutput, name + ".dat")
+    key = os.path.abspath(fileOutput)
+    if(key in seen):
+      errors[i] = "output file %s already used by %s" % (fileOutput, RowLabel(seen[key], lineNumbers))
+    else:
+      seen[key] = i
+    listOutput.append(fileOutput)
+
+  return listOutput, errors
+
+# Executa task(*arguments) para cada linha em um conjunto de processos
+# (executor="process"), threads (executor="thread") ou sequencialmente
+# (executor="serial" ou workers=1). Retorna a lista de resultados (None
+# nas linhas com erro) e um resumo da execução. lineNumbers: linha do
+# arquivo de parâmetros de cada linha, usada nas mensagens de erro.
+def RunRows(task, rows, workers=None, executor="process", errors=None, lineNumbers=None):
+
+  errors = dict(errors or {})
+  results = [None]*len(rows)
+  pending = [i for i in range(len(rows)) if i not in errors]
+  start = time.perf_counter()
+
+  if(executor == "serial" or workers == 1):
+    for i in pending:
+      try:
+        results[i] = task(*rows[i])
+      except Exception as error:
+        errors[i] = "%s: %s" % (type(error).__name__, error)
+  else:
+    if(executor == "process"):
+      pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+    elif(executor == "thread"):
+      pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+    else:
+      raise ValueError("SAXSPY Error: unknown executor '%s'." % executor)
+
+    with pool:
+      futures = {i: pool.submit(task, *rows[i]) for i in pending}
+      for i in pending:
+        try:
+          results[i] = futures[i].result()
+        except Exception as error:
+          errors[i] = "%s: %s" % (type(error).__name__, error)
+
+  elapsed = time.perf_counter() - start
+  done = len(rows) - len(errors)
+  summary = {
+      "rows": len(rows),
+      "done": done,
+      "failed": len(errors),
+      "errors": dict(sorted(errors.items())),
+      "lines": list(lineNumbers) if lineNumbers else None,
+      "elapsed": elapsed,
+      "throughput": (done/elapsed if elapsed > 0 else 0.0)}
+
+  return results, summary
+
+# Imprime o resumo da execução.
+def PrintSummary(summary):
+
+  for i, message in summary["errors"].items():
+    print("Error in %s: %s" % (RowLabel(i, summary.get("lines")), message))
+
+  print("%d of %d rows corrected in %.2f s (%.1f curves/s)." % \
+      (summary["done"], summary["rows"], summary["elapsed"], summary["throughput"]))
+
+########################################################################
+# Execução a partir dos parâmetros lidos com ImportParameter_CTTq,
+# ImportParameter_Solvent e ImportParameter_AbsoluteScale (a tupla
+# retornada por essas funções é passada diretamente; com withLines=True
+# as linhas do arquivo de parâmetros são passadas em lineNumbers).
+########################################################################
+
+def RunCTTq(parameters, workers=None, executor="process", directoryOutput="", lineNumbers=None):
+
+  numberFiles, qSlope, qIntercept, fileSample, transmissionSample, \
+      thicknessSample, fileCapillary, transmissionCapillary, \
+      nameOutput = parameters
+
+  listOutput, errors = OutputNames(nameOutput, directoryOutput, lineNumbers)
+  rows = list(zip(qSlope, qIntercept, fileSample, transmissionSample, \
+      thicknessSample, fileCapillary, transmissionCapillary, listOutput))
+
+  return RunRows(TaskCTTq, rows, workers, executor, errors, lineNumbers)
+
+def RunSolvent(parameters, workers=None, executor="process", directoryOutput="", lineNumbers=None):
+
+  numberFiles, fileSample, fileSolvent, soluteVolumetricFraction, \
+      nameOutput = parameters
+
+  listOutput, errors = OutputNames(nameOutput, directoryOutput, lineNumbers)
+  rows = list(zip(fileSample, fileSolvent, soluteVolumetricFraction, listOutput))
+
+  return RunRows(TaskSolvent, rows, workers, executor, errors, lineNumbers)
+
+def RunAbsoluteScale(parameters, workers=None, executor="process", directoryOutput="", lineNumbers=None):
+
+  numberFiles, absoluteScaleFactor, fileSample, nameOutput = parameters
+
+  listOutput, errors = OutputNames(nameOutput, directoryOutput, lineNumbers)
+  rows = list(zip(absoluteScaleFactor, fileSample, listOutput))
+
+  return RunRows(TaskAbsoluteScale, rows, workers, executor, errors, lineNumbers)
@@ -1,4 +1,35 @@
+import gzip
+import json
+import os
+import tempfile
+import threading
+import collections
 import numpy as np
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+# Identificador e versão do formato binário nativo (colunar) do saxspy.
+# Layout do arquivo: assinatura (8 bytes) | tamanho do cabeçalho (uint64,
+# little-endian) | cabeçalho JSON (completado até múltiplo de 64 bytes) |
+# colunas q, I e sI contíguas em float64 little-endian.
+BINARY_MAGIC = b"SAXSPYB1"
+BINARY_ALIGNMENT = 64
+BINARY_DTYPE = np.dtype('<f8')
+
+# Formato de cada linha (q, I, sI) dos arquivos de texto.
+DATA_FORMAT = "%.6e\t %.6e\t %.6e\n"
+
+# Linha do cabeçalho dos arquivos do detector com o tempo de exposição
+# (terceira coluna, em milissegundos).
+EXPOSURE_TIME_LINE = 6
+
+# Intervalo [início, fim) dos pontos com qmin < q < qmax em q crescente.
+def SortedRange(q, qmin, qmax):
+  
+  start = np.searchsorted(q, qmin, side='right')
+  end = np.searchsorted(q, qmax, side='left')
+  
+  return start, max(start, end)
 
 ############### Define uma classe com o formato dos dados do SAXS. #########################
 ############################################################################################
@@ -11,11 +42,136 @@ class Saxs():
     self.q = np.zeros(size)
     self.I = np.zeros(size)
     self.sI = np.zeros(size)
+    self.metadata = {}
+    self.qIndex = None
   
+  @profiling.Timed("import", curves=1)
   def ImportData(self, fileData):
     
-    self.q, self.I, self.sI = np.loadtxt(fileData, usecols=(0,1,2), unpack=True)
+    if(profiling.enabled):
+      profiling.Count("import", bytesRead=os.path.getsize(fileData))
+    
+    # Arquivos no formato binário nativo são carregados sem passar pelo
+    # parser de texto.
+    if(IsBinaryFile(fileData)):
+      self.Load(fileData)
+      self.metadata["file"] = os.fspath(fileData)
+      return
+    
+    # Lê o arquivo uma única vez: o cabeçalho é consumido linha a linha e
+    # o bloco numérico restante vai direto para o tokenizador do numpy.
+    with OpenText(fileData) as f:
+      header = []
+      while True:
+        position = f.tell()
+        line = f.readline()
+        if(not line or IsDataLine(line)):
+          break
+        header.append(line.rstrip('\n'))
+      f.seek(position)
+      
+      self.q, self.I, self.sI = np.loadtxt(f, usecols=(0,1,2), unpack=True, ndmin=2)
+    
     self.size = len(self.q)
+    self.metadata = ParseHeader(header)
+    self.metadata["file"] = os.fspath(fileData)
+  
+  # Salva os dados no formato binário nativo (q, I e sI em colunas
+  # contíguas, precedidas por um pequeno cabeçalho com os metadados).
+  # Os dados são escritos em um arquivo temporário no mesmo diretório, que
+  # substitui fileOutput no final: uma curva carregada com mmap=True pode
+  # ser salva de volta no próprio arquivo (que continua mapeado).
+  @profiling.Timed("save", curves=1)
+  def Save(self, fileOutput):
+    
+    size = self.Size()
+    header = {
+        "size": size,
+        "dtype": BINARY_DTYPE.str,
+        "columns": ["q", "I", "sI"],
+        "metadata": self.metadata}
+    
+    directory = os.path.dirname(os.path.abspath(fileOutput))
+    descriptor, fileTemporary = tempfile.mkstemp(dir=directory, prefix=".saxspy-", suffix=".tmp")
+    try:
+      with os.fdopen(descriptor, 'wb') as f:
+        WriteBinaryHeader(f, header)
+        for column in (self.q, self.I, self.sI):
+          np.ascontiguousarray(column, dtype=BINARY_DTYPE).tofile(f)
+        profiling.Count("save", bytesWritten=f.tell())
+      os.replace(fileTemporary, fileOutput)
+    except BaseException:
+      if(os.path.exists(fileTemporary)):
+        os.remove(fileTemporary)
+      raise
+  
+  # Carrega os dados do formato binário nativo. Com mmap=True as colunas
+  # são mapeadas em memória (somente leitura) em vez de copiadas.
+  def Load(self, fileData, mmap=True):
+    
+    with open(fileData, 'rb') as f:
+      header, offset = ReadBinaryHeader(f)
+      size = header["size"]
+      dtype = np.dtype(header["dtype"])
+      if(not mmap):
+        columns = np.fromfile(f, dtype=dtype, count=3*size).reshape(3, size)
+    
+    if(mmap):
+      columns = np.memmap(fileData, dtype=dtype, mode='r', offset=offset, \
+          shape=(3, size))
+    
+    self.q, self.I, self.sI = columns[0], columns[1], columns[2]
+    self.size = size
+    self.metadata = header.get("metadata", {})
+  
+  # Exporta os dados explicitamente em texto (q, I e sI por linha).
+  def ExportData(self, fileOutput, header="", chunkSize=65536):
+    
+    WriteData(fileOutput, self, header=header, chunkSize=chunkSize)
+  
+  # Índice da escala q: q ordenado e, se q não for crescente, a ordem
+  # dos pontos. A verificação da ordem é feita a cada chamada (O(n), sem
+  # cópia), de modo que alterações no próprio array (data.q[:] = ...) são
+  # sempre levadas em conta; somente a ordenação de q não crescente é
+  # guardada, junto com uma cópia de q, e reaproveitada enquanto q não muda.
+  def SortedQ(self):
+    
+    q = np.asarray(self.q)
+    if(np.all(q[1:] >= q[:-1])):
+      return q, None
+    
+    if((self.qIndex is None) or not np.array_equal(self.qIndex[0], q)):
+      order = np.argsort(q, kind='stable')
+      self.qIndex = (q.copy(), q[order], order)
+    
+    return self.qIndex[1], self.qIndex[2]
+  
+  # Intervalo [início, fim) dos pontos com qmin < q < qmax no q ordenado,
+  # por busca binária.
+  def RangeIndex(self, qmin, qmax):
+    
+    return SortedRange(self.SortedQ()[0], qmin, qmax)
+  
+  # Retorna os pontos com qmin < q < qmax como um objeto Saxs. Se q é
+  # crescente, os arrays são visões (sem cópia) dos arrays originais;
+  # caso contrário são cópias, em ordem crescente de q.
+  def Window(self, qmin, qmax):
+    
+    q, order = self.SortedQ()
+    start, end = SortedRange(q, qmin, qmax)
+    if(order is None):
+      points = slice(start, end)
+    else:
+      points = order[start:end]
+    
+    window = Saxs()
+    window.q = self.q[points]
+    window.I = self.I[points]
+    window.sI = self.sI[points]
+    window.size = end - start
+    window.metadata = self.metadata
+    
+    return window
   
   def Size(self):
     
@@ -26,13 +182,308 @@ class Saxs():
     
     return self.size
 
+########################################################################
+# Leitura dos dados em texto.
+########################################################################
+
+# Importa um arquivo de dados e retorna um objeto Saxs com os metadados
+# do cabeçalho.
+def ReadData(fileData):
+  
+  data = Saxs()
+  data.ImportData(fileData)
+  
+  return data
+
+# Abre um arquivo de texto para leitura (comprimido com gzip se terminar
+# em ".gz").
+def OpenText(fileData):
+  
+  if(os.fspath(fileData).endswith(".gz")):
+    return gzip.open(fileData, 'rt')
+  
+  return open(fileData, 'r')
+
+# Verifica se a linha começa com as três colunas numéricas (q, I, sI).
+def IsDataLine(line):
+  
+  columns = line.split()
+  if(len(columns) < 3):
+    return False
+  
+  try:
+    for value in columns[:3]:
+      float(value)
+  except ValueError:
+    return False
+  
+  return True
+
+# Interpreta as linhas do cabeçalho em um dicionário. Linhas no formato
+# "chave: valor", "chave = valor" ou "chave valor" são separadas e os
+# valores numéricos convertidos. O tempo de exposição (em segundos) é
+# extraído da linha EXPOSURE_TIME_LINE, como nos arquivos do detector.
+def ParseHeader(header):
+  
+  metadata = {"header": header}
+  
+  for line in header:
+    text = line.lstrip('#').strip()
+    if(not text):
+      continue
+    
+    for separator in (':', '='):
+      if(separator in text):
+        key, value = text.split(separator, 1)
+        break
+    else:
+      key, _, value = text.partition(' ')
+    
+    key = key.strip()
+    value = value.strip()
+    if(not key or key in metadata):
+      continue
+    
+    try:
+      metadata[key] = float(value)
+    except ValueError:
+      metadata[key] = value
+  
+  if(len(header) >= EXPOSURE_TIME_LINE):
+    try:
+      metadata["time"] = float(header[EXPOSURE_TIME_LINE-1].split()[2])/1000
+    except (IndexError, ValueError):
+      pass
+  
+  return metadata
+
+########################################################################
+# Escrita dos dados em texto.
+########################################################################
+
+# Escreve os dados (q, I, sI) em texto formatando o bloco inteiro de uma
+# vez, em vez de uma linha por iteração. fileOutput pode ser o nome do
+# arquivo (comprimido com gzip se terminar em ".gz") ou um arquivo já
+# aberto em modo texto. Com chunkSize=None o bloco é formatado em uma única
+# string; caso contrário é escrito em partes de chunkSize linhas.
+@profiling.Timed("write", curves=1)
+def WriteData(fileOutput, data, header="", chunkSize=65536):
+  
+  block = np.column_stack((data.q, data.I, data.sI))
+  rows = len(block)
+  if(not chunkSize):
+    chunkSize = max(rows, 1)
+  
+  if(isinstance(fileOutput, (str, os.PathLike))):
+    if(os.fspath(fileOutput).endswith(".gz")):
+      f = gzip.open(fileOutput, 'wt')
+    else:
+      f = open(fileOutput, 'w')
+    close = True
+  else:
+    f = fileOutput
+    close = False
+  
+  written = len(header)
+  try:
+    f.write(header)
+    for start in range(0, rows, chunkSize):
+      chunk = block[start:start+chunkSize]
+      text = (DATA_FORMAT*len(chunk)) % tuple(chunk.ravel())
+      f.write(text)
+      written += len(text)
+  finally:
+    if(close):
+      f.close()
+  profiling.Count("write", bytesWritten=written)
+  
+  return rows
+
+########################################################################
+# Funções auxiliares do formato binário nativo.
+########################################################################
+
+# Verifica se o arquivo está no formato binário nativo do saxspy.
+def IsBinaryFile(fileData):
+  
+  try:
+    with open(fileData, 'rb') as f:
+      return f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+  except (OSError, TypeError):
+    return False
+
+# Converte tipos do numpy em tipos nativos para o cabeçalho JSON.
+def JsonDefault(value):
+  
+  if(isinstance(value, np.ndarray)):
+    return value.tolist()
+  if(isinstance(value, np.generic)):
+    return value.item()
+  raise TypeError("SAXSPY Error: metadata value %r is not serializable." % (value,))
+
+# Escreve a assinatura e o cabeçalho JSON, completando com espaços para
+# que os dados comecem em um endereço alinhado.
+def WriteBinaryHeader(f, header, magic=BINARY_MAGIC):
+  
+  text = json.dumps(header, default=JsonDefault).encode('utf-8')
+  start = len(magic) + 8
+  padding = (-(start + len(text))) % BINARY_ALIGNMENT
+  text += b" "*padding
+  
+  f.write(magic)
+  f.write(np.uint64(len(text)).astype('<u8').tobytes())
+  f.write(text)
+  
+  return start + len(text)
+
+# Lê o cabeçalho e retorna o dicionário e a posição de início dos dados.
+def ReadBinaryHeader(f, magic=BINARY_MAGIC):
+  
+  if(f.read(len(magic)) != magic):
+    raise ValueError("SAXSPY Error: %s is not a saxspy binary file." % \
+        getattr(f, 'name', 'input'))
+  
+  length = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+  header = json.loads(f.read(length).decode('utf-8'))
+  
+  return header, len(magic) + 8 + length
+
+########################################################################
+# Cache das curvas de referência (capilar, solvente, água).
+########################################################################
+
+# Guarda as curvas de referência já importadas, pois em um arquivo de
+# parâmetros típico centenas de amostras usam o mesmo capilar ou solvente.
+# As entradas são indexadas pelo caminho do arquivo e invalidadas quando
+# a data de modificação ou o tamanho do arquivo mudam; as menos usadas
+# recentemente são descartadas quando o número de entradas ou a memória
+# ocupada pelos arrays excede os limites. Os arrays guardados são somente
+# leitura, pois a mesma curva é compartilhada entre as correções.
+class ReferenceCache():
+  
+  def __init__(self, maxEntries=32, maxBytes=256*2**20):
+    
+    self.maxEntries = maxEntries
+    self.maxBytes = maxBytes
+    self.entries = collections.OrderedDict()
+    self.bytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.lock = threading.Lock()
+  
+  def Get(self, fileData):
+    
+    key = os.path.abspath(fileData)
+    status = os.stat(key)
+    stamp = (status.st_mtime_ns, status.st_size)
+    
+    with self.lock:
+      entry = self.entries.get(key)
+      if(entry is not None and entry[0] == stamp):
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+      self.misses += 1
+    
+    data = Saxs()
+    data.ImportData(fileData)
+    for column in (data.q, data.I, data.sI):
+      column.flags.writeable = False
+    size = data.q.nbytes + data.I.nbytes + data.sI.nbytes
+    
+    with self.lock:
+      self.Discard(key)
+      if(size <= self.maxBytes):
+        self.entries[key] = (stamp, data, size)
+        self.bytes += size
+        while(len(self.entries) > self.maxEntries or self.bytes > self.maxBytes):
+          self.Discard(next(iter(self.entries)))
+    
+    return data
+  
+  # Remove uma entrada (chamada com o lock adquirido).
+  def Discard(self, key):
+    
+    entry = self.entries.pop(key, None)
+    if(entry is not None):
+      self.bytes -= entry[2]
+  
+  def Clear(self):
+    
+    with self.lock:
+      self.entries.clear()
+      self.bytes = 0
+      self.hits = 0
+      self.misses = 0
+  
+  def Statistics(self):
+    
+    with self.lock:
+      return {"hits": self.hits, "misses": self.misses, \
+          "entries": len(self.entries), "bytes": self.bytes}
+
+referenceCache = ReferenceCache()
+
+# Importa uma curva de referência usando o cache.
+def ImportReference(fileData):
+  
+  return referenceCache.Get(fileData)
+
 ########################################################################
 # Define as funções de correção.
 ########################################################################
 
+# As funções de correção aceitam tanto o nome do arquivo quanto um objeto
+# Saxs já em memória (por exemplo, o resultado da correção anterior), o
+# que permite encadear as correções sem arquivos intermediários.
+
+# Retorna o objeto Saxs, importando o arquivo caso seja passado o nome.
+def AsSaxs(data):
+  
+  if(isinstance(data, Saxs)):
+    return data
+  
+  return ReadData(data)
+
+# Como AsSaxs, mas arquivos de referência são importados pelo cache.
+def AsReference(data):
+  
+  if(isinstance(data, Saxs)):
+    return data
+  
+  return ImportReference(data)
+
+# Nome do arquivo de origem dos dados (usado no cabeçalho e para definir
+# o nome do arquivo de saída).
+def SourceName(data):
+  
+  if(isinstance(data, Saxs)):
+    return data.metadata.get("file", "")
+  
+  return os.fspath(data)
+
+# Nome padrão do arquivo de saída: nome de origem sem extensão + sufixo.
+def DefaultOutput(source, suffix):
+  
+  if(not source):
+    raise ValueError("SAXSPY Error: fileOutput must be given for data without a source file.")
+  
+  return source.split(".")[0] + suffix
+
+# Metadados da curva corrigida: os da amostra, com o nome do arquivo
+# atualizado quando a correção é salva.
+def CorrectionMetadata(sample, save, fileOutput):
+  
+  metadata = dict(sample.metadata)
+  if(save):
+    metadata["file"] = os.fspath(fileOutput)
+  
+  return metadata
+
 # Função de correção para o espalhamento do capilar (Capillary), 
 # transmissão (Transmission), espessura (Thickness) e calibração da 
 # escala q (q).
+@profiling.Timed("cttq", curves=1)
 def CorrectTo_CTTq(
     qSlope,  
     qIntercept, 
@@ -44,11 +495,14 @@ def CorrectTo_CTTq(
     save=True,
     fileOutput=0):
   
-  # Importa os dados SAXS.
-  sample = Saxs()
-  capillary = Saxs()
-  sample.ImportData(fileSample)
-  capillary.ImportData(fileCapillary)
+  from . import regrid
+  
+  # Importa os dados SAXS. Se as escalas q diferem, o capilar é
+  # interpolado na escala q da amostra.
+  sample = AsSaxs(fileSample)
+  capillary = AsReference(fileCapillary)
+  capillaryI, capillarysI = regrid.ReferenceOnGrid(capillary, sample.q)
+  fileSample = SourceName(fileSample)
   
   # Faz as correções.
   correction = Saxs()
@@ -58,28 +512,28 @@ def CorrectTo_CTTq(
 
   # Correção da intensidade pelo capilar, transmissão e espessura.
   correction.I = (sample.I/transmissionSample - \
-      capillary.I/transmissionCapillary)/thicknessSample
+      capillaryI/transmissionCapillary)/thicknessSample
 
   # Cálculo da nova incerteza.
   correction.sI = np.sqrt((sample.sI/transmissionSample)**2 +\
-      (capillary.sI/transmissionCapillary)**2)/thicknessSample
+      (capillarysI/transmissionCapillary)**2)/thicknessSample
 
   # Salva os dados corrigidos em arquivo.
   if(save):
     # Nome do arquivo de dados para a saída corrigida.
     if(fileOutput==0):
-      fileOutput = fileSample.split(".")[0] + "_cttqcorrected.dat"
+      fileOutput = DefaultOutput(fileSample, "_cttqcorrected.dat")
 
-    with open(fileOutput, 'w') as arq:
-      arq.write("# Corrected data file from: %s \n" % fileSample)
-      arq.write("# q\t\t I\t\t sI\n")
-      for i in range(correction.Size()):
-        arq.write("%.6e\t %.6e\t %.6e\n" % (correction.q[i], \
-            correction.I[i], correction.sI[i]))
+    WriteData(fileOutput, correction, \
+        header=("# Corrected data file from: %s \n" % fileSample) + \
+        "# q\t\t I\t\t sI\n")
+
+  correction.metadata = CorrectionMetadata(sample, save, fileOutput)
 
   return correction
 
 # Função de correção para o espalhamento do solvente.
+@profiling.Timed("solvent", curves=1)
 def CorrectTo_Solvent(
     fileSample,  
     fileSolvent, 
@@ -87,15 +541,14 @@ def CorrectTo_Solvent(
     save=True, 
     fileOutput=0):
   
-  # Nome do arquivo de dados para a saída corrigida.
-  if(fileOutput==0):
-    fileOutput = fileSample.split(".")[0] + "_solventcorrected.dat"
+  from . import regrid
   
-  # Importa os dados SAXS.
-  sample = Saxs()
-  solvent = Saxs()
-  sample.ImportData(fileSample)
-  solvent.ImportData(fileSolvent)
+  # Importa os dados SAXS. Se as escalas q diferem, o solvente é
+  # interpolado na escala q da amostra.
+  sample = AsSaxs(fileSample)
+  solvent = AsReference(fileSolvent)
+  solventI, solventsI = regrid.ReferenceOnGrid(solvent, sample.q)
+  fileSample = SourceName(fileSample)
     
   # Aplica a correção.
   correction = Saxs()
@@ -104,36 +557,38 @@ def CorrectTo_Solvent(
   correction.q = sample.q
 
   # Correção da intensidade pelo capilar, transmissão e espessura.
-  correction.I = sample.I - (1 - soluteVolumetricFraction)*solvent.I
+  correction.I = sample.I - (1 - soluteVolumetricFraction)*solventI
 
   # Cálculo da nova incerteza.
-  correction.sI = np.sqrt((sample.sI)**2 + ((1 - soluteVolumetricFraction)*solvent.sI)**2)
+  correction.sI = np.sqrt((sample.sI)**2 + ((1 - soluteVolumetricFraction)*solventsI)**2)
 
   # Salva os dados corrigidos em arquivo.
   if(save):
-    with open(fileOutput, 'w') as arq:
-      arq.write("# Corrected data (for solvent scattering) from file: %s \n" % fileSample)
-      arq.write("# q\t\t I\t\t sI\n")
-      for i in range(correction.Size()):
-        arq.write("%.6e\t %.6e\t %.6e\n" % (correction.q[i], \
-            correction.I[i], correction.sI[i]))
+    # Nome do arquivo de dados para a saída corrigida.
+    if(fileOutput==0):
+      fileOutput = DefaultOutput(fileSample, "_solventcorrected.dat")
+
+    WriteData(fileOutput, correction, \
+        header=("# Corrected data (for solvent scattering) from file: %s \n" % fileSample) + \
+        "# q\t\t I\t\t sI\n")
+
+  correction.metadata = CorrectionMetadata(sample, save, fileOutput)
 
   return correction
 
-# Função de correção para a escala absoluta.
+# Função de correção para a escala absoluta. sAbsoluteScaleFactor é a
+# incerteza do fator (por padrão não considerada).
+@profiling.Timed("absolute-scale", curves=1)
 def CorrectTo_AbsoluteScale(
     absoluteScaleFactor,
     fileSample,
     save=True,
-    fileOutput=0):
-  
-  # Define arquivo de saída caso não seja passado o argumento.
-  if(fileOutput==0):
-    fileOutput = fileSample.split(".")[0] + "_absolute.dat"
+    fileOutput=0,
+    sAbsoluteScaleFactor=0.0):
   
   # Importa os dados SAXS.
-  sample = Saxs()
-  sample.ImportData(fileSample)
+  sample = AsSaxs(fileSample)
+  fileSample = SourceName(fileSample)
   
   # Aplica a correção.
   correction = Saxs()
@@ -145,18 +600,23 @@ def CorrectTo_AbsoluteScale(
   correction.I = sample.I/absoluteScaleFactor
 
   # Cálculo da nova incerteza.
-  correction.sI = np.sqrt((sample.sI/absoluteScaleFactor)**2)
+  correction.sI = np.sqrt((sample.sI/absoluteScaleFactor)**2 + \
+      (correction.I*sAbsoluteScaleFactor/absoluteScaleFactor)**2)
   # Tipicamente a incerteza no fator de escala é pelo menos uma ordem \
-  # de grandeza menor que a incerteza nos dados, portanto não é \
-  # considerada no cálculo da nova incerteza dos dados.
+  # de grandeza menor que a incerteza nos dados, portanto por padrão não \
+  # é considerada no cálculo da nova incerteza dos dados. A incerteza \
+  # correlacionada entre pontos é obtida com uncertainty.Propagate.
 
   # Salva os dados corrigidos em arquivo.
   if(save):
-    with open(fileOutput, 'w') as arq:
-      arq.write("# Corrected data (absolute scale) from file: %s\n" % (fileSample))
-      arq.write("# q (A-1)\t\t I (cm-1)\t\t sI (cm-1)\n")
-      for i in range(correction.Size()):
-        arq.write("%.6e\t %.6e\t %.6e\n" % (correction.q[i], \
-            correction.I[i], correction.sI[i]))
+    # Define arquivo de saída caso não seja passado o argumento.
+    if(fileOutput==0):
+      fileOutput = DefaultOutput(fileSample, "_absolute.dat")
+
+    WriteData(fileOutput, correction, \
+        header=("# Corrected data (absolute scale) from file: %s\n" % (fileSample)) + \
+        "# q (A-1)\t\t I (cm-1)\t\t sI (cm-1)\n")
+
+  correction.metadata = CorrectionMetadata(sample, save, fileOutput)
 
   return correction
@@ -0,0 +1,448 @@
+import os
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Lotes de curvas de SAXS e correções em lote.
+from . import batch
+from .batch import SaxsBatch, ReadBatch
+# Média incremental das medidas.
+from .mean import MeanAccumulator, ExposureTime
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Séries de medidas resolvidas no tempo (dezenas de milhares de curvas
+# com a mesma quantidade de pontos) guardadas em um único arquivo
+# binário mapeado em memória, sem um objeto Saxs por curva:
+#
+#   assinatura (8 bytes) | tamanho do cabeçalho (uint64) | cabeçalho JSON
+#   | tempos de medida (frames, float64) | dados (frames x pontos x 3),
+#   com (q, I, sI) de cada ponto lado a lado, em float64 little-endian.
+#
+# Cada bloco começa em um endereço alinhado (como no formato SAXSPYB1).
+# Frame(k) retorna um objeto Saxs com visões do frame k e Chunks() percorre
+# a série em blocos de frames (SaxsBatch), de modo que correções, médias
+# e análises processam séries maiores que a memória disponível.
+#
+#   series = SeriesFromFiles(listFiles, "run.saxs")
+#   absolute = Map(series, lambda chunk: CorrectBatchTo_AbsoluteScale(1.224, chunk), \
+#       "run_absolute.saxs")
+#   mean = SeriesMean(absolute)
+#
+# Para medidas cinéticas, as correções aceitam um parâmetro por frame
+# (transmissão, espessura, fração, fator de escala) e as médias móveis
+# (janela de frames ou exponencial) geram uma nova série.
+########################################################################
+
+SERIES_MAGIC = b"SAXSPYS1"
+
+# Memória aproximada de cada bloco de frames processado de uma vez.
+CHUNK_BYTES = 32*2**20
+
+############### Define uma classe para séries de curvas de SAXS. ###########################
+############################################################################################
+
+class SaxsSeries():
+
+  def __init__(self):
+
+    self.fileData = None
+    self.frames = 0
+    self.size = 0
+    self.data = None
+    self.times = None
+    self.names = []
+    self.metadata = {}
+
+  # Mapeia o arquivo da série em memória (mode='r' somente leitura ou
+  # 'r+' para escrita).
+  def Open(self, fileData, mode='r'):
+
+    with open(fileData, 'rb') as f:
+      header, offset = saxs.ReadBinaryHeader(f, SERIES_MAGIC)
+
+    self.fileData = os.fspath(fileData)
+    self.frames = header["frames"]
+    self.size = header["size"]
+    self.names = header.get("names", [])
+    self.metadata = header.get("metadata", {})
+    dtype = np.dtype(header["dtype"])
+
+    self.times = np.memmap(fileData, dtype=dtype, mode=mode, offset=offset, \
+        shape=(self.frames,))
+    self.data = np.memmap(fileData, dtype=dtype, mode=mode, \
+        offset=offset + TimesBytes(self.frames), shape=(self.frames, self.size, 3))
+
+    return self
+
+  def Number(self):
+
+    return self.frames
+
+  def Size(self):
+
+    return self.size
+
+  # Nome do frame k (o arquivo de origem, quando conhecido).
+  def Name(self, k):
+
+    return self.names[k] if (k < len(self.names)) else "%s[%d]" % (self.fileData, k)
+
+  # Retorna o frame k como um objeto Saxs (visões do arquivo, sem cópia).
+  def Frame(self, k):
+
+    data = saxs.Saxs()
+    data.q = self.data[k, :, 0]
+    data.I = self.data[k, :, 1]
+    data.sI = self.data[k, :, 2]
+    data.size = self.size
+    data.metadata = {"time": float(self.times[k]), "file": self.Name(k)}
+
+    return data
+
+  # Retorna os frames [start, stop) como um SaxsBatch (visões do arquivo).
+  # Quando todos os frames do bloco têm a mesma escala q, q é uma única
+  # linha repetida, como em SaxsBatch.Stack.
+  def Chunk(self, start, stop):
+
+    stop = min(stop, self.frames)
+    chunk = SaxsBatch()
+    q = self.data[start:stop, :, 0]
+    if(len(q) > 0 and np.all(q == q[0])):
+      q = np.broadcast_to(q[0], q.shape)
+    chunk.q = q
+    chunk.I = self.data[start:stop, :, 1]
+    chunk.sI = self.data[start:stop, :, 2]
+    chunk.size = self.size
+    chunk.names = [self.Name(k) for k in range(start, stop)]
+    chunk.metadata = [{"time": float(self.times[k]), "file": chunk.names[k - start]} \
+        for k in range(start, stop)]
+
+    return chunk
+
+  # Número de frames por bloco: o que cabe em CHUNK_BYTES.
+  def ChunkSize(self):
+
+    return max(1, CHUNK_BYTES//max(1, 3*self.size*self.data.itemsize))
+
+  # Percorre a série em blocos: gera (primeiro frame, SaxsBatch).
+  def Chunks(self, chunkSize=None):
+
+    chunkSize = chunkSize or self.ChunkSize()
+    for start in range(0, self.frames, chunkSize):
+      yield start, self.Chunk(start, start + chunkSize)
+
+  # Escreve as curvas de um lote (e, se passados, os tempos) a partir do
+  # frame start.
+  def Write(self, start, chunk, times=None):
+
+    stop = start + chunk.Number()
+    self.data[start:stop, :, 0] = chunk.q
+    self.data[start:stop, :, 1] = chunk.I
+    self.data[start:stop, :, 2] = chunk.sI
+    if(times is not None):
+      self.times[start:stop] = times
+
+  def Flush(self):
+
+    self.times.flush()
+    self.data.flush()
+
+  def Close(self):
+
+    if(self.data is not None):
+      if(self.data.mode != 'r'):
+        self.Flush()
+      self.data = None
+      self.times = None
+
+########################################################################
+# Funções auxiliares.
+########################################################################
+
+# Tamanho do bloco de tempos, completado até um endereço alinhado.
+def TimesBytes(frames):
+
+  size = frames*saxs.BINARY_DTYPE.itemsize
+
+  return size + (-size) % saxs.BINARY_ALIGNMENT
+
+# Cria o arquivo de uma série com frames curvas de size pontos e o abre
+# para escrita. Os dados começam zerados (arquivo esparso).
+def CreateSeries(fileOutput, frames, size, times=None, names=None, metadata=None):
+
+  if(frames <= 0 or size <= 0):
+    raise ValueError("SAXSPY Error: a series must have at least one frame and one point.")
+
+  header = {
+      "frames": frames,
+      "size": size,
+      "dtype": saxs.BINARY_DTYPE.str,
+      "columns": ["q", "I", "sI"],
+      "names": list(names) if names is not None else [],
+      "metadata": metadata or {}}
+
+  with open(fileOutput, 'wb') as f:
+    offset = saxs.WriteBinaryHeader(f, header, SERIES_MAGIC)
+    f.truncate(offset + TimesBytes(frames) + frames*size*3*saxs.BINARY_DTYPE.itemsize)
+
+  series = SaxsSeries().Open(fileOutput, mode='r+')
+  series.times[:] = 1.0 if (times is None) else times
+
+  return series
+
+# Abre uma série existente.
+def ReadSeries(fileData, mode='r'):
+
+  return SaxsSeries().Open(fileData, mode)
+
+# Cria uma série a partir de uma lista de arquivos de dados (todos com o
+# mesmo número de pontos), importando chunkSize arquivos de cada vez. O
+# tempo de cada frame vem do cabeçalho do arquivo (ExposureTime), exigido
+# pelas médias pesadas pelo tempo; com defaultTime, os frames sem tempo
+# no cabeçalho recebem esse tempo.
+@profiling.Timed("series-import")
+def SeriesFromFiles(listFiles, fileOutput, chunkSize=256, metadata=None, defaultTime=None):
+
+  listFiles = list(listFiles)
+  first = saxs.ReadData(listFiles[0])
+  series = CreateSeries(fileOutput, len(listFiles), first.Size(), names=listFiles, \
+      metadata=metadata)
+
+  for start in range(0, len(listFiles), chunkSize):
+    chunk = ReadBatch(listFiles[start:start + chunkSize])
+    if(defaultTime is None):
+      times = [ExposureTime(chunk.Curve(k)) for k in range(chunk.Number())]
+    else:
+      times = [data.get("time", defaultTime) for data in chunk.metadata]
+    series.Write(start, chunk, times)
+
+  profiling.Count("series-import", curves=len(listFiles))
+  series.Flush()
+
+  return series
+
+########################################################################
+# Processamento em blocos.
+########################################################################
+
+# Aplica function (SaxsBatch -> SaxsBatch com as mesmas dimensões, como as
+# correções em lote) a cada bloco da série e escreve o resultado em uma
+# nova série, com os mesmos tempos e nomes.
+@profiling.Timed("series-map")
+def Map(series, function, fileOutput, chunkSize=None, metadata=None):
+
+  output = MapFrames(series, lambda chunk, start, stop: function(chunk), fileOutput, \
+      chunkSize, metadata)
+  profiling.Count("series-map", curves=series.Number())
+
+  return output
+
+# Como Map, mas function também recebe o intervalo [start, stop) de
+# frames do bloco (para parâmetros com um valor por frame).
+def MapFrames(series, function, fileOutput, chunkSize=None, metadata=None):
+
+  output = CreateSeries(fileOutput, series.Number(), series.Size(), times=series.times, \
+      names=series.names, metadata=metadata if (metadata is not None) else series.metadata)
+
+  for start, chunk in series.Chunks(chunkSize):
+    output.Write(start, function(chunk, start, start + chunk.Number()))
+
+  output.Flush()
+
+  return output
+
+# Média dos frames [start, stop) pesada pelo tempo de medida, como em
+# MeanMaker.SAXSMean (as somas de cada bloco são combinadas em um
+# MeanAccumulator).
+@profiling.Timed("series-mean")
+def SeriesMean(series, start=0, stop=None, chunkSize=None):
+
+  stop = series.Number() if (stop is None) else min(stop, series.Number())
+  chunkSize = chunkSize or series.ChunkSize()
+  accumulator = MeanAccumulator()
+
+  for first in range(start, stop, chunkSize):
+    last = min(first + chunkSize, stop)
+    time = np.asarray(series.times[first:last])[:, np.newaxis]
+    block = series.data[first:last]
+
+    partial = MeanAccumulator()
+    partial.frames = last - first
+    partial.timeTotal = float(np.sum(time))
+    partial.qSum = np.sum(time*block[:, :, 0], axis=0)
+    partial.ISum = np.sum(time*block[:, :, 1], axis=0)
+    partial.sI2Sum = np.sum((time*block[:, :, 2])**2, axis=0)
+    accumulator.Merge(partial)
+
+  profiling.Count("series-mean", curves=stop - start)
+
+  return accumulator.Result()
+
+# Análise de Guinier e Porod de todos os frames, bloco a bloco. Retorna a
+# mesma tabela de analysis.Analyze.
+@profiling.Timed("series-analysis")
+def AnalyzeSeries(series, chunkSize=None, guinierOptions=None, porodOptions=None):
+
+  from .analysis import Analyze
+
+  tables = [Analyze(chunk, guinierOptions, porodOptions) for start, chunk in series.Chunks(chunkSize)]
+  table = {}
+  for column in tables[0]:
+    if(isinstance(tables[0][column], list)):
+      table[column] = [value for partial in tables for value in partial[column]]
+    else:
+      table[column] = np.concatenate([partial[column] for partial in tables])
+
+  profiling.Count("series-analysis", curves=series.Number())
+
+  return table
+
+########################################################################
+# Correções com parâmetros por frame.
+########################################################################
+
+# Parâmetro escalar ou com um valor por frame, restrito aos frames
+# [start, stop).
+def FrameSlice(value, frames, start, stop):
+
+  value = np.asarray(value, dtype=float)
+  if(value.ndim == 0):
+    return value
+  if(value.shape != (frames,)):
+    raise ValueError("SAXSPY Error: per-frame parameters must have one value per frame " \
+        "(%d values for %d frames)." % (len(value), frames))
+
+  return value[start:stop]
+
+# Correção do capilar, transmissão, espessura e escala q de todos os
+# frames (CorrectTo_CTTq em lote). transmissionSample, thicknessSample e
+# transmissionCapillary podem ter um valor por frame; o capilar é
+# importado uma única vez.
+@profiling.Timed("series-cttq")
+def CorrectSeriesTo_CTTq(qSlope, qIntercept, series, transmissionSample, thicknessSample, \
+    capillary, transmissionCapillary, fileOutput, chunkSize=None):
+
+  frames = series.Number()
+  capillary = saxs.AsReference(capillary)
+  profiling.Count("series-cttq", curves=frames)
+
+  return MapFrames(series, lambda chunk, start, stop: batch.CorrectBatchTo_CTTq(qSlope, \
+      qIntercept, chunk, FrameSlice(transmissionSample, frames, start, stop), \
+      FrameSlice(thicknessSample, frames, start, stop), capillary, \
+      FrameSlice(transmissionCapillary, frames, start, stop)), fileOutput, chunkSize)
+
+# Correção do solvente de todos os frames (fração do soluto escalar ou
+# por frame).
+@profiling.Timed("series-solvent")
+def CorrectSeriesTo_Solvent(series, solvent, soluteVolumetricFraction, fileOutput, chunkSize=None):
+
+  frames = series.Number()
+  solvent = saxs.AsReference(solvent)
+  profiling.Count("series-solvent", curves=frames)
+
+  return MapFrames(series, lambda chunk, start, stop: batch.CorrectBatchTo_Solvent(chunk, \
+      solvent, FrameSlice(soluteVolumetricFraction, frames, start, stop)), fileOutput, chunkSize)
+
+# Correção para a escala absoluta de todos os frames (fator escalar ou
+# por frame).
+@profiling.Timed("series-absolute-scale")
+def CorrectSeriesTo_AbsoluteScale(absoluteScaleFactor, series, fileOutput, chunkSize=None):
+
+  frames = series.Number()
+  profiling.Count("series-absolute-scale", curves=frames)
+
+  return MapFrames(series, lambda chunk, start, stop: batch.CorrectBatchTo_AbsoluteScale( \
+      FrameSlice(absoluteScaleFactor, frames, start, stop), chunk), fileOutput, chunkSize)
+
+########################################################################
+# Médias móveis.
+########################################################################
+
+# Média móvel pesada pelo tempo (como em MeanMaker.SAXSMean) dos window
+# últimos frames: o frame k da nova série é a média dos frames
+# max(0, k-window+1), ..., k, e o seu tempo é a soma dos tempos da janela.
+# As médias vêm de diferenças de somas cumulativas (O(frames), qualquer
+# que seja a janela); entre blocos são guardadas somente as últimas window
+# linhas das somas.
+@profiling.Timed("series-moving-mean")
+def MovingMean(series, window, fileOutput, chunkSize=None):
+
+  if(window < 1):
+    raise ValueError("SAXSPY Error: the window must have at least one frame.")
+
+  frames = series.Number()
+  output = CreateSeries(fileOutput, frames, series.Size(), names=series.names, \
+      metadata=dict(series.metadata, window=window))
+
+  # Somas cumulativas de t, t*q, t*I e (t*sI)**2 dos frames [base, start).
+  history = np.zeros((1, 4, series.Size()))
+  base = 0
+  for start, chunk in series.Chunks(chunkSize):
+    stop = start + chunk.Number()
+    time = np.asarray(series.times[start:stop])[:, np.newaxis]
+    values = np.stack(np.broadcast_arrays(time, time*chunk.q, time*chunk.I, \
+        (time*chunk.sI)**2), axis=1)
+    sums = np.concatenate((history, history[-1] + np.cumsum(values, axis=0)))
+
+    k = np.arange(start, stop)
+    upper = sums[k + 1 - base]
+    lower = sums[np.maximum(k + 1 - window, 0) - base]
+    total = upper - lower
+
+    mean = SaxsBatch()
+    mean.q = total[:, 1]/total[:, 0]
+    mean.I = total[:, 2]/total[:, 0]
+    mean.sI = np.sqrt(np.maximum(total[:, 3], 0))/total[:, 0]
+    output.Write(start, mean, total[:, 0, 0])
+
+    keep = max(0, stop - window)
+    history = sums[keep - base:]
+    base = keep
+
+  profiling.Count("series-moving-mean", curves=frames)
+  output.Flush()
+
+  return output
+
+# Média móvel exponencial pesada pelo tempo: com d = 1 - alpha,
+#   S_k = d*S_(k-1) + t_k*I_k,  T_k = d*T_(k-1) + t_k,  I = S_k/T_k,
+#   V_k = d**2*V_(k-1) + (t_k*sI_k)**2,  sI = sqrt(V_k)/T_k.
+# As recorrências são filtros lineares (scipy.signal.lfilter) ao longo do
+# eixo dos frames, com o estado passado de um bloco ao seguinte. O tempo
+# de cada frame da nova série é o tempo efetivo T_k.
+@profiling.Timed("series-exponential-mean")
+def ExponentialMean(series, alpha, fileOutput, chunkSize=None):
+
+  from scipy.signal import lfilter
+
+  if(not 0 < alpha <= 1):
+    raise ValueError("SAXSPY Error: alpha must be in the interval (0, 1].")
+
+  frames = series.Number()
+  decay = 1 - alpha
+  output = CreateSeries(fileOutput, frames, series.Size(), names=series.names, \
+      metadata=dict(series.metadata, alpha=alpha))
+
+  # Estado dos filtros: (t, t*q, t*I) e (t*sI)**2.
+  state = np.zeros((1, 3, series.Size()))
+  stateVariance = np.zeros((1, series.Size()))
+  for start, chunk in series.Chunks(chunkSize):
+    stop = start + chunk.Number()
+    time = np.asarray(series.times[start:stop])[:, np.newaxis]
+    values = np.stack(np.broadcast_arrays(time, time*chunk.q, time*chunk.I), axis=1)
+
+    total, state = lfilter([1], [1, -decay], values, axis=0, zi=state)
+    variance, stateVariance = lfilter([1], [1, -decay**2], (time*chunk.sI)**2, axis=0, \
+        zi=stateVariance)
+
+    mean = SaxsBatch()
+    mean.q = total[:, 1]/total[:, 0]
+    mean.I = total[:, 2]/total[:, 0]
+    mean.sI = np.sqrt(variance)/total[:, 0]
+    output.Write(start, mean, total[:, 0, 0])
+
+  profiling.Count("series-exponential-mean", curves=frames)
+  output.Flush()
+
+  return output
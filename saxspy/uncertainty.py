@@ -0,0 +1,223 @@
+import numpy as np
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Interpolação das referências na escala q da amostra.
+from . import regrid
+# Medidas de desempenho (desligadas por padrão).
+from . import profiling
+
+########################################################################
+# Propagação das incertezas dos parâmetros das correções (calibração da
+# escala q, transmissões, espessura, fração do soluto e fator da escala
+# absoluta) através da cadeia CTTq -> solvente -> escala absoluta, além
+# das incertezas dos dados (amostra, capilar e solvente).
+#
+# Os parâmetros podem ser correlacionados (por exemplo, inclinação e
+# intercepto da calibração, cuja covariância é retornada por
+# calibration.CalibrateQScale e lida do arquivo da calibração com
+# calibration.ReadCalibration). Como um mesmo parâmetro afeta todos
+# os pontos, as incertezas da curva corrigida são correlacionadas entre
+# pontos; a covariância completa (pontos x pontos) pode ser retornada.
+#
+#   correction, covariance = Propagate("sample.dat", parameters, \
+#       uncertainties={"transmissionSample": 0.005, "absoluteScaleFactor": 0.02}, \
+#       blocks=[(("qSlope", "qIntercept"), calibrationCovariance)], \
+#       fileCapillary="capillary.dat", fullCovariance=True)
+#
+# method="analytic" propaga a covariância em primeira ordem pelo
+# jacobiano (exato para os termos lineares da cadeia); method="montecarlo"
+# avalia a cadeia para draws sorteios dos parâmetros e dos dados de uma
+# só vez, em arrays (sorteios x pontos). A incerteza da escala q é
+# convertida em incerteza da intensidade (em cada ponto da escala q
+# corrigida nominal) pela inclinação local da curva.
+########################################################################
+
+# Parâmetros da cadeia de correções, na ordem da covariância.
+PARAMETERS = ("qSlope", "qIntercept", "transmissionSample", "thicknessSample", \
+    "transmissionCapillary", "soluteVolumetricFraction", "absoluteScaleFactor")
+
+########################################################################
+# Funções auxiliares.
+########################################################################
+
+# Matriz de covariância dos parâmetros (na ordem de PARAMETERS) a partir
+# das incertezas individuais e de blocos (nomes, matriz) de parâmetros
+# correlacionados. Os blocos têm precedência sobre as incertezas.
+def ParameterCovariance(uncertainties=None, blocks=()):
+
+  covariance = np.zeros((len(PARAMETERS), len(PARAMETERS)))
+
+  for name, value in (uncertainties or {}).items():
+    j = PARAMETERS.index(name)
+    covariance[j, j] = value**2
+
+  for names, block in blocks:
+    index = [PARAMETERS.index(name) for name in names]
+    covariance[np.ix_(index, index)] = np.asarray(block, dtype=float)
+
+  return covariance
+
+# Valores dos parâmetros (na ordem de PARAMETERS); os das correções que
+# não são aplicadas são neutros.
+def ParameterValues(parameters):
+
+  neutral = {"qSlope": 1.0, "qIntercept": 0.0, "transmissionSample": 1.0, \
+      "thicknessSample": 1.0, "transmissionCapillary": 1.0, "soluteVolumetricFraction": 0.0, \
+      "absoluteScaleFactor": 1.0}
+
+  return np.array([parameters.get(name, neutral[name]) for name in PARAMETERS], dtype=float)
+
+# Correção CTTq das intensidades (na escala q medida) e, em seguida, as
+# correções do solvente e da escala absoluta (na escala q corrigida). Os
+# parâmetros (p[j]) e as intensidades podem ser arrays (sorteios x pontos).
+def ChainCTTq(p, sampleI, capillaryI):
+
+  if(capillaryI is None):
+    return sampleI
+
+  return (sampleI/p[2] - capillaryI/p[4])/p[3]
+
+def ChainSolventScale(p, I, solventI, absolute):
+
+  if(solventI is not None):
+    I = I - (1 - p[5])*solventI
+  if(absolute):
+    I = I/p[6]
+
+  return I
+
+# Interpola cada linha de I (sorteios x pontos, na escala q) nas posições
+# x (sorteios x pontos), com extrapolação linear nos extremos.
+def InterpolateRows(q, I, x):
+
+  index = np.clip(np.searchsorted(q, x) - 1, 0, len(q) - 2)
+  t = (x - q[index])/(q[index + 1] - q[index])
+
+  return np.take_along_axis(I, index, axis=1)*(1 - t) + \
+      np.take_along_axis(I, index + 1, axis=1)*t
+
+########################################################################
+# Propagação.
+########################################################################
+
+# Aplica a cadeia de correções à amostra e propaga as incertezas.
+# parameters: dicionário com os valores de PARAMETERS usados (as correções
+# sem os seus parâmetros ou arquivos são omitidas: CTTq com fileCapillary,
+# solvente com fileSolvent, escala absoluta com absoluteScaleFactor);
+# uncertainties e blocks: ver ParameterCovariance. Retorna o objeto Saxs
+# corrigido, com sI incluindo as incertezas dos parâmetros, e, com
+# fullCovariance=True, também a covariância (pontos x pontos).
+@profiling.Timed("uncertainty", curves=1)
+def Propagate(fileSample, parameters, uncertainties=None, blocks=(), fileCapillary=None, \
+    fileSolvent=None, method="analytic", draws=2000, fullCovariance=False, seed=None):
+
+  sample = saxs.AsSaxs(fileSample)
+  q = np.asarray(sample.q, dtype=float)
+  if(np.any(np.diff(q) <= 0)):
+    raise ValueError("SAXSPY Error: the q scale of the sample must be increasing.")
+
+  # Como nas funções de correção, o capilar é interpolado na escala q
+  # medida da amostra e o solvente na escala q corrigida.
+  p = ParameterValues(parameters)
+  parameterCovariance = ParameterCovariance(uncertainties, blocks)
+  capillaryI = capillarysI = solventI = solventsI = None
+  if(fileCapillary is not None):
+    capillaryI, capillarysI = regrid.ReferenceOnGrid(saxs.AsReference(fileCapillary), q)
+  qCorrected = p[0]*q + p[1] if (capillaryI is not None) else q
+  if(fileSolvent is not None):
+    solventI, solventsI = regrid.ReferenceOnGrid(saxs.AsReference(fileSolvent), qCorrected)
+  absolute = "absoluteScaleFactor" in parameters
+
+  correction = saxs.Saxs(sample.Size())
+  correction.q = qCorrected
+  correction.I = ChainSolventScale(p, ChainCTTq(p, sample.I, capillaryI), solventI, absolute)
+  correction.metadata = dict(sample.metadata, uncertaintyMethod=method)
+
+  if(method == "analytic"):
+    covariance = AnalyticCovariance(p, parameterCovariance, q, qCorrected, sample, correction.I, \
+        capillaryI, capillarysI, solventI, solventsI, absolute, fullCovariance)
+  elif(method == "montecarlo"):
+    covariance = MonteCarloCovariance(p, parameterCovariance, q, qCorrected, sample, capillaryI, \
+        capillarysI, solventI, solventsI, absolute, draws, fullCovariance, seed)
+  else:
+    raise ValueError("SAXSPY Error: unknown propagation method '%s' (analytic or montecarlo)." % method)
+
+  if(fullCovariance):
+    correction.sI = np.sqrt(np.diagonal(covariance))
+    return correction, covariance
+
+  correction.sI = np.sqrt(covariance)
+  return correction
+
+# Propagação em primeira ordem: diag(dados) + J C J^T, com o jacobiano J
+# (pontos x parâmetros) da cadeia. Retorna a variância de cada ponto ou,
+# com full=True, a covariância completa.
+def AnalyticCovariance(p, parameterCovariance, q, qCorrected, sample, I, capillaryI, capillarysI, \
+    solventI, solventsI, absolute, full):
+
+  scale = 1/p[6] if absolute else 1.0
+  J = np.zeros((len(q), len(PARAMETERS)))
+  variance = np.asarray(sample.sI, dtype=float)**2
+
+  if(capillaryI is not None):
+    corrected = (sample.I/p[2] - capillaryI/p[4])/p[3]
+    J[:, 2] = -sample.I/(p[2]**2*p[3])*scale
+    J[:, 3] = -corrected/p[3]*scale
+    J[:, 4] = capillaryI/(p[4]**2*p[3])*scale
+    variance = (variance/p[2]**2 + (capillarysI/p[4])**2)/p[3]**2
+
+  if(solventI is not None):
+    J[:, 5] = solventI*scale
+    variance = variance + ((1 - p[5])*solventsI)**2
+
+  if(absolute):
+    J[:, 6] = -I/p[6]
+    variance = variance*scale**2
+
+  # Calibração da escala q: deslocar a escala de dq equivale a alterar a
+  # intensidade corrigida pelo CTTq em cada q nominal de -(dI/dq) dq.
+  if(capillaryI is not None):
+    slope = np.gradient(corrected, qCorrected)*scale
+    J[:, 0] = -slope*q
+    J[:, 1] = -slope
+
+  if(full):
+    return np.diag(variance) + J @ parameterCovariance @ J.T
+
+  return variance + np.einsum('ij,jk,ik->i', J, parameterCovariance, J)
+
+# Monte Carlo: draws sorteios dos parâmetros (normal multivariada) e dos
+# dados (normais independentes), avaliados juntos como arrays (sorteios x
+# pontos), na escala q corrigida nominal.
+def MonteCarloCovariance(p, parameterCovariance, q, qCorrected, sample, capillaryI, capillarysI, \
+    solventI, solventsI, absolute, draws, full, seed):
+
+  rng = np.random.default_rng(seed)
+  size = len(q)
+
+  samples = rng.multivariate_normal(p, parameterCovariance, size=draws, method='eigh')
+  columns = [samples[:, j, np.newaxis] for j in range(len(PARAMETERS))]
+
+  # Variação de cada curva corrigida pelo CTTq (sem o ruído dos dados)
+  # devida à calibração da escala q: diferença entre a curva interpolada na
+  # posição (na escala medida) de cada q corrigido nominal e a curva nos
+  # pontos medidos. Interpolar as curvas com ruído reduziria a variância
+  # do ruído (média de pontos vizinhos independentes).
+  shift = 0
+  if(capillaryI is not None):
+    nominal = ChainCTTq(columns, sample.I, capillaryI)
+    shift = InterpolateRows(q, nominal, (qCorrected - columns[1])/columns[0]) - nominal
+
+  sampleI = sample.I + sample.sI*rng.standard_normal((draws, size))
+  if(capillaryI is not None):
+    capillaryI = capillaryI + capillarysI*rng.standard_normal((draws, size))
+  if(solventI is not None):
+    solventI = solventI + solventsI*rng.standard_normal((draws, size))
+
+  I = ChainCTTq(columns, sampleI, capillaryI) + shift
+  I = ChainSolventScale(columns, I, solventI, absolute)
+
+  if(full):
+    return np.cov(I, rowvar=False)
+
+  return np.var(I, axis=0, ddof=1)
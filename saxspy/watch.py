@@ -0,0 +1,221 @@
+import os
+import time
+import asyncio
+import fnmatch
+# Estruturas básicas para tratamento de dados de SAXS.
+from . import saxspy as saxs
+# Média incremental das medidas.
+from .mean import MeanAccumulator, ExposureTime
+
+########################################################################
+# Acompanhamento de um diretório durante a medida: os frames do detector
+# que aparecem no diretório são somados à média pesada pelo tempo (a
+# mesma de MeanMaker.SAXSMean, com MeanAccumulator) e a média atualizada
+# passa pelas correções de um Pipeline (CTTq, solvente, escala absoluta).
+#
+# Um arquivo é considerado completo quando o tamanho e a data de
+# modificação não mudam em stableChecks verificações seguidas. Os
+# arquivos completos entram em uma fila limitada (queueSize): se o
+# processamento atrasa, a verificação do diretório espera em vez de
+# acumular trabalho. Todos os frames que já estão na fila são somados
+# antes de cada correção, de modo que uma rajada de frames custa uma
+# única correção e a média corrigida fica no máximo uma correção atrás
+# do último frame. Leitura e correções são feitas em uma thread, sem
+# bloquear o laço de eventos. Os arquivos de saída (fileMean, fileOutput)
+# são ignorados mesmo que estejam no diretório, e cada frame precisa do
+# tempo de exposição no cabeçalho (como em MeanMaker.SAXSMean); frames com
+# erro são registrados em errors e não interrompem o acompanhamento.
+#
+#   pipeline = Pipeline().AddCTTq(...).AddSolvent(...).AddAbsoluteScale(...)
+#   watcher = FolderWatcher("data/", "*.dat", pipeline, fileMean="mean.dat", \
+#       fileOutput="mean_absolute.dat")
+#   watcher.Watch()
+########################################################################
+
+class FolderWatcher():
+
+  def __init__(self, directory, pattern="*.dat", pipeline=None, fileMean=None, \
+      fileOutput=None, interval=0.5, stableChecks=2, queueSize=16, chi2Threshold=None, \
+      onUpdate=None):
+
+    self.directory = directory
+    self.pattern = pattern
+    self.pipeline = pipeline
+    self.fileMean = fileMean
+    self.fileOutput = fileOutput
+    self.interval = interval
+    self.stableChecks = stableChecks
+    self.queueSize = queueSize
+    self.onUpdate = onUpdate
+
+    self.accumulator = MeanAccumulator(chi2Threshold)
+    self.mean = None
+    self.corrected = None
+
+    # Arquivos de saída, que não são lidos como frames.
+    self.excluded = set(os.path.realpath(fileName) for fileName in (fileMean, fileOutput) if fileName)
+
+    # Arquivos ainda sendo escritos: nome -> ((tamanho, data), verificações).
+    self.pending = {}
+    self.seen = set()
+    self.errors = []
+    self.updates = 0
+    self.latency = 0.0
+    self.maxLatency = 0.0
+    self.stop = None
+
+  ############### Verificação do diretório. ################################################
+
+  # Retorna os arquivos que ficaram completos desde a última verificação.
+  def Scan(self):
+
+    ready = []
+    try:
+      entries = list(os.scandir(self.directory))
+    except FileNotFoundError:
+      return ready
+
+    for entry in sorted(entries, key=lambda entry: entry.name):
+      if((entry.path in self.seen) or not fnmatch.fnmatch(entry.name, self.pattern)):
+        continue
+      if(os.path.realpath(entry.path) in self.excluded):
+        self.seen.add(entry.path)
+        continue
+      try:
+        status = entry.stat()
+      except FileNotFoundError:
+        continue
+      if(not entry.is_file()):
+        continue
+
+      stamp = (status.st_size, status.st_mtime_ns)
+      previous, checks = self.pending.get(entry.path, (None, 0))
+      checks = checks + 1 if (stamp == previous) else 0
+      if(checks >= self.stableChecks and status.st_size > 0):
+        del self.pending[entry.path]
+        self.seen.add(entry.path)
+        ready.append(entry.path)
+      else:
+        self.pending[entry.path] = (stamp, checks)
+
+    return ready
+
+  async def Poll(self, queue):
+
+    while(not self.stop.is_set()):
+      for fileData in self.Scan():
+        # Espera por espaço na fila (contrapressão).
+        await queue.put((fileData, time.perf_counter()))
+      try:
+        await asyncio.wait_for(self.stop.wait(), self.interval)
+      except asyncio.TimeoutError:
+        pass
+
+  ############### Média e correções. #######################################################
+
+  # Soma um frame à média (chamada na thread de trabalho). Qualquer erro
+  # (arquivo, cabeçalho sem tempo, escala q incompatível) rejeita o frame.
+  def AddFrame(self, fileData):
+
+    try:
+      frame = saxs.ReadData(fileData)
+      self.accumulator.Add(frame, ExposureTime(frame))
+    except Exception as error:
+      self.errors.append((fileData, "%s: %s" % (type(error).__name__, error)))
+
+  # Atualiza a média e aplica as correções (chamada na thread de trabalho).
+  def Update(self):
+
+    if(self.accumulator.frames == 0):
+      return
+
+    self.mean = self.accumulator.Result()
+    if(self.fileMean):
+      saxs.WriteData(self.fileMean, self.mean, \
+          header=("# Running mean of %d frames from: %s\n" % (self.mean.metadata["frames"], \
+          os.path.join(self.directory, self.pattern))) + "# q\t I(q)\t sI\n")
+
+    if(self.pipeline is not None):
+      self.corrected = self.pipeline.Run(self.mean, save=bool(self.fileOutput), \
+          fileOutput=self.fileOutput or 0)
+
+  async def Process(self, queue):
+
+    while(True):
+      items = [await queue.get()]
+      while(not queue.empty()):
+        items.append(queue.get_nowait())
+
+      try:
+        for fileData, arrival in items:
+          await asyncio.to_thread(self.AddFrame, fileData)
+        try:
+          await asyncio.to_thread(self.Update)
+        except Exception as error:
+          self.errors.append((self.fileOutput or self.fileMean or "update", \
+              "%s: %s" % (type(error).__name__, error)))
+
+        self.updates += 1
+        self.latency = time.perf_counter() - min(arrival for fileData, arrival in items)
+        self.maxLatency = max(self.maxLatency, self.latency)
+
+        if(self.onUpdate is not None):
+          self.onUpdate(self)
+      finally:
+        for _ in items:
+          queue.task_done()
+
+  ############### Execução. ################################################################
+
+  # Acompanha o diretório por duration segundos (ou até Stop). Os frames
+  # já na fila são processados antes de retornar. Se o processamento
+  # termina com um erro (por exemplo, em onUpdate), o erro é repassado.
+  async def Run(self, duration=None):
+
+    self.stop = asyncio.Event()
+    queue = asyncio.Queue(maxsize=self.queueSize)
+    poller = asyncio.create_task(self.Poll(queue))
+    processor = asyncio.create_task(self.Process(queue))
+    timer = None
+    if(duration is not None):
+      timer = asyncio.get_running_loop().call_later(duration, self.Stop)
+
+    try:
+      await self.Wait(poller, processor)
+      await self.Wait(asyncio.create_task(queue.join()), processor)
+    finally:
+      if(timer is not None):
+        timer.cancel()
+      self.Stop()
+      poller.cancel()
+      processor.cancel()
+
+    return self.Statistics()
+
+  # Espera task terminar, repassando o erro do processamento se ele
+  # terminar antes (a fila nunca seria esvaziada).
+  async def Wait(self, task, processor):
+
+    done, pending = await asyncio.wait((task, processor), return_when=asyncio.FIRST_COMPLETED)
+    if(task not in done):
+      task.cancel()
+      processor.result()
+      raise RuntimeError("SAXSPY Error: the frame processing stopped unexpectedly.")
+
+    task.result()
+
+  def Stop(self):
+
+    if(self.stop is not None):
+      self.stop.set()
+
+  # Executa Run em um novo laço de eventos (uso fora de código assíncrono).
+  def Watch(self, duration=None):
+
+    return asyncio.run(self.Run(duration))
+
+  def Statistics(self):
+
+    return {"frames": self.accumulator.frames, "rejected": self.accumulator.rejected, \
+        "pending": len(self.pending), "updates": self.updates, "errors": len(self.errors), \
+        "latency": self.latency, "maxLatency": self.maxLatency}
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Permite executar os testes a partir de qualquer diretório (pytest tests/).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import analysis
+from saxspy.models import Sphere
+
+Q = np.linspace(0.004, 0.6, 1500)
+
+# Esferas de raio R (com dispersão relativa spread dos raios, para
+# suavizar as oscilações em q alto), com ruído de 1%.
+def Spheres(radii, spread=0.0, background=0.0, seed=14):
+
+  rng = np.random.default_rng(seed)
+  listData = []
+  for R in radii:
+    if(spread > 0):
+      sizes = R*(1 + spread*np.linspace(-2, 2, 41))
+      weights = np.exp(-0.5*np.linspace(-2, 2, 41)**2)*sizes**6
+      I = sum(w*Sphere(Q, 1.0, r, 0.0) for w, r in zip(weights, sizes))/np.sum(weights)
+    else:
+      I = Sphere(Q, 1.0, R, 0.0)
+    I = I + background
+    data = saxs.Saxs(len(Q))
+    data.q = Q
+    data.sI = 0.01*I
+    data.I = I + data.sI*rng.standard_normal(len(Q))
+    data.metadata = {"file": "sphere%g.dat" % R}
+    listData.append(data)
+
+  return listData
+
+def test_guinier_radius_of_gyration():
+
+  radii = [20.0, 30.0, 45.0]
+  guinier = analysis.Guinier(Spheres(radii))
+
+  np.testing.assert_allclose(guinier["Rg"], np.sqrt(3/5)*np.array(radii), rtol=0.03)
+  np.testing.assert_allclose(guinier["I0"], 1.0, rtol=0.02)
+  assert np.all(guinier["sRg"] > 0) and np.all(guinier["sI0"] > 0)
+  assert guinier["file"] == ["sphere20.dat", "sphere30.dat", "sphere45.dat"]
+
+def test_guinier_automatic_range():
+
+  guinier = analysis.Guinier(Spheres([20.0, 30.0, 45.0]), qmin=0.005, qRgMax=1.3)
+
+  # O intervalo escolhido respeita q*Rg <= qRgMax e qmin, com pontos
+  # suficientes; curvas maiores têm intervalos menores.
+  assert np.all(guinier["qmax"]*guinier["Rg"] <= 1.3)
+  assert np.all(guinier["qmin"] > 0.005)
+  assert np.all(guinier["points"] >= 8)
+  assert np.all(np.diff(guinier["qmax"]) < 0)
+  assert np.all(guinier["chi2dof"] < 2)
+
+  strict = analysis.Guinier(Spheres([30.0]), qRgMax=0.8)
+  assert strict["qmax"][0]*strict["Rg"][0] <= 0.8
+  assert strict["points"][0] < guinier["points"][1]
+
+def test_guinier_without_valid_range():
+
+  data = Spheres([30.0, 30.0])
+  data[1].I = -data[1].I
+
+  # qmin acima de todos os pontos, ou intensidades negativas.
+  for guinier in (analysis.Guinier(data[:1], qmin=1.0), analysis.Guinier(data[1:])):
+    assert guinier["points"][0] == 0
+    assert np.isnan(guinier["Rg"][0]) and np.isnan(guinier["qmin"][0])
+
+def test_porod_constant_background_and_volume():
+
+  R = 30.0
+  data = Spheres([R], spread=0.1, background=1e-4)
+  table = analysis.Analyze(data, porodOptions={"qmin": 0.3})
+
+  # Em q alto, P(q) -> 4.5/(qR)**4 (média das oscilações).
+  assert table["K"][0] == pytest.approx(4.5/R**4, rel=0.15)
+  assert table["background"][0] == pytest.approx(1e-4, rel=0.05)
+  assert table["porodVolume"][0] == pytest.approx(4/3*np.pi*R**3, rel=0.15)
+
+def test_write_analysis(tmp_path):
+
+  table = analysis.Analyze(Spheres([20.0, 30.0]))
+  fileOutput = tmp_path / "analysis.dat"
+  analysis.WriteAnalysis(fileOutput, table)
+
+  rows = [line for line in fileOutput.read_text().splitlines() if not line.startswith("#")]
+  assert len(rows) == 2
+  assert rows[0].split(", ")[0] == "sphere20.dat"
+  assert float(rows[0].split(", ")[1]) == pytest.approx(table["Rg"][0], rel=1e-6)
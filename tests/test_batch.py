@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import batch
+
+Q = np.linspace(0.01, 0.3, 80)
+
+def Curve(I):
+
+  data = saxs.Saxs(len(Q))
+  data.q = Q.copy()
+  data.I = I
+  data.sI = 0.02*I + 0.01
+  data.metadata = {}
+
+  return data
+
+@pytest.fixture
+def curves():
+
+  return [Curve(scale*np.exp(-Q*10) + 1) for scale in (5.0, 10.0, 20.0)]
+
+@pytest.fixture
+def files(tmp_path, curves):
+
+  names = []
+  for k, data in enumerate(curves):
+    fileData = str(tmp_path / ("sample%d.dat" % k))
+    saxs.WriteData(fileData, data, header="# q I sI\n")
+    names.append(fileData)
+
+  return names
+
+def AssertRows(correction, expected):
+
+  assert correction.Number() == len(expected)
+  for k, data in enumerate(expected):
+    np.testing.assert_allclose(correction.q[k], data.q, rtol=1e-12)
+    np.testing.assert_allclose(correction.I[k], data.I, rtol=1e-12)
+    np.testing.assert_allclose(correction.sI[k], data.sI, rtol=1e-12)
+
+@pytest.mark.parametrize("source", ["curves", "files", "batch"])
+def test_cttq_matches_per_curve(curves, files, source):
+
+  capillary = Curve(1/(1 + Q*10))
+  transmission = np.array([0.5, 0.6, 0.7])
+  inputs = files if source == "files" else curves
+  samples = batch.AsBatch(inputs) if source == "batch" else inputs
+
+  correction = batch.CorrectBatchTo_CTTq(1.01, -0.001, samples, transmission, 0.1, \
+      capillary, 0.9)
+
+  expected = [saxs.CorrectTo_CTTq(1.01, -0.001, data, transmission[k], 0.1, \
+      capillary, 0.9, save=False) for k, data in enumerate(inputs)]
+  AssertRows(correction, expected)
+
+@pytest.mark.parametrize("source", ["curves", "files"])
+def test_solvent_matches_per_curve(curves, files, source):
+
+  solvent = Curve(1 + 0*Q)
+  samples = files if source == "files" else curves
+
+  correction = batch.CorrectBatchTo_Solvent(samples, solvent, [0.01, 0.02, 0.03])
+
+  expected = [saxs.CorrectTo_Solvent(data, solvent, fraction, save=False) \
+      for data, fraction in zip(samples, (0.01, 0.02, 0.03))]
+  AssertRows(correction, expected)
+
+@pytest.mark.parametrize("source", ["curves", "files"])
+def test_absolute_scale_matches_per_curve(curves, files, source):
+
+  samples = files if source == "files" else curves
+
+  correction = batch.CorrectBatchTo_AbsoluteScale(1.2, samples, \
+      sAbsoluteScaleFactor=0.05)
+
+  expected = [saxs.CorrectTo_AbsoluteScale(1.2, data, save=False, \
+      sAbsoluteScaleFactor=0.05) for data in samples]
+  AssertRows(correction, expected)
+
+def test_batch_from_files_keeps_names(files):
+
+  correction = batch.CorrectBatchTo_AbsoluteScale(2.0, files)
+
+  assert correction.names == files
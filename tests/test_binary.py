@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+
+# Curva com metadados de tipos variados (incluindo tipos do numpy).
+def Curve(size=257):
+
+  rng = np.random.default_rng(1)
+  data = saxs.Saxs(size)
+  data.q = np.linspace(0.005, 0.5, size)
+  data.I = rng.lognormal(size=size)
+  data.sI = 0.05*data.I
+  data.metadata = {"time": 12.5, "frames": np.int64(3), "label": "sample"}
+
+  return data
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_binary_round_trip(tmp_path, mmap):
+
+  data = Curve()
+  fileData = tmp_path / "curve.saxsb"
+  data.Save(fileData)
+
+  loaded = saxs.Saxs()
+  loaded.Load(fileData, mmap=mmap)
+
+  assert loaded.Size() == data.Size()
+  np.testing.assert_array_equal(loaded.q, data.q)
+  np.testing.assert_array_equal(loaded.I, data.I)
+  np.testing.assert_array_equal(loaded.sI, data.sI)
+  assert loaded.metadata == {"time": 12.5, "frames": 3, "label": "sample"}
+
+def test_binary_is_detected_by_import(tmp_path):
+
+  data = Curve()
+  fileData = tmp_path / "curve.saxsb"
+  data.Save(fileData)
+
+  assert saxs.IsBinaryFile(fileData)
+  loaded = saxs.ReadData(fileData)
+  np.testing.assert_array_equal(loaded.I, data.I)
+  assert loaded.metadata["file"] == str(fileData)
+  assert saxs.SourceName(loaded) == str(fileData)
+
+def test_binary_data_is_aligned(tmp_path):
+
+  fileData = tmp_path / "curve.saxsb"
+  Curve().Save(fileData)
+
+  with open(fileData, 'rb') as f:
+    header, offset = saxs.ReadBinaryHeader(f)
+
+  assert offset % saxs.BINARY_ALIGNMENT == 0
+  assert header["columns"] == ["q", "I", "sI"]
+
+def test_text_round_trip(tmp_path):
+
+  data = Curve()
+  fileData = tmp_path / "curve.dat"
+  saxs.WriteData(fileData, data, header="# q I sI\n")
+
+  loaded = saxs.ReadData(fileData)
+  np.testing.assert_allclose(loaded.I, data.I, rtol=1e-6)
+
+def test_wrong_signature_is_rejected(tmp_path):
+
+  fileData = tmp_path / "other.bin"
+  fileData.write_bytes(b"NOTSAXS0" + bytes(16))
+
+  with open(fileData, 'rb') as f:
+    with pytest.raises(ValueError):
+      saxs.ReadBinaryHeader(f)
+
+def test_save_back_to_mapped_file(tmp_path):
+
+  data = Curve()
+  fileData = tmp_path / "curve.saxsb"
+  data.Save(fileData)
+
+  loaded = saxs.ReadData(fileData)
+  assert isinstance(loaded.I, np.memmap)
+  loaded.metadata["note"] = "edited"
+  loaded.Save(fileData)
+
+  reloaded = saxs.ReadData(fileData)
+  np.testing.assert_array_equal(reloaded.q, data.q)
+  np.testing.assert_array_equal(reloaded.I, data.I)
+  np.testing.assert_array_equal(reloaded.sI, data.sI)
+  assert reloaded.metadata["note"] == "edited"
+  assert [path.name for path in tmp_path.iterdir()] == ["curve.saxsb"]
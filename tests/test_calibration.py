@@ -0,0 +1,188 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import calibration
+
+SLOPE = 1.02
+INTERCEPT = -0.0015
+
+# Padrão de behenato de prata medido com a escala q descalibrada:
+# q verdadeiro = SLOPE*q medido + INTERCEPT. A base de cada pico é
+# ajustada como constante, então o fundo decrescente (background) causa um
+# pequeno viés; sem ele a dispersão é somente a do ruído.
+def Behenate(orders=(1, 2, 3, 4), width=0.0015, seed=12, npts=2000, background=50.0):
+
+  rng = np.random.default_rng(seed)
+  q = np.linspace(0.02, 0.5, npts)
+  x = SLOPE*q + INTERCEPT
+  I = np.full(npts, 5.0) + background*np.exp(-q*10)
+  for n in orders:
+    I = I + 200/n/(1 + ((x - calibration.ReferencePeaks([n])[0])/width)**2)
+
+  data = saxs.Saxs(npts)
+  data.q = q
+  data.sI = np.sqrt(I/100)
+  data.I = I + data.sI*rng.standard_normal(npts)
+  data.metadata = {}
+
+  return data
+
+@pytest.mark.parametrize("method", ["global", "linear"])
+def test_calibration_recovers_slope_intercept_and_covariance(tmp_path, method):
+
+  orders, peakParameters, coefficients, covariance = calibration.CalibrateQScale(Behenate(), \
+      method=method)
+
+  assert orders == [1, 2, 3, 4]
+  assert covariance.shape == (2, 2)
+  np.testing.assert_allclose(covariance, covariance.T)
+  np.testing.assert_allclose(np.sqrt(np.diag(covariance)), [coefficients[0][1], coefficients[1][1]])
+  assert abs(coefficients[0][0] - SLOPE) < 5*coefficients[0][1]
+  assert abs(coefficients[1][0] - INTERCEPT) < 5*coefficients[1][1]
+  # Inclinação e intercepto são anticorrelacionados (q > 0).
+  assert covariance[0, 1] < 0
+
+  fileOutput = tmp_path / "calibration.dat"
+  calibration.WriteCalibration(fileOutput, "agbeh.dat", peakParameters, coefficients, orders, \
+      covariance)
+  slope, intercept, saved = calibration.ReadCalibration(fileOutput)
+  assert slope == pytest.approx(coefficients[0][0], rel=1e-6)
+  assert intercept == pytest.approx(coefficients[1][0], rel=1e-5)
+  np.testing.assert_allclose(saved, covariance, rtol=1e-8)
+
+def test_calibration_covariance_matches_scatter():
+
+  results = []
+  covariances = []
+  for seed in range(40):
+    orders, peakParameters, coefficients, covariance = calibration.CalibrateQScale( \
+        Behenate(seed=seed, background=0.0))
+    results.append([coefficients[0][0], coefficients[1][0]])
+    covariances.append(covariance)
+
+  # Sem viés: a média das realizações está a poucos erros padrão dos
+  # valores verdadeiros.
+  results = np.array(results)
+  expected = np.mean(covariances, axis=0)
+  error = np.sqrt(np.diag(expected)/len(results))
+  assert np.all(np.abs(np.mean(results, axis=0) - [SLOPE, INTERCEPT]) < 4*error)
+
+  # Covariância estimada pelo ajuste e dispersão entre as realizações do ruído.
+  scatter = np.cov(results, rowvar=False)
+  np.testing.assert_allclose(np.sqrt(np.diag(scatter)), np.sqrt(np.diag(expected)), rtol=0.35)
+  correlation = expected[0, 1]/np.sqrt(expected[0, 0]*expected[1, 1])
+  observed = scatter[0, 1]/np.sqrt(scatter[0, 0]*scatter[1, 1])
+  assert observed == pytest.approx(correlation, abs=0.2)
+
+def test_calibration_without_covariance_has_none(tmp_path):
+
+  data = Behenate()
+  orders, peakParameters, coefficients, covariance = calibration.CalibrateQScale(data)
+  fileOutput = tmp_path / "calibration.dat"
+  calibration.WriteCalibration(fileOutput, "agbeh.dat", peakParameters, coefficients, orders)
+
+  assert calibration.ReadCalibration(fileOutput)[2] is None
+
+############### Localização dos picos. ###################################
+
+# Posição (na escala medida) do pico de ordem n.
+def MeasuredPeak(n):
+
+  return (calibration.ReferencePeaks([n])[0] - INTERCEPT)/SLOPE
+
+def test_find_behenate_peaks():
+
+  data = Behenate()
+  orders, peakRanges = calibration.FindBehenatePeaks(data)
+
+  assert orders == [1, 2, 3, 4]
+  step = data.q[1] - data.q[0]
+  for n, (qmin, qmax) in zip(orders, peakRanges):
+    assert qmin < MeasuredPeak(n) < qmax
+    # Intervalo centrado no pico e menor que a distância entre as ordens.
+    assert abs(0.5*(qmin + qmax) - MeasuredPeak(n)) < 3*step
+    assert qmax - qmin < calibration.ReferencePeaks([1])[0]
+
+def test_find_behenate_peaks_skips_missing_orders():
+
+  orders, peakRanges = calibration.FindBehenatePeaks(Behenate(orders=(1, 2, 4)))
+
+  assert orders == [1, 2, 4]
+  assert peakRanges[2][0] < MeasuredPeak(4) < peakRanges[2][1]
+
+def test_find_behenate_peaks_ignores_noise():
+
+  data = Behenate(orders=())
+
+  assert calibration.FindBehenatePeaks(data) == ([], [])
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    calibration.CalibrateQScale(data)
+
+############### Escala absoluta (água). ##################################
+
+# Ajuste de grau zero de WaterFitScattering.FitConstant (np.polyfit).
+def PolyfitConstant(data, qinf, qsup):
+
+  mask = (data.q > qinf) & (data.q < qsup)
+  x, y, s = data.q[mask], data.I[mask], data.sI[mask]
+  p, cov = np.polyfit(x, y, 0, w=1/s, cov='unscaled')
+  p, chi2, rank, singular, rcond = np.polyfit(x, y, 0, w=1/s, full=True)
+
+  return p[0], np.sqrt(cov[0, 0]), chi2[0]/(len(x) - 1)
+
+def Waters(number=4, seed=13, commonGrid=True):
+
+  rng = np.random.default_rng(seed)
+  waters = []
+  for k in range(number):
+    q = np.linspace(0.01, 0.4, 300) if commonGrid else np.sort(rng.uniform(0.01, 0.4, 300))
+    data = saxs.Saxs(len(q))
+    data.q = q
+    data.sI = rng.uniform(0.001, 0.003, len(q))
+    data.I = 0.02*(1 + 0.1*k) + data.sI*rng.standard_normal(len(q))
+    data.metadata = {"file": "water%d.dat" % k}
+    waters.append(data)
+
+  return waters
+
+@pytest.mark.parametrize("commonGrid", [True, False])
+def test_fit_constant_batch_matches_polyfit(commonGrid):
+
+  waters = Waters(commonGrid=commonGrid)
+  a0, s0, chi2dof = calibration.FitConstantBatch(waters, 0.05, 0.3)
+
+  for k, water in enumerate(waters):
+    expected = PolyfitConstant(water, 0.05, 0.3)
+    np.testing.assert_allclose([a0[k], s0[k], chi2dof[k]], expected, rtol=1e-10)
+    np.testing.assert_allclose(calibration.FitConstant(water, 0.05, 0.3), expected, rtol=1e-10)
+
+def test_water_scattering_table():
+
+  assert calibration.WaterScattering() == pytest.approx(0.01632)
+  assert calibration.WaterScattering(293.15) == pytest.approx(calibration.WATER_SCATTERING)
+  # O espalhamento (rho**2 T kappa_T) cresce com a temperatura acima de 293 K.
+  values = calibration.WaterScattering([283.15, 293.15, 303.15, 323.15])
+  assert np.all(np.diff(values[1:]) > 0)
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    calibration.WaterScattering(400)
+
+def test_absolute_scale_factors(tmp_path):
+
+  waters = Waters()
+  table = calibration.AbsoluteScaleFactors(waters, 0.05, 0.3, temperature=[293.15, 293.15, \
+      303.15, 303.15])
+
+  a0, s0, chi2dof = calibration.FitConstantBatch(waters, 0.05, 0.3)
+  reference = calibration.WaterScattering([293.15, 293.15, 303.15, 303.15])
+  np.testing.assert_allclose(table["factor"], a0/reference)
+  np.testing.assert_allclose(table["sFactor"], s0/reference)
+  assert table["file"] == ["water0.dat", "water1.dat", "water2.dat", "water3.dat"]
+
+  fixed = calibration.AbsoluteScaleFactors(waters, 0.05, 0.3, reference=0.0165)
+  np.testing.assert_allclose(fixed["factor"], a0/0.0165)
+
+  fileOutput = tmp_path / "factors.dat"
+  calibration.WriteAbsoluteScaleFactors(fileOutput, table, 0.05, 0.3)
+  rows = [line for line in fileOutput.read_text().splitlines() if not line.startswith("#")]
+  assert len(rows) == 4 and rows[0].startswith("water0.dat, 293.15")
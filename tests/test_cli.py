@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import cli
+
+# Frames salvos no formato binário, com ou sem o tempo no cabeçalho, e o
+# arquivo com a lista deles.
+def FrameList(directory, times):
+
+  names = []
+  for k, time in enumerate(times):
+    data = saxs.Saxs(30)
+    data.q = np.linspace(0.01, 0.3, 30)
+    data.I = np.full(30, 1.0 + k)
+    data.sI = np.full(30, 0.1)
+    data.metadata = {} if (time is None) else {"time": time}
+    name = "frame%d.saxsb" % k
+    data.Save(directory / name)
+    names.append(name)
+
+  fileList = directory / "list.txt"
+  fileList.write_text("\n".join(names) + "\n")
+
+  return str(fileList)
+
+def test_mean_command(tmp_path, capsys):
+
+  fileList = FrameList(tmp_path, [1.0, 3.0])
+  fileOutput = str(tmp_path / "mean.dat")
+
+  assert cli.main(["mean", fileList, "-d", str(tmp_path), "-o", fileOutput]) == 0
+  np.testing.assert_allclose(saxs.ReadData(fileOutput).I, (1*1.0 + 3*2.0)/4)
+  assert "Mean of 2 files" in capsys.readouterr().out
+
+def test_mean_without_time_is_an_error(tmp_path, capsys):
+
+  fileList = FrameList(tmp_path, [1.0, None])
+
+  assert cli.main(["mean", fileList, "-d", str(tmp_path), "-o", str(tmp_path / "mean.dat")]) == 1
+  error = capsys.readouterr().err
+  assert error.startswith("SAXSPY Error:") and "frame1.saxsb" in error
+
+def test_missing_file_is_an_error(tmp_path, capsys):
+
+  assert cli.main(["mean", str(tmp_path / "none.txt"), "-o", str(tmp_path / "mean.dat")]) == 1
+  assert capsys.readouterr().err.startswith("SAXSPY Error:")
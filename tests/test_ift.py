@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import ift
+from saxspy.models import Sphere
+
+@pytest.fixture(autouse=True)
+def ClearCache():
+
+  ift.transformCache.Clear()
+  yield
+  ift.transformCache.Clear()
+
+# Curvas de esferas de raio R, com ruído de 1%.
+def Spheres(R=30.0, number=3, seed=7):
+
+  rng = np.random.default_rng(seed)
+  q = np.linspace(0.005, 0.3, 200)
+  listData = []
+  for k in range(number):
+    data = saxs.Saxs(len(q))
+    data.q = q
+    I = Sphere(q, 1.0, R, 0.0)
+    data.sI = 0.01*I + 1e-6
+    data.I = I + data.sI*rng.standard_normal(len(q))
+    data.metadata = {"file": "sphere%d.dat" % k}
+    listData.append(data)
+
+  return listData
+
+def test_ift_sphere_radius_of_gyration():
+
+  result = ift.IFT(Spheres(), Dmax=65)
+
+  np.testing.assert_allclose(result["Rg"], np.sqrt(3/5)*30, rtol=0.02)
+  assert np.all(result["P"][:, 0] == 0) and np.all(result["P"][:, -1] == 0)
+  assert np.all(result["chi2dof"] < 2)
+
+def test_ift_fit_reproduces_intensity():
+
+  data = Spheres(number=1)[0]
+  result = ift.IFT(data, Dmax=65)
+
+  np.testing.assert_allclose(result["fit"][0], data.I, rtol=0.05, atol=5*data.sI.max())
+  assert result["I0"][0] == pytest.approx(Sphere(np.array([1e-6]), 1.0, 30.0, 0.0)[0], rel=0.02)
+
+def test_ift_weights_share_the_decomposition_only_when_common():
+
+  listData = Spheres()
+
+  ift.IFT(listData, Dmax=65, weights="individual")
+  assert ift.transformCache.Statistics()["entries"] == 1
+
+  ift.IFT(listData, Dmax=65, weights="common")
+  assert ift.transformCache.Statistics()["entries"] == 2
+
+def test_ift_rejects_unknown_weights():
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    ift.IFT(Spheres(number=1), Dmax=65, weights="other")
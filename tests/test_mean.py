@@ -0,0 +1,167 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy.mean import MeanAccumulator, ExposureTime
+
+def Frames(number=6, size=64, seed=2):
+
+  rng = np.random.default_rng(seed)
+  q = np.linspace(0.01, 0.3, size)
+  frames = []
+  for k in range(number):
+    frame = saxs.Saxs(size)
+    frame.q = q
+    frame.I = 10*np.exp(-q*20) + rng.normal(scale=0.1, size=size)
+    frame.sI = np.full(size, 0.1) + 0.01*k
+    frame.metadata = {"time": 1.0 + k}
+    frames.append(frame)
+
+  return frames
+
+# Média pesada pelo tempo calculada diretamente (como em MeanMaker.SAXSMean).
+def NaiveMean(frames):
+
+  t = np.array([frame.metadata["time"] for frame in frames])
+  I = sum(ti*frame.I for ti, frame in zip(t, frames))/t.sum()
+  sI = np.sqrt(sum((ti*frame.sI)**2 for ti, frame in zip(t, frames)))/t.sum()
+
+  return I, sI
+
+def test_accumulator_matches_naive_mean():
+
+  frames = Frames()
+  accumulator = MeanAccumulator()
+  for frame in frames:
+    assert accumulator.Add(frame)
+
+  mean = accumulator.Result()
+  I, sI = NaiveMean(frames)
+  np.testing.assert_allclose(mean.I, I)
+  np.testing.assert_allclose(mean.sI, sI)
+  np.testing.assert_allclose(mean.q, frames[0].q)
+  assert mean.metadata["frames"] == len(frames)
+  assert mean.metadata["time"] == pytest.approx(sum(frame.metadata["time"] for frame in frames))
+
+def test_remove_undoes_add():
+
+  frames = Frames()
+  accumulator = MeanAccumulator()
+  for frame in frames:
+    accumulator.Add(frame)
+  accumulator.Remove(frames[-1])
+
+  I, sI = NaiveMean(frames[:-1])
+  mean = accumulator.Result()
+  np.testing.assert_allclose(mean.I, I)
+  np.testing.assert_allclose(mean.sI, sI)
+
+def test_merge_matches_single_accumulator():
+
+  frames = Frames()
+  first, second = MeanAccumulator(), MeanAccumulator()
+  for frame in frames[:2]:
+    first.Add(frame)
+  for frame in frames[2:]:
+    second.Add(frame)
+  first.Merge(second)
+
+  I, sI = NaiveMean(frames)
+  np.testing.assert_allclose(first.Result().I, I)
+  np.testing.assert_allclose(first.Result().sI, sI)
+
+def test_rejected_count_survives_remove_and_merge():
+
+  frames = Frames()
+  outlier = Frames(1, seed=5)[0]
+  outlier.I = outlier.I + 100
+
+  accumulator = MeanAccumulator(chi2Threshold=5, minFrames=3)
+  for frame in frames[:3]:
+    accumulator.Add(frame)
+  assert not accumulator.Add(outlier)
+  assert accumulator.rejected == 1
+
+  for frame in frames[:3]:
+    accumulator.Remove(frame)
+  assert accumulator.frames == 0
+  assert accumulator.rejected == 1
+
+  other = MeanAccumulator()
+  other.rejected = 2
+  accumulator.Merge(other)
+  assert accumulator.rejected == 3
+
+def test_exposure_time_is_required():
+
+  frame = Frames(1)[0]
+  frame.metadata = {"file": "frame.dat"}
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    ExposureTime(frame)
+
+def test_empty_result_raises():
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    MeanAccumulator().Result()
+
+def test_frame_without_time_is_rejected():
+
+  frame = Frames(1)[0]
+  frame.metadata = {}
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    MeanAccumulator().Add(frame)
+  assert MeanAccumulator().Add(frame, 2.0)
+
+def test_remove_requires_an_added_frame():
+
+  frames = Frames()
+  outlier = Frames(1, seed=5)[0]
+  outlier.I = outlier.I + 100
+
+  accumulator = MeanAccumulator(chi2Threshold=5, minFrames=3)
+  for frame in frames[:4]:
+    accumulator.Add(frame)
+  accumulator.Add(outlier)
+
+  # Medida rejeitada, não adicionada, ou com outro tempo.
+  for frame, time in ((outlier, None), (frames[5], None), (frames[0], 10.0)):
+    with pytest.raises(ValueError, match="SAXSPY Error"):
+      accumulator.Remove(frame, time)
+
+  accumulator.Remove(frames[0])
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    accumulator.Remove(frames[0])
+
+  I, sI = NaiveMean(frames[1:4])
+  np.testing.assert_allclose(accumulator.Result().I, I)
+
+def test_merged_frames_can_be_removed():
+
+  frames = Frames()
+  first, second = MeanAccumulator(), MeanAccumulator()
+  first.Add(frames[0])
+  second.Add(frames[1])
+  second.Add(frames[2])
+  first.Merge(second)
+  first.Remove(frames[1])
+
+  I, sI = NaiveMean([frames[0], frames[2]])
+  np.testing.assert_allclose(first.Result().I, I)
+
+def test_merge_requires_the_same_grid():
+
+  frames = Frames()
+  other = Frames(1, size=64)[0]
+  other.q = other.q*1.1
+
+  first, second = MeanAccumulator(), MeanAccumulator()
+  first.Add(frames[0])
+  second.Add(other)
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    first.Merge(second)
+
+  third = MeanAccumulator()
+  third.Add(Frames(1, size=32)[0])
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    first.Merge(third)
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy.models import FitModel
+from saxspy.models.formfactors import MODELS
+
+# Parâmetros típicos de cada modelo (tamanhos em Angstrom).
+PARAMETERS = {
+    "sphere": (2.0, 30.0, 0.01),
+    "core-shell": (2.0, 25.0, 8.0, -0.5, 0.01),
+    "cylinder": (2.0, 15.0, 80.0, 0.01),
+    "ellipsoid": (2.0, 20.0, 45.0, 0.01),
+    "gaussian-chain": (2.0, 40.0, 0.01)}
+
+Q = np.linspace(0.005, 0.4, 120)
+
+# Jacobiano por diferenças centrais.
+def FiniteDifferences(function, q, parameters, step=1e-6):
+
+  columns = []
+  for j, value in enumerate(parameters):
+    h = step*max(abs(value), 1.0)
+    plus, minus = list(parameters), list(parameters)
+    plus[j] = value + h
+    minus[j] = value - h
+    columns.append((function(q, *plus) - function(q, *minus))/(2*h))
+
+  return np.stack(columns, axis=-1)
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+def test_jacobian_matches_finite_differences(model):
+
+  names, function, jacobian, lower = MODELS[model]
+  parameters = PARAMETERS[model]
+
+  J = jacobian(Q, *parameters)
+  assert J.shape == (len(Q), len(names))
+
+  expected = FiniteDifferences(function, Q, parameters)
+  for j in range(len(names)):
+    scale = np.max(np.abs(expected[:, j]))
+    np.testing.assert_allclose(J[:, j], expected[:, j], rtol=1e-4, atol=1e-6*scale, \
+        err_msg="%s: %s" % (model, names[j]))
+
+@pytest.mark.parametrize("model", sorted(MODELS))
+def test_models_broadcast_over_curves(model):
+
+  names, function, jacobian, lower = MODELS[model]
+  parameters = PARAMETERS[model]
+  columns = [np.array([[value], [1.1*value]]) for value in parameters]
+
+  I = function(np.broadcast_to(Q, (2, len(Q))), *columns)
+  np.testing.assert_allclose(I[0], function(Q, *parameters))
+  np.testing.assert_allclose(I[1], function(Q, *[1.1*value for value in parameters]))
+
+def Curves(model, number=3, seed=8):
+
+  rng = np.random.default_rng(seed)
+  function = MODELS[model][1]
+  listData = []
+  for k in range(number):
+    data = saxs.Saxs(len(Q))
+    data.q = Q
+    I = function(Q, *PARAMETERS[model])
+    data.sI = 0.01*I
+    data.I = I + data.sI*rng.standard_normal(len(Q))
+    listData.append(data)
+
+  return listData
+
+@pytest.mark.parametrize("model", ["sphere", "gaussian-chain"])
+def test_fit_recovers_parameters(model):
+
+  fit = FitModel(Curves(model), model)
+
+  assert np.all(fit.converged)
+  assert np.all(fit.chi2dof < 2)
+  for k in range(fit.Number()):
+    np.testing.assert_allclose(fit.parameters[k, :2], PARAMETERS[model][:2], rtol=0.02)
+
+def test_fit_with_fixed_parameter():
+
+  p0 = np.array([1.5, 28.0, 0.01])
+  fit = FitModel(Curves("sphere"), "sphere", p0=p0, fixed=(2,))
+
+  np.testing.assert_array_equal(fit.parameters[:, 2], 0.01)
+  np.testing.assert_allclose(fit.Parameter("R")[0], 30.0, rtol=0.02)
+
+def test_interrupted_fit_is_not_converged():
+
+  fit = FitModel(Curves("sphere"), "sphere", p0=[1.0, 20.0, 0.0], maxIterations=2)
+
+  assert not np.any(fit.converged)
+  np.testing.assert_array_equal(fit.iterations, 2)
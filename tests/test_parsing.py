@@ -0,0 +1,105 @@
+import gzip
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+
+# Cabeçalho no formato dos arquivos do detector: o tempo de exposição (em
+# ms) é a terceira coluna da linha EXPOSURE_TIME_LINE.
+DETECTOR_HEADER = [
+    "Sample AgBh 2019",
+    "# Distance: 1200.5",
+    "# detector = Pilatus 300k",
+    "# operator Maria",
+    "",
+    "# Exposure_time: 350 ms",
+    "# Comment: q in A-1"]
+
+ROWS = np.array([[0.01, 10.0, 0.1], [0.02, 8.0, 0.09], [0.03, 6.5, 0.08]])
+
+def WriteText(fileData, lines, opener=open):
+
+  with opener(fileData, 'wt') as f:
+    f.write("\n".join(lines) + "\n")
+    for row in ROWS:
+      f.write("%.6e %.6e %.6e\n" % tuple(row))
+
+@pytest.mark.parametrize("line, expected", [
+    ("0.01 10.0 0.1", True),
+    ("  1e-2\t1.0E+1\t-0.1 extra", True),
+    ("0.01 10.0", False),
+    ("# 0.01 10.0 0.1", False),
+    ("q I sI", False),
+    ("0.01 nan-ish 0.1", False),
+    ("", False)])
+def test_is_data_line(line, expected):
+
+  assert saxs.IsDataLine(line) == expected
+
+def test_parse_header_separators_and_numbers():
+
+  metadata = saxs.ParseHeader(["# Distance: 1200.5", "# detector = Pilatus 300k", \
+      "# operator Maria", "#", "# Distance: 3.0"])
+
+  assert metadata["Distance"] == 1200.5
+  assert metadata["detector"] == "Pilatus 300k"
+  assert metadata["operator"] == "Maria"
+  assert "time" not in metadata
+  assert len(metadata["header"]) == 5
+
+def test_parse_header_time_from_detector_line():
+
+  metadata = saxs.ParseHeader(DETECTOR_HEADER)
+
+  assert metadata["time"] == pytest.approx(0.35)
+  assert metadata["Sample"] == "AgBh 2019"
+
+def test_parse_header_time_line_without_number():
+
+  header = list(DETECTOR_HEADER)
+  header[saxs.EXPOSURE_TIME_LINE - 1] = "# Exposure_time: unknown"
+
+  assert "time" not in saxs.ParseHeader(header)
+
+def test_import_title_line_without_hash(tmp_path):
+
+  fileData = str(tmp_path / "agbh.dat")
+  WriteText(fileData, DETECTOR_HEADER)
+
+  data = saxs.Saxs()
+  data.ImportData(fileData)
+
+  np.testing.assert_allclose(np.column_stack((data.q, data.I, data.sI)), ROWS)
+  assert data.metadata["header"] == DETECTOR_HEADER
+  assert data.metadata["time"] == pytest.approx(0.35)
+  assert data.metadata["file"] == fileData
+
+def test_import_gzip_matches_plain(tmp_path):
+
+  filePlain = str(tmp_path / "agbh.dat")
+  fileCompressed = str(tmp_path / "agbh.dat.gz")
+  WriteText(filePlain, DETECTOR_HEADER)
+  WriteText(fileCompressed, DETECTOR_HEADER, opener=gzip.open)
+
+  plain = saxs.Saxs()
+  plain.ImportData(filePlain)
+  compressed = saxs.Saxs()
+  compressed.ImportData(fileCompressed)
+
+  np.testing.assert_array_equal(compressed.q, plain.q)
+  np.testing.assert_array_equal(compressed.I, plain.I)
+  np.testing.assert_array_equal(compressed.sI, plain.sI)
+  assert compressed.metadata["time"] == plain.metadata["time"]
+
+def test_write_gzip_round_trip(tmp_path):
+
+  data = saxs.Saxs(len(ROWS))
+  data.q, data.I, data.sI = ROWS.T.copy()
+  fileOutput = str(tmp_path / "out.dat.gz")
+  saxs.WriteData(fileOutput, data, header="# q I sI\n")
+
+  with gzip.open(fileOutput, 'rt') as f:
+    assert f.readline() == "# q I sI\n"
+
+  loaded = saxs.Saxs()
+  loaded.ImportData(fileOutput)
+  np.testing.assert_allclose(loaded.I, ROWS[:, 1])
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import peaks
+
+PARAMETERS = {
+    "lorentzian": (0.1076, 0.002, 50.0, 1.5),
+    "pseudo-voigt": (0.1076, 0.002, 50.0, 1.5, 0.4)}
+
+# Jacobiano por diferenças centrais.
+def FiniteDifferences(function, q, parameters, step=1e-7):
+
+  columns = []
+  for j, value in enumerate(parameters):
+    h = step*max(abs(value), 1e-3)
+    plus, minus = list(parameters), list(parameters)
+    plus[j] = value + h
+    minus[j] = value - h
+    columns.append((function(q, *plus) - function(q, *minus))/(2*h))
+
+  return np.stack(columns, axis=-1)
+
+@pytest.mark.parametrize("profile", sorted(peaks.MODELS))
+def test_jacobian_matches_finite_differences(profile):
+
+  function, jacobian = peaks.MODELS[profile]
+  q = np.linspace(0.1, 0.115, 200)
+  parameters = PARAMETERS[profile]
+
+  J = jacobian(q, *parameters)
+  expected = FiniteDifferences(function, q, parameters)
+  for j in range(len(parameters)):
+    scale = np.max(np.abs(expected[:, j]))
+    np.testing.assert_allclose(J[:, j], expected[:, j], rtol=1e-5, atol=1e-6*scale)
+
+# Curva com um pico em cada centro, com ruído de 1%.
+def PeakCurve(profile, centers, seed=9):
+
+  rng = np.random.default_rng(seed)
+  function = peaks.MODELS[profile][0]
+  data = saxs.Saxs(3000)
+  data.q = np.linspace(0.05, 0.5, 3000)
+  I = np.full(len(data.q), 1.5)
+  for q0 in centers:
+    I = I + function(data.q, q0, *PARAMETERS[profile][1:]) - 1.5
+  data.sI = 0.01*I
+  data.I = I + data.sI*rng.standard_normal(len(I))
+  data.metadata = {}
+
+  return data
+
+@pytest.mark.parametrize("profile", sorted(peaks.MODELS))
+def test_fit_recovers_peak_centers(profile):
+
+  centers = [0.1076, 0.2152, 0.3228]
+  data = PeakCurve(profile, centers)
+  peakRanges = [(q0 - 0.01, q0 + 0.01) for q0 in centers]
+
+  fit = peaks.FitPeaks(data, peakRanges, profile)
+  q0, sq0 = fit.Centers()
+
+  np.testing.assert_allclose(q0, centers, atol=1e-5)
+  assert np.all(sq0 > 0) and np.all(np.abs(q0 - centers) < 5*sq0 + 1e-6)
+  assert np.all(fit.R2 > 0.99)
+  assert len(fit.FitResults(0)) == len(PARAMETERS[profile]) + 1
+
+def test_joint_fit_matches_independent_fits():
+
+  centers = [0.1076, 0.2152]
+  data = PeakCurve("lorentzian", centers)
+  peakRanges = [(q0 - 0.01, q0 + 0.01) for q0 in centers]
+
+  joint = peaks.FitPeaks(data, peakRanges)
+  for k, qran in enumerate(peakRanges):
+    single = peaks.FitPeaks(data, [qran])
+    np.testing.assert_allclose(joint.parameters[k], single.parameters[0], rtol=1e-6)
+    np.testing.assert_allclose(joint.uncertainties[k], single.uncertainties[0], rtol=1e-4)
@@ -0,0 +1,61 @@
+import os
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy.pipeline import Pipeline
+
+def Curve(q, I):
+
+  data = saxs.Saxs(len(q))
+  data.q = q
+  data.I = I
+  data.sI = 0.01*I
+  data.metadata = {}
+
+  return data
+
+@pytest.fixture
+def files(tmp_path):
+
+  q = np.linspace(0.01, 0.3, 100)
+  names = []
+  for name, I in (("sample", 10*np.exp(-q*10) + 2), ("capillary", 1/(1 + q*10)), \
+      ("solvent", 1 + 0*q)):
+    fileData = str(tmp_path / (name + ".dat"))
+    saxs.WriteData(fileData, Curve(q, I), header="# q I sI\n")
+    names.append(fileData)
+
+  return names
+
+def MakePipeline(capillary, solvent):
+
+  return Pipeline().AddCTTq(1.0, 0.0, 0.5, 0.1, capillary, 0.9).AddSolvent(solvent, 0.02) \
+      .AddAbsoluteScale(1.2)
+
+def test_pipeline_matches_file_chain(files):
+
+  sample, capillary, solvent = files
+
+  cttq = saxs.CorrectTo_CTTq(1.0, 0.0, sample, 0.5, 0.1, capillary, 0.9)
+  solventCorrected = saxs.CorrectTo_Solvent(cttq.metadata["file"], solvent, 0.02)
+  expected = saxs.CorrectTo_AbsoluteScale(1.2, solventCorrected, save=False)
+
+  correction = MakePipeline(capillary, solvent).Run(sample, save=False)
+  np.testing.assert_allclose(correction.I, expected.I, rtol=1e-6)
+  np.testing.assert_allclose(correction.sI, expected.sI, rtol=1e-6)
+
+@pytest.mark.parametrize("saveIntermediates", [False, True])
+def test_pipeline_default_name_comes_from_sample(files, saveIntermediates):
+
+  sample, capillary, solvent = files
+  MakePipeline(capillary, solvent).Run(sample, saveIntermediates=saveIntermediates)
+
+  directory = os.path.dirname(sample)
+  assert os.path.exists(os.path.join(directory, "sample_absolute.dat"))
+  assert os.path.exists(os.path.join(directory, "sample_cttqcorrected.dat")) == saveIntermediates
+  assert not os.path.exists(os.path.join(directory, "sample_cttqcorrected_solventcorrected_absolute.dat"))
+
+def test_empty_pipeline():
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    Pipeline().Run("sample.dat")
@@ -0,0 +1,114 @@
+import csv
+import json
+import pytest
+from saxspy import profiling
+
+@pytest.fixture(autouse=True)
+def Clean():
+
+  profiling.Disable()
+  profiling.Reset()
+  yield
+  profiling.Disable()
+  profiling.Reset()
+
+@profiling.Timed("square", curves=2)
+def Square(x):
+
+  return x*x
+
+@profiling.Timed("fail")
+def Fail():
+
+  raise ValueError("SAXSPY Error: failed.")
+
+def test_disabled_is_noop():
+
+  assert Square(3) == 9
+  profiling.Count("square", bytesRead=100)
+  with profiling.Stage("block"):
+    pass
+
+  assert profiling.stages == {}
+  assert profiling.Report()["stages"] == []
+
+def test_timed_and_count_when_enabled():
+
+  profiling.Enable()
+  assert Square(3) == 9
+  assert Square(4) == 16
+  profiling.Count("square", bytesRead=100, iterations=3)
+  profiling.Count("square", bytesRead=50)
+
+  counters = profiling.stages["square"]
+  assert counters["calls"] == 2
+  assert counters["curves"] == 4
+  assert counters["bytesRead"] == 150
+  assert counters["iterations"] == 3
+  assert counters["bytesWritten"] == 0
+  assert counters["time"] > 0
+
+def test_timed_counts_failed_calls():
+
+  profiling.Enable()
+  with pytest.raises(ValueError):
+    Fail()
+
+  assert profiling.stages["fail"]["calls"] == 1
+
+def test_wrapper_keeps_name():
+
+  assert Square.__name__ == "Square"
+
+def test_stage_block():
+
+  profiling.Enable()
+  with profiling.Stage("plot", curves=5):
+    pass
+
+  assert profiling.stages["plot"]["calls"] == 1
+  assert profiling.stages["plot"]["curves"] == 5
+
+def test_reset_clears_stages():
+
+  profiling.Enable()
+  Square(2)
+  profiling.Reset()
+
+  assert profiling.stages == {}
+
+def test_export_json(tmp_path):
+
+  profiling.Enable()
+  Square(2)
+  profiling.Count("read", bytesRead=10)
+  fileOutput = str(tmp_path / "profile.json")
+  report = profiling.Export(fileOutput)
+
+  with open(fileOutput) as f:
+    saved = json.load(f)
+
+  assert saved["pid"] == report["pid"]
+  assert [row["stage"] for row in saved["stages"]] == ["read", "square"]
+  square = saved["stages"][1]
+  assert square["calls"] == 1 and square["curves"] == 2
+  assert square["throughput"] == pytest.approx(2/square["time"])
+  assert saved["stages"][0]["throughput"] == 0.0
+
+def test_export_csv(tmp_path):
+
+  profiling.Enable()
+  Square(2)
+  Square(3)
+  fileOutput = str(tmp_path / "profile.csv")
+  profiling.Export(fileOutput)
+
+  with open(fileOutput, newline="") as f:
+    rows = list(csv.DictReader(f))
+
+  assert list(rows[0].keys()) == ["stage"] + list(profiling.COUNTERS) + ["throughput"]
+  assert len(rows) == 1
+  assert rows[0]["stage"] == "square"
+  assert int(rows[0]["calls"]) == 2
+  assert int(rows[0]["curves"]) == 4
+  assert float(rows[0]["throughput"]) == pytest.approx(4/float(rows[0]["time"]))
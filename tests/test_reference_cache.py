@@ -0,0 +1,100 @@
+import os
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+
+@pytest.fixture(autouse=True)
+def ClearCache():
+
+  saxs.referenceCache.Clear()
+  yield
+  saxs.referenceCache.Clear()
+
+def WriteCurve(fileData, value, size=50):
+
+  data = saxs.Saxs(size)
+  data.q = np.linspace(0.01, 0.3, size)
+  data.I = np.full(size, value)
+  data.sI = np.full(size, 0.1)
+  saxs.WriteData(str(fileData), data, header="# q I sI\n")
+
+  return str(fileData)
+
+def test_repeated_reference_is_a_hit(tmp_path):
+
+  fileData = WriteCurve(tmp_path / "solvent.dat", 1.0)
+
+  first = saxs.AsReference(fileData)
+  second = saxs.AsReference(fileData)
+
+  assert second is first
+  assert saxs.referenceCache.Statistics() == {"hits": 1, "misses": 1, "entries": 1, \
+      "bytes": 3*50*8}
+  # Objetos Saxs não passam pelo cache.
+  assert saxs.AsReference(first) is first
+  assert saxs.referenceCache.Statistics()["hits"] == 1
+
+def test_changed_file_is_imported_again(tmp_path):
+
+  fileData = WriteCurve(tmp_path / "solvent.dat", 1.0)
+  first = saxs.AsReference(fileData)
+
+  # Mesmo tamanho, outra data de modificação.
+  WriteCurve(fileData, 2.0)
+  status = os.stat(fileData)
+  os.utime(fileData, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+  second = saxs.AsReference(fileData)
+
+  assert second is not first
+  np.testing.assert_allclose(second.I, 2.0)
+  assert saxs.referenceCache.Statistics()["misses"] == 2
+  assert saxs.referenceCache.Statistics()["entries"] == 1
+
+  # Outro tamanho, mesma data de modificação.
+  WriteCurve(fileData, 3.0, size=60)
+  os.utime(fileData, ns=(status.st_atime_ns, status.st_mtime_ns + 10**9))
+  third = saxs.AsReference(fileData)
+  assert third.Size() == 60
+  assert saxs.referenceCache.Statistics()["misses"] == 3
+
+def test_eviction_by_entries(tmp_path):
+
+  cache = saxs.ReferenceCache(maxEntries=2)
+  files = [WriteCurve(tmp_path / ("reference%d.dat" % k), k) for k in range(3)]
+
+  cache.Get(files[0])
+  cache.Get(files[1])
+  cache.Get(files[0])
+  cache.Get(files[2])
+
+  # A menos usada recentemente (files[1]) é descartada.
+  assert cache.Statistics()["entries"] == 2
+  cache.Get(files[0])
+  cache.Get(files[1])
+  assert cache.Statistics() == {"hits": 2, "misses": 4, "entries": 2, "bytes": 2*3*50*8}
+
+def test_eviction_by_bytes(tmp_path):
+
+  cache = saxs.ReferenceCache(maxBytes=2*3*50*8)
+  small = [WriteCurve(tmp_path / ("small%d.dat" % k), k) for k in range(3)]
+  large = WriteCurve(tmp_path / "large.dat", 1.0, size=200)
+
+  for fileData in small:
+    cache.Get(fileData)
+  assert cache.Statistics()["entries"] == 2
+  assert cache.Statistics()["bytes"] <= cache.maxBytes
+
+  # Uma curva maior que o limite é retornada, mas não é guardada.
+  data = cache.Get(large)
+  assert data.Size() == 200
+  assert cache.Statistics()["entries"] == 2
+  cache.Get(large)
+  assert cache.Statistics()["hits"] == 0
+
+def test_cached_arrays_are_read_only(tmp_path):
+
+  data = saxs.AsReference(WriteCurve(tmp_path / "capillary.dat", 1.0))
+
+  for column in (data.q, data.I, data.sI):
+    with pytest.raises(ValueError):
+      column[0] = 0
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import regrid
+
+@pytest.fixture(autouse=True)
+def ClearCache():
+
+  regrid.weightsCache.Clear()
+  yield
+  regrid.weightsCache.Clear()
+
+def test_regrid_matches_numpy_interp():
+
+  rng = np.random.default_rng(3)
+  qSource = np.sort(rng.uniform(0.01, 0.5, 200))
+  qTarget = np.linspace(0.02, 0.45, 150)
+  I = np.exp(-qSource*10)
+  sI = 0.1*I
+
+  newI, newsI = regrid.RegridArrays(qSource, I, sI, qTarget)
+  np.testing.assert_allclose(newI, np.interp(qTarget, qSource, I))
+
+  left, right, t, inside = regrid.InterpolationWeights(qSource, qTarget)
+  np.testing.assert_allclose(newsI, np.hypot((1 - t)*sI[left], t*sI[right]))
+
+def test_regrid_fills_outside_points():
+
+  qSource = np.linspace(0.1, 0.2, 11)
+  qTarget = np.array([0.05, 0.15, 0.25])
+
+  newI, newsI = regrid.RegridArrays(qSource, qSource, np.ones(11), qTarget)
+  assert np.isnan(newI[0]) and np.isnan(newI[2])
+  assert newI[1] == pytest.approx(0.15)
+
+def test_regrid_unsorted_source():
+
+  qSource = np.linspace(0.01, 0.5, 50)
+  order = np.random.default_rng(4).permutation(50)
+  qTarget = np.linspace(0.02, 0.4, 30)
+
+  newI, newsI = regrid.RegridArrays(qSource[order], qSource[order]**2, np.ones(50), qTarget)
+  np.testing.assert_allclose(newI, np.interp(qTarget, qSource, qSource**2))
+
+def test_weights_cache_reuses_keys_and_entries():
+
+  qSource = np.linspace(0.01, 0.5, 100)
+  qTarget = np.linspace(0.02, 0.4, 80)
+
+  first = regrid.weightsCache.Get(qSource, qTarget)
+  second = regrid.weightsCache.Get(qSource, qTarget)
+  assert all(a is b for a, b in zip(first, second))
+
+  # Uma cópia (outra memória) tem a mesma chave pelo hash.
+  third = regrid.weightsCache.Get(qSource.copy(), qTarget.copy())
+  assert all(a is b for a, b in zip(first, third))
+  assert regrid.weightsCache.Statistics() == {"hits": 2, "misses": 1, "entries": 1}
+
+  key = regrid.weightsCache.Key(qSource, qTarget)
+  assert key == (regrid.GridKey(qSource), regrid.GridKey(qTarget))
+
+def test_in_place_grid_edit_gets_new_weights():
+
+  qSource = np.linspace(0.01, 0.5, 100)
+  qTarget = np.linspace(0.02, 0.4, 80)
+  I = qSource**2
+
+  first, firstsI = regrid.RegridArrays(qSource, I, np.ones(100), qTarget)
+  qTarget[:] = np.linspace(0.05, 0.45, 80)
+  second, secondsI = regrid.RegridArrays(qSource, I, np.ones(100), qTarget)
+
+  np.testing.assert_allclose(second, np.interp(qTarget, qSource, I))
+  assert regrid.weightsCache.Statistics()["misses"] == 2
+
+  qSource[:] = qSource*2
+  third, thirdsI = regrid.RegridArrays(qSource, I, np.ones(100), qTarget)
+  np.testing.assert_allclose(third, np.interp(qTarget, qSource, I), equal_nan=True)
+  assert regrid.weightsCache.Statistics()["misses"] == 3
+
+def test_reference_on_grid_without_copy():
+
+  reference = saxs.Saxs(20)
+  reference.q = np.linspace(0.01, 0.2, 20)
+  reference.I = np.ones(20)
+  reference.sI = np.ones(20)
+
+  I, sI = regrid.ReferenceOnGrid(reference, reference.q.copy())
+  assert I is reference.I
+
+############### Reagrupamento. ###########################################
+
+# Média ponderada de cada intervalo calculada ponto a ponto.
+def NaiveRebin(q, I, sI, edges):
+
+  newq, newI, newsI = [], [], []
+  for k in range(len(edges) - 1):
+    last = (k == len(edges) - 2)
+    mask = (q >= edges[k]) & ((q <= edges[k+1]) if last else (q < edges[k+1]))
+    if(not np.any(mask)):
+      continue
+    w = 1/sI[mask]**2
+    newq.append(np.mean(q[mask]))
+    newI.append(np.sum(w*I[mask])/np.sum(w))
+    newsI.append(1/np.sqrt(np.sum(w)))
+
+  return np.array(newq), np.array(newI), np.array(newsI)
+
+def test_rebin_matches_naive_weighted_mean():
+
+  rng = np.random.default_rng(5)
+  q = np.linspace(0.005, 0.5, 400)
+  I = np.exp(-q*10) + rng.normal(scale=0.01, size=400)
+  sI = rng.uniform(0.005, 0.02, 400)
+  edges = regrid.LogBins(q, 30)
+
+  result = regrid.RebinArrays(q, I, sI, edges)
+  for value, expected in zip(result, NaiveRebin(q, I, sI, edges)):
+    np.testing.assert_allclose(value, expected)
+
+def test_rebin_ignores_invalid_points():
+
+  q = np.linspace(0.1, 1.0, 10)
+  I = np.arange(10.0)
+  sI = np.ones(10)
+  I[1] = np.nan
+  sI[2] = 0
+
+  newq, newI, newsI = regrid.RebinArrays(q, I, sI, [0.1, 0.35, 1.0])
+  assert newI[0] == pytest.approx(0.0)
+  assert newsI[0] == pytest.approx(1.0)
+
+def test_rebin_batch_matches_each_curve():
+
+  from saxspy.batch import SaxsBatch
+
+  rng = np.random.default_rng(6)
+  listData = []
+  for k in range(4):
+    data = saxs.Saxs(300)
+    data.q = np.linspace(0.005, 0.5, 300)
+    data.I = np.exp(-data.q*(5 + k)) + rng.normal(scale=0.01, size=300)
+    data.sI = rng.uniform(0.005, 0.02, 300)
+    listData.append(data)
+
+  batch = SaxsBatch()
+  batch.Stack(listData)
+  rebinned = regrid.RebinBatch(batch, 25)
+
+  for k, data in enumerate(listData):
+    curve = regrid.Rebin(data, 25)
+    np.testing.assert_allclose(rebinned.q[k], curve.q)
+    np.testing.assert_allclose(rebinned.I[k], curve.I)
+    np.testing.assert_allclose(rebinned.sI[k], curve.sI)
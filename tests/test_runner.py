@@ -0,0 +1,93 @@
+import os
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import parameters
+from saxspy import runner
+
+@pytest.fixture
+def sample(tmp_path):
+
+  data = saxs.Saxs(20)
+  data.q = np.linspace(0.01, 0.2, 20)
+  data.I = np.linspace(2.0, 1.0, 20)
+  data.sI = 0.01*data.I
+  data.metadata = {}
+  fileData = str(tmp_path / "sample.dat")
+  saxs.WriteData(fileData, data, header="# q I sI\n")
+
+  return fileData
+
+# Arquivo de parâmetros com comentários, uma amostra inexistente e um
+# nome de saída repetido.
+@pytest.fixture
+def fileParameters(tmp_path, sample):
+
+  fileParameters = tmp_path / "parameters.txt"
+  fileParameters.write_text("# factor, sample, output\n\n" + \
+      "1.2, %s, first\n" % sample + \
+      "# comment\n" + \
+      "1.5, %s, second\n" % (tmp_path / "missing.dat") + \
+      "2.0, %s, first\n" % sample)
+
+  return str(fileParameters)
+
+def test_rows_keep_parameter_file_lines(tmp_path, fileParameters, capsys):
+
+  *rows, lineNumbers = parameters.ImportParameter_AbsoluteScale(fileParameters, withLines=True)
+  assert lineNumbers == [3, 5, 6]
+
+  results, summary = runner.RunAbsoluteScale(rows, executor="thread", \
+      directoryOutput=str(tmp_path), lineNumbers=lineNumbers)
+
+  assert summary["done"] == 1 and summary["failed"] == 2
+  assert results[0] is not None and results[1] is None and results[2] is None
+  assert "already used by line 3" in summary["errors"][2]
+
+  capsys.readouterr()
+  runner.PrintSummary(summary)
+  output = capsys.readouterr().out
+  assert "Error in line 5" in output
+  assert "Error in line 6" in output
+
+  np.testing.assert_allclose(saxs.ReadData(os.path.join(tmp_path, "first.dat")).I, \
+      results[0].I, rtol=1e-6)
+
+def test_rows_without_lines(tmp_path, fileParameters, monkeypatch):
+
+  monkeypatch.chdir(tmp_path)
+  rows = parameters.ImportParameter_AbsoluteScale(fileParameters)
+  assert len(rows) == 4
+
+  results, summary = runner.RunAbsoluteScale(rows, executor="serial")
+  assert summary["lines"] is None
+  assert "already used by row 1" in summary["errors"][2]
+
+def test_unknown_executor(fileParameters):
+
+  rows = parameters.ImportParameter_AbsoluteScale(fileParameters)
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    runner.RunAbsoluteScale(rows, executor="other")
+
+# O número de arquivos impresso conta apenas as linhas válidas (linhas com
+# número errado de argumentos ou argumento não numérico são ignoradas).
+@pytest.mark.parametrize("function, valid, invalid", [
+    (parameters.ImportParameter_CTTq, "1.0, 0.0, a.dat, 0.5, 0.1, cap.dat, 0.9, out", \
+        ["1.0, 0.0, b.dat, 0.5", "x, 0.0, c.dat, 0.5, 0.1, cap.dat, 0.9, out"]),
+    (parameters.ImportParameter_Solvent, "a.dat, solvent.dat, 0.02, out", \
+        ["b.dat, solvent.dat", "c.dat, solvent.dat, x, out"]),
+    (parameters.ImportParameter_AbsoluteScale, "1.2, a.dat, out", \
+        ["b.dat, out", "x, c.dat, out"])])
+def test_printed_count_excludes_invalid_lines(tmp_path, capsys, function, valid, invalid):
+
+  fileParameters = tmp_path / "parameters.txt"
+  fileParameters.write_text("# header\n" + "\n".join([valid] + invalid) + "\n")
+
+  rows = function(str(fileParameters))
+  output = capsys.readouterr().out
+
+  assert rows[0] == 1
+  assert "Correcting 1 data files" in output
+  assert "2) a.dat" in output
+  assert output.count("Error:") == 2
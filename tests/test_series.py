@@ -0,0 +1,159 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import series as saxsseries
+from saxspy.batch import CorrectBatchTo_AbsoluteScale
+from saxspy.mean import MeanAccumulator
+
+# Frames de uma medida cinética (mesma escala q, tempos diferentes),
+# salvos no formato binário.
+def FrameFiles(directory, number=12, size=50, seed=11):
+
+  rng = np.random.default_rng(seed)
+  q = np.linspace(0.01, 0.3, size)
+  listFiles = []
+  for k in range(number):
+    data = saxs.Saxs(size)
+    data.q = q
+    data.I = (1 + 0.05*k)*np.exp(-q*15) + rng.normal(scale=0.01, size=size)
+    data.sI = rng.uniform(0.005, 0.02, size)
+    data.metadata = {"time": float(1 + k % 3)}
+    fileData = str(directory / ("frame%03d.saxsb" % k))
+    data.Save(fileData)
+    listFiles.append(fileData)
+
+  return listFiles
+
+@pytest.fixture
+def files(tmp_path):
+
+  return FrameFiles(tmp_path)
+
+@pytest.fixture
+def series(tmp_path, files):
+
+  series = saxsseries.SeriesFromFiles(files, tmp_path / "run.saxs", chunkSize=5)
+  yield series
+  series.Close()
+
+def test_series_round_trip(tmp_path, files, series):
+
+  loaded = saxsseries.ReadSeries(tmp_path / "run.saxs")
+
+  assert loaded.Number() == len(files) and loaded.Size() == 50
+  for k, fileData in enumerate(files):
+    data = saxs.ReadData(fileData)
+    frame = loaded.Frame(k)
+    np.testing.assert_array_equal(frame.q, data.q)
+    np.testing.assert_array_equal(frame.I, data.I)
+    np.testing.assert_array_equal(frame.sI, data.sI)
+    assert frame.metadata == {"time": data.metadata["time"], "file": fileData}
+
+def test_series_requires_frame_times(tmp_path):
+
+  listFiles = FrameFiles(tmp_path, number=3)
+  untimed = saxs.ReadData(listFiles[1])
+  untimed.metadata = {}
+  untimed.Save(listFiles[1])
+
+  with pytest.raises(ValueError, match="SAXSPY Error.*frame001"):
+    saxsseries.SeriesFromFiles(listFiles, tmp_path / "run.saxs")
+
+  series = saxsseries.SeriesFromFiles(listFiles, tmp_path / "run.saxs", defaultTime=0.5)
+  np.testing.assert_array_equal(series.times, [1.0, 0.5, 3.0])
+  series.Close()
+
+def test_series_rejects_other_files(files):
+
+  with pytest.raises(ValueError):
+    saxsseries.ReadSeries(files[0])
+
+def test_chunks_cover_all_frames(series):
+
+  starts = []
+  for start, chunk in series.Chunks(5):
+    starts.append(start)
+    assert chunk.q.strides[0] == 0
+    for k in range(chunk.Number()):
+      np.testing.assert_array_equal(chunk.I[k], series.Frame(start + k).I)
+      assert chunk.metadata[k]["time"] == series.Frame(start + k).metadata["time"]
+
+  assert starts == [0, 5, 10]
+
+def test_map_matches_batch_correction(tmp_path, series):
+
+  output = saxsseries.Map(series, lambda chunk: CorrectBatchTo_AbsoluteScale(2.0, chunk), \
+      tmp_path / "absolute.saxs", chunkSize=4)
+
+  np.testing.assert_allclose(output.data[:, :, 1], series.data[:, :, 1]/2.0)
+  np.testing.assert_array_equal(output.times, series.times)
+  assert output.names == series.names
+
+def test_series_mean_matches_accumulator(series):
+
+  accumulator = MeanAccumulator()
+  for k in range(2, 11):
+    accumulator.Add(series.Frame(k))
+  expected = accumulator.Result()
+
+  mean = saxsseries.SeriesMean(series, start=2, stop=11, chunkSize=4)
+  np.testing.assert_allclose(mean.q, expected.q)
+  np.testing.assert_allclose(mean.I, expected.I)
+  np.testing.assert_allclose(mean.sI, expected.sI)
+  assert mean.metadata["frames"] == 9
+
+############### Correções por frame e médias móveis. #####################
+
+def test_per_frame_absolute_scale(tmp_path, series):
+
+  factors = np.linspace(1.0, 2.0, series.Number())
+  output = saxsseries.CorrectSeriesTo_AbsoluteScale(factors, series, tmp_path / "absolute.saxs", \
+      chunkSize=5)
+
+  for k in range(series.Number()):
+    np.testing.assert_allclose(output.Frame(k).I, series.Frame(k).I/factors[k])
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    saxsseries.CorrectSeriesTo_AbsoluteScale(factors[:-1], series, tmp_path / "wrong.saxs")
+
+@pytest.mark.parametrize("window, chunkSize", [(1, None), (5, 3), (5, 1), (20, 4)])
+def test_moving_mean_matches_naive_loop(tmp_path, series, window, chunkSize):
+
+  output = saxsseries.MovingMean(series, window, tmp_path / "moving.saxs", chunkSize)
+
+  for k in range(series.Number()):
+    accumulator = MeanAccumulator()
+    for j in range(max(0, k - window + 1), k + 1):
+      accumulator.Add(series.Frame(j))
+    expected = accumulator.Result()
+    frame = output.Frame(k)
+    np.testing.assert_allclose(frame.q, expected.q)
+    np.testing.assert_allclose(frame.I, expected.I)
+    np.testing.assert_allclose(frame.sI, expected.sI)
+    assert frame.metadata["time"] == pytest.approx(expected.metadata["time"])
+
+@pytest.mark.parametrize("alpha, chunkSize", [(1.0, None), (0.3, 5), (0.3, 1), (0.05, 7)])
+def test_exponential_mean_matches_naive_recurrence(tmp_path, series, alpha, chunkSize):
+
+  output = saxsseries.ExponentialMean(series, alpha, tmp_path / "exponential.saxs", chunkSize)
+
+  decay = 1 - alpha
+  S = T = V = 0
+  for k in range(series.Number()):
+    frame = series.Frame(k)
+    t = frame.metadata["time"]
+    S = decay*S + t*frame.I
+    T = decay*T + t
+    V = decay**2*V + (t*frame.sI)**2
+    result = output.Frame(k)
+    np.testing.assert_allclose(result.I, S/T)
+    np.testing.assert_allclose(result.sI, np.sqrt(V)/T)
+    np.testing.assert_allclose(result.q, frame.q)
+    assert result.metadata["time"] == pytest.approx(T)
+
+def test_moving_means_reject_invalid_parameters(tmp_path, series):
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    saxsseries.MovingMean(series, 0, tmp_path / "moving.saxs")
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    saxsseries.ExponentialMean(series, 0, tmp_path / "exponential.saxs")
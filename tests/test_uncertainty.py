@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy import uncertainty
+
+PARAMETERS = {"qSlope": 1.01, "qIntercept": 0.0005, "transmissionSample": 0.4, \
+    "thicknessSample": 0.15, "transmissionCapillary": 0.8, "soluteVolumetricFraction": 0.02, \
+    "absoluteScaleFactor": 1.2}
+
+def Curve(q, I, relative=0.01):
+
+  data = saxs.Saxs(len(q))
+  data.q = q
+  data.I = I
+  data.sI = relative*I
+  data.metadata = {}
+
+  return data
+
+# Amostra, capilar e solvente suaves, o capilar e o solvente em escalas q
+# diferentes da amostra (como nas correções, eles são interpolados).
+@pytest.fixture
+def curves():
+
+  q = np.linspace(0.01, 0.3, 150)
+  sample = Curve(q, 50*np.exp(-(q*25)**2/3) + 2 + 1/(1 + q*10))
+  qReference = np.linspace(0.005, 0.35, 170)
+  capillary = Curve(qReference, 0.5/(1 + qReference*10))
+  solvent = Curve(qReference, 1.0 + 0*qReference, 0.005)
+
+  return sample, capillary, solvent
+
+def Chain(sample, capillary, solvent, parameters, sAbsoluteScaleFactor=0.0):
+
+  cttq = saxs.CorrectTo_CTTq(parameters["qSlope"], parameters["qIntercept"], sample, \
+      parameters["transmissionSample"], parameters["thicknessSample"], capillary, \
+      parameters["transmissionCapillary"], save=False)
+  solventCorrected = saxs.CorrectTo_Solvent(cttq, solvent, \
+      parameters["soluteVolumetricFraction"], save=False)
+
+  return saxs.CorrectTo_AbsoluteScale(parameters["absoluteScaleFactor"], solventCorrected, \
+      save=False, sAbsoluteScaleFactor=sAbsoluteScaleFactor)
+
+@pytest.mark.parametrize("method", ["analytic", "montecarlo"])
+def test_without_parameter_uncertainty_matches_corrections(curves, method):
+
+  sample, capillary, solvent = curves
+  expected = Chain(sample, capillary, solvent, PARAMETERS)
+
+  correction = uncertainty.Propagate(sample, PARAMETERS, fileCapillary=capillary, \
+      fileSolvent=solvent, method=method, draws=20000, seed=1)
+
+  np.testing.assert_allclose(correction.q, expected.q)
+  np.testing.assert_allclose(correction.I, expected.I, equal_nan=True)
+  if(method == "analytic"):
+    np.testing.assert_allclose(correction.sI, expected.sI, equal_nan=True)
+  else:
+    finite = np.isfinite(expected.sI)
+    np.testing.assert_allclose(correction.sI[finite], expected.sI[finite], rtol=0.05)
+
+def test_absolute_scale_uncertainty_matches_correction(curves):
+
+  sample = curves[0]
+  parameters = {"absoluteScaleFactor": 1.2}
+  expected = saxs.CorrectTo_AbsoluteScale(1.2, sample, save=False, sAbsoluteScaleFactor=0.03)
+
+  correction = uncertainty.Propagate(sample, parameters, {"absoluteScaleFactor": 0.03})
+  np.testing.assert_allclose(correction.I, expected.I)
+  np.testing.assert_allclose(correction.sI, expected.sI)
+
+def test_analytic_matches_montecarlo(curves):
+
+  sample, capillary, solvent = curves
+  uncertainties = {"transmissionSample": 0.004, "thicknessSample": 0.003, \
+      "transmissionCapillary": 0.008, "soluteVolumetricFraction": 0.005, \
+      "absoluteScaleFactor": 0.02}
+  blocks = [(("qSlope", "qIntercept"), [[1e-6, -2e-8], [-2e-8, 1e-9]])]
+  options = dict(uncertainties=uncertainties, blocks=blocks, fileCapillary=capillary, \
+      fileSolvent=solvent)
+
+  analytic = uncertainty.Propagate(sample, PARAMETERS, method="analytic", **options)
+  montecarlo = uncertainty.Propagate(sample, PARAMETERS, method="montecarlo", draws=40000, \
+      seed=2, **options)
+
+  finite = np.isfinite(analytic.sI)
+  assert np.count_nonzero(finite) > 100
+  np.testing.assert_allclose(montecarlo.sI[finite], analytic.sI[finite], rtol=0.05)
+
+def test_full_covariance(curves):
+
+  sample, capillary, solvent = curves
+  correction, covariance = uncertainty.Propagate(sample, PARAMETERS, \
+      {"absoluteScaleFactor": 0.02}, fileCapillary=capillary, fileSolvent=solvent, \
+      fullCovariance=True)
+
+  finite = np.isfinite(correction.sI)
+  block = covariance[np.ix_(finite, finite)]
+  np.testing.assert_allclose(block, block.T)
+  np.testing.assert_allclose(np.sqrt(np.diagonal(block)), correction.sI[finite])
+
+  # O fator de escala é comum a todos os pontos: pontos correlacionados.
+  correlation = block/np.outer(correction.sI[finite], correction.sI[finite])
+  assert np.all(correlation[np.triu_indices(len(block), 1)] > 0)
+
+def test_parameter_covariance_blocks():
+
+  covariance = uncertainty.ParameterCovariance({"qSlope": 0.1, "absoluteScaleFactor": 0.2}, \
+      [(("qSlope", "qIntercept"), [[0.04, 0.01], [0.01, 0.09]])])
+
+  assert covariance[0, 0] == pytest.approx(0.04)
+  assert covariance[0, 1] == covariance[1, 0] == pytest.approx(0.01)
+  assert covariance[6, 6] == pytest.approx(0.04)
+
+def test_unknown_method(curves):
+
+  with pytest.raises(ValueError, match="SAXSPY Error"):
+    uncertainty.Propagate(curves[0], {}, method="other")
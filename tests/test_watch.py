@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+from saxspy.mean import MeanAccumulator
+from saxspy.watch import FolderWatcher
+
+# Frames no formato binário (com o tempo no cabeçalho, exceto se None).
+def WriteFrames(directory, times):
+
+  frames = []
+  for k, time in enumerate(times):
+    data = saxs.Saxs(30)
+    data.q = np.linspace(0.01, 0.3, 30)
+    data.I = np.full(30, 1.0 + k)
+    data.sI = np.full(30, 0.1)
+    data.metadata = {} if (time is None) else {"time": time}
+    data.Save(directory / ("frame%d.saxs" % k))
+    frames.append(data)
+
+  return frames
+
+def test_watcher_mean_skips_outputs_and_bad_frames(tmp_path):
+
+  frames = WriteFrames(tmp_path, [1.0, 2.0, None, 3.0])
+  fileMean = tmp_path / "mean.saxs"
+
+  watcher = FolderWatcher(str(tmp_path), "*.saxs", fileMean=str(fileMean), interval=0.01, \
+      stableChecks=1)
+  statistics = watcher.Watch(duration=0.3)
+
+  accumulator = MeanAccumulator()
+  for frame in (frames[0], frames[1], frames[3]):
+    accumulator.Add(frame)
+  expected = accumulator.Result()
+
+  assert statistics["frames"] == 3
+  assert statistics["errors"] == 1
+  assert watcher.errors[0][0].endswith("frame2.saxs")
+  assert "SAXSPY Error" in watcher.errors[0][1]
+  np.testing.assert_allclose(watcher.mean.I, expected.I)
+  np.testing.assert_allclose(saxs.ReadData(str(fileMean)).I, expected.I, rtol=1e-6)
+  assert str(fileMean) in watcher.seen
+
+def test_watcher_reraises_callback_errors(tmp_path):
+
+  WriteFrames(tmp_path, [1.0])
+
+  def OnUpdate(watcher):
+    raise RuntimeError("callback failed")
+
+  watcher = FolderWatcher(str(tmp_path), "*.saxs", interval=0.01, stableChecks=1, \
+      onUpdate=OnUpdate)
+  with pytest.raises(RuntimeError, match="callback failed"):
+    watcher.Watch(duration=5)
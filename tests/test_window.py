@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from saxspy import saxspy as saxs
+
+def Curve(q):
+
+  data = saxs.Saxs(len(q))
+  data.q = np.asarray(q, dtype=float)
+  data.I = 10*data.q
+  data.sI = data.q/10
+
+  return data
+
+def test_window_of_increasing_q_is_a_view():
+
+  data = Curve(np.linspace(0.1, 1.0, 10))
+  window = data.Window(0.2, 0.5)
+
+  # Limites exclusivos: 0.2 e 0.5 ficam de fora.
+  np.testing.assert_allclose(window.q, [0.3, 0.4])
+  assert window.Size() == 2
+  for column, original in ((window.q, data.q), (window.I, data.I), (window.sI, data.sI)):
+    assert np.shares_memory(column, original)
+  assert data.RangeIndex(0.2, 0.5) == (2, 4)
+
+def test_window_of_unsorted_q_is_sorted():
+
+  q = np.array([0.5, 0.1, 0.4, 0.2, 0.3, 0.6])
+  data = Curve(q)
+  window = data.Window(0.15, 0.45)
+
+  np.testing.assert_allclose(window.q, [0.2, 0.3, 0.4])
+  np.testing.assert_allclose(window.I, 10*window.q)
+  sortedq, order = data.SortedQ()
+  np.testing.assert_allclose(sortedq, np.sort(q))
+  np.testing.assert_array_equal(q[order], np.sort(q))
+
+def test_empty_and_inverted_ranges():
+
+  data = Curve(np.linspace(0.1, 1.0, 10))
+
+  assert data.Window(2.0, 3.0).Size() == 0
+  assert data.Window(0.5, 0.2).Size() == 0
+  assert data.Window(0.1, 0.2).Size() == 0
+
+def test_in_place_edits_are_detected():
+
+  data = Curve(np.linspace(0.1, 1.0, 10))
+  data.Window(0.2, 0.5)
+
+  # Crescente -> não crescente, no próprio array.
+  data.q[:] = data.q[::-1].copy()
+  np.testing.assert_allclose(data.Window(0.2, 0.5).q, [0.3, 0.4])
+  assert data.SortedQ()[1] is not None
+
+  # Não crescente -> outra ordem (a ordenação guardada não é reaproveitada).
+  data.q[:] = [0.5, 0.1, 0.4, 0.2, 0.3, 0.6, 0.7, 0.8, 0.9, 1.0]
+  np.testing.assert_allclose(data.Window(0.15, 0.45).q, [0.2, 0.3, 0.4])
+
+  # Não crescente -> crescente.
+  data.q[:] = np.linspace(1.1, 2.0, 10)
+  assert data.SortedQ()[1] is None
+  np.testing.assert_allclose(data.Window(1.15, 1.45).q, [1.2, 1.3, 1.4])
+
+def test_sorted_index_is_reused_while_q_is_unchanged():
+
+  data = Curve([0.3, 0.1, 0.2])
+  first = data.SortedQ()[1]
+
+  assert data.SortedQ()[1] is first
+  data.q = data.q.copy()
+  assert data.SortedQ()[1] is first